@@ -29,12 +29,117 @@ def main():
     ## Config parser values.
     parser['nemesis'] = {
         'nemesis_dir': '/etc/nemesis/',
-        'interface': 'lo'
+        ## Interface name, 'all', glob (e.g. 'eth*') or regex (e.g. 're:^eth\\d+$').
+        'interface': 'lo',
+        ## Output for more interfaces: 'combined' or 'per_interface'.
+        'net_output': 'combined',
+        ## When to fsync output files: 'never', 'always' or every N writes (e.g. '10').
+        'fsync': 'never',
+        ## Collector runtime: 'threads' or 'asyncio'.
+        'runtime': 'threads'
     }
 
     parser['data_pulling'] = {
         'sys_refresh_time':  '30',
-        'net_refresh_time': '30'
+        'net_refresh_time': '30',
+        ## Write netinfo immediately on link/address change (netlink): 'yes' or 'no'.
+        'net_events': 'yes',
+        ## Summarize TCP sockets by state (nemesis_tcp.json): 'yes' or 'no'.
+        'tcp_states': 'yes',
+        ## Days of metric history kept in 'nemesis_data/history' ('0' = none).
+        'history_days': '7',
+        ## Report usage of network filesystems (NFS, CIFS, FUSE, ...), unreachable
+        ## server is given up after 2 s: 'yes' or 'no'.
+        'network_fs': 'no'
+    }
+
+    parser['api'] = {
+        ## Unix socket serving latest data ('' = disabled).
+        'socket': '/run/nemesis.sock',
+        ## Permissions (octal) and group of Unix socket ('' = group of root).
+        'socket_mode': '0660',
+        'socket_group': '',
+        ## HTTP address serving latest data, e.g. '127.0.0.1:8080' ('' = disabled).
+        'http': ''
+    }
+
+    parser['discovery'] = {
+        ## Discover live IPv4 hosts in subnets of interfaces (json/ipv4): 'yes' or 'no'.
+        'enabled': 'no',
+        'refresh_time': '300',
+        ## Hosts probed with TCP at once and probes sent per second ('0' = unlimited).
+        'concurrency': '2048',
+        'rate': '5000',
+        ## TCP ports probed on hosts not answering ping ('' = ping only).
+        'ports': '80,443,22',
+        ## Seconds to wait for answer.
+        'timeout': '0.5',
+        ## Larger subnets are swept only around interface address (e.g. /8 -> /16).
+        'min_prefix': '16',
+        ## Discover IPv6 hosts by multicast ping on interfaces (json/ipv6): 'yes' or 'no'.
+        'ipv6': 'yes'
+    }
+
+    parser['neighbours'] = {
+        ## Track hosts passively in kernel ARP/NDP tables (json/ipv4, json/ipv6): 'yes' or 'no'.
+        'enabled': 'yes',
+        'refresh_time': '10',
+        ## Seconds after which host which left neighbour table is forgotten.
+        'expire_time': '86400'
+    }
+
+    parser['inventory'] = {
+        ## Keep found hosts in SQLite database: 'yes' or 'no' (one JSON file per host).
+        'enabled': 'yes',
+        ## Database file (kept outside of 'nemesis_data', so host history survives restart).
+        'db': '/etc/nemesis/nemesis_inventory.db',
+        ## Seconds after which host not found by discovery is forgotten ('0' = never).
+        'expire_time': '604800',
+        ## Export inventory to one JSON file per host (json/ipv4, json/ipv6): 'yes' or 'no'.
+        'export': 'yes',
+        'export_time': '60',
+        ## Index of MAC vendors compiled from IEEE registries of netaddr ('' = no vendors).
+        'oui_index': '/etc/nemesis/nemesis_oui.idx'
+    }
+
+    parser['portscan'] = {
+        ## Scan TCP ports of hosts in inventory: 'yes' or 'no' (needs inventory).
+        'enabled': 'no',
+        ## Ports and ranges, e.g. '22,80,8000-8100'.
+        'ports': '21,22,23,25,53,80,110,143,443,445,993,995,3306,3389,5432,5900,8080,8443',
+        'refresh_time': '300',
+        ## Every N-th scan scans all hosts, others only new and changed hosts.
+        'full_every': '12',
+        ## Open connections in total and per host.
+        'concurrency': '512',
+        'per_host': '32',
+        ## Seconds to wait for answer and highest probe rate per second (lowered when probes time out).
+        'timeout': '1.0',
+        'rate': '1000',
+        ## Only hosts seen in last N seconds are scanned.
+        'max_age': '3600'
+    }
+
+    parser['subnets'] = {
+        ## Tag addresses of interfaces and hosts by longest matching network from file ('' = no tags).
+        ## One network per line with tags, e.g. '10.1.20.0/24 site=prague vlan=20 zone=dmz'.
+        'file': ''
+    }
+
+    parser['processes'] = {
+        ## Write top processes by CPU, memory and I/O (json/ipv4/nemesis_proc.json): 'yes' or 'no'.
+        'enabled': 'yes',
+        'refresh_time': '10',
+        ## Processes listed in every top list.
+        'top': '10'
+    }
+
+    parser['cgroups'] = {
+        ## Write CPU, memory, I/O and pressure of every cgroup v2 cgroup (json/ipv4/nemesis_cgroups.json): 'yes' or 'no'.
+        'enabled': 'yes',
+        'refresh_time': '10',
+        ## Mount point of cgroup v2 hierarchy ('' = found in mount table).
+        'root': ''
     }
 
     ## Write config parser values to file.
@@ -20,10 +20,8 @@ GNU/LINUX /sys/class/net/ info:
 '''
 BUGS:
 1. Support only for GNU/Linux
-2. No disk usage monitoring yet
-3. Only first IP address is detected on the interface
-4. Only IPv4 supported
-5. No speed, frequency, signal strength and BSSID/ESSID detection for wireless.
+2. No speed, frequency, signal strength and BSSID/ESSID detection for wireless.
+3. IPv6 hosts are discovered only if they answer multicast ping (ff02::1).
 
 Cool Ideas:
 1. Find if IP address was assigned statically/DHCP/APIPA
@@ -39,10 +37,15 @@ import sys
 import os
 import errno
 import threading
+import queue
+import heapq
+import signal
+import zlib
+import asyncio
+import concurrent.futures
+import urllib.parse
 import time
 import datetime
-## Install: $(python3 -m pip install uptime)
-import uptime
 ## Install: $(python3 -m pip install psutil)
 import psutil
 import shutil
@@ -51,6 +54,26 @@ import netifaces
 ## Install: $(python3 -m pip install netaddr)
 import netaddr
 import json
+import re
+import fnmatch
+import socket
+import tempfile
+import struct
+import collections
+import mmap
+import hashlib
+import resource
+import select
+import pwd
+import grp
+import subprocess
+import ctypes
+import ctypes.util
+import sqlite3
+import array
+import bisect
+import random
+import operator
 
 
 ################################################################################
@@ -66,6 +89,49 @@ import json
 ##                      System Info                       ##
 ############################################################
 class SysInfo:
+    def __init__(self, proc_dir: str = "/proc", sys_dir: str = "/sys"):
+        ## CPU sampler has to live as long as SysInfo, because utilization is
+        ## computed from difference against previous sample.
+        self.cpu_sampler = CpuSampler(proc_dir, sys_dir)
+
+        ## Same for disk I/O (mount table is also cached by sampler).
+        self.disk_sampler = DiskSampler(proc_dir)
+
+        ## Snapshot of kernel sources, taken once per tick by refresh().
+        self.snapshot = SysSnapshot(proc_dir)
+        self.refresh()
+
+        ## Facts which do not change while system is running (computed once).
+        self.static = self.static_rawdata()
+
+
+    ## Take new snapshot of all kernel sources. All methods return values from
+    ## the last snapshot until refresh() is called again.
+    def refresh(self):
+        self.snapshot.take()
+
+        ## CPU utilization and frequencies and disk I/O are computed at most
+        ## once per snapshot.
+        self.cpu = None
+        self.freq = None
+        self.disk_io = None
+
+
+    ## Return dictionary with facts which do not change while system is running.
+    ## RETURN:
+    ## {'os': 'LINUX', 'boottime': '2022-01-16 14:07:43',
+    ## 'cpu': {'physical_cores': 8, ...}, 'ram_size': 16646635520,
+    ## 'swap_size': 1027600384}
+    def static_rawdata(self):
+        return {
+            'os':        self.detect_os(),
+            'boottime':  self.detect_boottime(),
+            'cpu':       self.detect_cpu_info(),
+            'ram_size':  self.snapshot.meminfo.get('MemTotal', 0),
+            'swap_size': self.snapshot.meminfo.get('SwapTotal', 0)
+        }
+
+
     ########################################
     ##          Operating System          ##
     ########################################
@@ -73,6 +139,13 @@ class SysInfo:
     ## RETURN:
     ## 'LINUX'
     def os(self):
+        return self.static['os']
+
+
+    ## Detect name of operating system.
+    ## RETURN:
+    ## 'LINUX'
+    def detect_os(self):
         if psutil.LINUX:
             return "LINUX"
         elif psutil.WINDOWS:
@@ -118,22 +191,25 @@ class SysInfo:
             'timezone':        'NONE'
         }
 
+        ## Local time read once when snapshot was taken.
+        now = self.snapshot.localtime
+
         ## Get year with century, e.g. 2022.
-        moment['year']            = time.strftime('%Y', time.localtime())
+        moment['year']            = time.strftime('%Y', now)
         ## Get month [01,12].
-        moment['month']           = time.strftime('%m', time.localtime())
+        moment['month']           = time.strftime('%m', now)
         ## Get day [01,31].
-        moment['day']             = time.strftime('%d', time.localtime())
+        moment['day']             = time.strftime('%d', now)
         ## Get hour (24-hour clock) [00,23].
-        moment['hour']            = time.strftime('%H', time.localtime())
+        moment['hour']            = time.strftime('%H', now)
         ## Get minute [00,59].
-        moment['minute']          = time.strftime('%M', time.localtime())
+        moment['minute']          = time.strftime('%M', now)
         ## Get second [00,59].
-        moment['second']          = time.strftime('%S', time.localtime())
+        moment['second']          = time.strftime('%S', now)
         ## Timezone offset from UTC/GMT (+HHMM || -HHMM) [-23:59, +23:59].
-        moment['timezone_offset'] = time.strftime('%z', time.localtime())
+        moment['timezone_offset'] = time.strftime('%z', now)
         ## Timezone name, e.g. CET or CEST (should handle DST automatically).
-        moment['timezone']        = time.strftime('%Z', time.localtime())
+        moment['timezone']        = time.strftime('%Z', now)
 
         ## Return dictionary with date, time and timezone.
         return moment
@@ -159,8 +235,8 @@ class SysInfo:
     ## RETURN:
     ## (0, 6, 56, 33)
     def uptime_rawdata(self):
-        ## Get seconds since PC booted in epoch.
-        seconds = int(uptime.uptime()) ## e.g. 24993
+        ## Get seconds since PC booted (from '/proc/uptime').
+        seconds = int(self.snapshot.uptime) ## e.g. 24993
 
         ## Initialize days, hours and minutes to 0.
         days    = 0
@@ -201,6 +277,13 @@ class SysInfo:
     ## RETURN:
     ## 'YYYY-mm-dd HH:MM:SS'
     def boottime(self):
+        return self.static['boottime']
+
+
+    ## Detect boottime string.
+    ## RETURN:
+    ## 'YYYY-mm-dd HH:MM:SS'
+    def detect_boottime(self):
         ## Get time in seconds since the epoch.
         t = psutil.boot_time()
 
@@ -213,9 +296,17 @@ class SysInfo:
     ########################################
     ## Return dictionary with physical, logical cores and min, max frequencies.
     ## RETURN:
-    ## {'physical_cores': 8, 'logical_cores': 0, 'min_frequency': 800,
+    ## {'physical_cores': 8, 'logical_cores': 16, 'min_frequency': 800,
     ## 'max_frequency': 4500}
     def cpu_info_rawdata(self):
+        return dict(self.static['cpu'])
+
+
+    ## Detect physical, logical cores and min, max frequencies.
+    ## RETURN:
+    ## {'physical_cores': 8, 'logical_cores': 16, 'min_frequency': 800,
+    ## 'max_frequency': 4500}
+    def detect_cpu_info(self):
         ## Initialize data with default values.
         cpu = {
             'physical_cores': 0, ## e.g. 4
@@ -224,27 +315,76 @@ class SysInfo:
             'max_frequency':  0  ## e.g. 4500 (MHz)
         }
 
-        ## Get physical CPU cores.
-        cpu['physical_cores'] = psutil.cpu_count(logical=False)
+        ## Get physical CPU cores (None if it can not be detected).
+        cpu['physical_cores'] = psutil.cpu_count(logical=False) or 0
         ## Get logical CPU cores.
-        cpu['physical_cores'] = psutil.cpu_count(logical=True)
-        ## Get CPU frequency tuple (current, min, max).
+        cpu['logical_cores']  = psutil.cpu_count(logical=True) or 0
+        ## Get CPU frequency tuple (current, min, max), None without cpufreq.
         frequencies            = psutil.cpu_freq(percpu=False)
-        ## Get min frequency in MHz.
-        cpu['min_frequency']  = int(frequencies[1])
-        ## Get max frequency in MHz.
-        cpu['max_frequency']  = int(frequencies[2])
+        if frequencies is not None:
+            ## Get min frequency in MHz.
+            cpu['min_frequency']  = int(frequencies[1])
+            ## Get max frequency in MHz.
+            cpu['max_frequency']  = int(frequencies[2])
 
         ## Return dictionary with CPU info.
         return cpu
 
 
+    ## Return dictionary with CPU utilization in percentage [0.0, 100.0] since
+    ## previous call (or since SysInfo was created). Call does not block.
+    ## RETURN:
+    ## {'total': 27.8, 'user': 20.1, 'system': 6.9, 'iowait': 0.5,
+    ## 'steal': 0.0, 'per_core': array('d', [30.2, 25.4])}
+    def cpu_util_rawdata(self):
+        ## Sample CPU counters from snapshot only once per snapshot.
+        if self.cpu is None:
+            self.cpu = self.cpu_sampler.sample(self.snapshot.stat)
+
+        return self.cpu
+
+
+    ## Return array with current frequency of every core in MHz (see
+    ## CpuSampler.frequencies()).
+    ## RETURN:
+    ## array('d', [2100.0, 3400.0])
+    def cpu_freq_rawdata(self):
+        ## Read frequencies only once per snapshot.
+        if self.freq is None:
+            reads = self.cpu_sampler.reads
+            self.freq = self.cpu_sampler.frequencies()
+            self.snapshot.count('sampler_reads', self.cpu_sampler.reads - reads)
+
+        return self.freq
+
+
+    ## Return list of load averages over 1, 5 and 15 minutes.
+    ## RETURN:
+    ## [0.16, 0.11, 0.09]
+    def load_avg(self):
+        try:
+            return [float(v) for v in self.snapshot.loadavg.split()[:3]]
+        except ValueError:
+            return [0.0, 0.0, 0.0]
+
+
+    ## Return dictionary with pressure stall information (share of last 10
+    ## seconds some or all tasks waited for resource, in percentage).
+    ## RETURN:
+    ## {'cpu': {'some': 2.21, 'full': 0.0}, 'memory': {'some': 0.0, 'full': 0.0},
+    ## 'io': {'some': 0.35, 'full': 0.12}}
+    ## ERROR RETURN:
+    ## {} (kernel without PSI)
+    def pressure(self):
+        return self.snapshot.pressure
+
+
     ## Return float of CPU utilization in percentage [0.0, 100.0].
     ## RETURN:
     ## 27.8
-    def cpu_util(self, x: int = 0.1):
+    def cpu_util(self):
         ## Return float of CPU utilization in percentage [0.0, 100.0].
-        return psutil.cpu_percent(interval=x, percpu=False)
+        return self.cpu_util_rawdata()['total']
 
 
     ########################################
@@ -255,15 +395,26 @@ class SysInfo:
     ## 16646635520
     def ram_size(self):
         ## Return Total RAM size in bytes (divide by 1024 for kiB).
-        return psutil.virtual_memory()[0] ## e.g. 16646635520
+        return self.static['ram_size'] ## e.g. 16646635520
 
 
     ## Return float of RAM utilization in percentage [0.0, 100.0].
     ## RETURN:
     ## 22.8
     def ram_util(self):
+        mem = self.snapshot.meminfo
+        total = mem.get('MemTotal', 0)
+        if total == 0:
+            return 0.0
+
+        ## 'MemAvailable' is missing on kernels older than 3.14.
+        if 'MemAvailable' in mem:
+            available = mem['MemAvailable']
+        else:
+            available = mem.get('MemFree', 0) + mem.get('Buffers', 0) + mem.get('Cached', 0)
+
         ## Return float of RAM utilization in percentage [0.0, 100.0].
-        return psutil.virtual_memory()[2] ## e.g. 22.8
+        return round(100.0 * (total - available) / total, 1) ## e.g. 22.8
 
 
     ########################################
@@ -274,31 +425,1178 @@ class SysInfo:
     ## 1027600384
     def swap_size(self):
         ## Return Total SWAP size in bytes (divide by 1024 for kiB).
-        return psutil.swap_memory()[0] ## e.g. 1027600384
+        return self.static['swap_size'] ## e.g. 1027600384
 
 
     ## Return float of SWAP utilization in percentage [0.0, 100.0].
     ## RETURN:
     ## 27.4
     def swap_util(self):
+        mem = self.snapshot.meminfo
+        total = mem.get('SwapTotal', 0)
+        if total == 0:
+            return 0.0
+
         ## Return float of SWAP utilization in percentage [0.0, 100.0].
-        return psutil.swap_memory()[3] ## e.g. 27.4
+        return round(100.0 * (total - mem.get('SwapFree', 0)) / total, 1) ## e.g. 27.4
 
 
     ########################################
     ##                Disk                ##
     ########################################
-    ## Yet to be added.
+    ## Return list of dictionaries with I/O of every block device since
+    ## previous snapshot (see DiskSampler.sample()).
+    ## RETURN:
+    ## [{'device': 'vda', 'read_iops': 12.0, 'write_iops': 40.5, ...}]
+    def disk_io_rawdata(self):
+        ## Sample disk counters from snapshot only once per snapshot.
+        if self.disk_io is None:
+            self.disk_io = self.disk_sampler.sample(self.snapshot.diskstats, self.snapshot.uptime)
+
+        return self.disk_io
+
+
+    ## Return list of dictionaries with usage of every mounted filesystem
+    ## (see DiskSampler.usage()).
+    ## RETURN:
+    ## [{'mount': '/', 'mounts': ['/'], 'device': 'vda', ..., 'used_pct': 25.3}]
+    def disk_usage(self):
+        ## Device names are known after counters were parsed.
+        self.disk_io_rawdata()
+        reads = self.disk_sampler.reads
+        usage = self.disk_sampler.usage()
+        self.snapshot.count('sampler_reads', self.disk_sampler.reads - reads)
+        return usage
+
+
+############################################################
+##                    System Snapshot                     ##
+############################################################
+## SysSnapshot reads every kernel source used by SysInfo exactly once per tick,
+## so all values of one tick are consistent. It also counts reads done per
+## tick: its own file reads and clock reads and reads done by samplers in the
+## same tick outside of snapshot (cpufreq files, mount table polls and reads,
+## statvfs), added by SysInfo.
+class SysSnapshot:
+    def __init__(self, proc_dir: str = "/proc"):
+        ## Directory where procfs is mounted.
+        self.proc_dir = proc_dir
+
+        ## Data of last snapshot.
+        self.clock     = 0.0                ## Seconds since epoch.
+        self.localtime = time.localtime(0)  ## self.clock as local time.
+        self.meminfo   = {}                 ## '/proc/meminfo' in bytes.
+        self.stat      = ""                 ## '/proc/stat' content.
+        self.diskstats = ""                 ## '/proc/diskstats' content.
+        self.loadavg   = ""                 ## '/proc/loadavg' content.
+        self.pressure  = {}                 ## '/proc/pressure/*' avg10.
+        self.uptime    = 0.0                ## Seconds since boot.
+
+        ## Pressure files exist only on kernels with PSI (4.20+).
+        self.pressure_names = [n for n in ('cpu', 'memory', 'io') if os.path.exists(f"{proc_dir}/pressure/{n}")]
+
+        ## Cost of last snapshot and of all snapshots together.
+        self.cost       = {'file_reads': 0, 'clock_reads': 0, 'sampler_reads': 0}
+        self.total_cost = {'file_reads': 0, 'clock_reads': 0, 'sampler_reads': 0}
+        self.ticks      = 0
+
+
+    ## Return content of file from procfs (and count the read).
+    ## ERROR RETURN:
+    ## ''
+    def read(self, name: str):
+        file = f"{self.proc_dir}/{name}"
+        self.cost['file_reads'] += 1
+
+        try:
+            with open(file, 'r') as f:
+                return f.read()
+        except Exception:
+            logging.error(f"File \'{file}\' could not be read!")
+            return ""
+
+
+    ## Return dictionary with values from '/proc/meminfo' content in bytes.
+    ## RETURN:
+    ## {'MemTotal': 16646635520, 'MemFree': 9862660096, ...}
+    def parse_meminfo(self, text: str):
+        meminfo = {}
+
+        ## Line format: 'MemTotal:       16256480 kB'.
+        for line in text.splitlines():
+            values = line.split()
+            if len(values) < 2:
+                continue
+
+            ## Values with 'kB' suffix are converted to bytes.
+            if len(values) == 3:
+                meminfo[values[0][:-1]] = int(values[1]) * 1024
+            else:
+                meminfo[values[0][:-1]] = int(values[1])
+
+        return meminfo
+
+
+    ## Return dictionary with 'avg10' of 'some' and 'full' pressure lines
+    ## (share of time in percentage some or all tasks were stalled) of
+    ## '/proc/pressure/*' or cgroup '*.pressure' content.
+    ## RETURN:
+    ## {'some': 2.21, 'full': 0.0}
+    @staticmethod
+    def parse_pressure(data: bytes):
+        pressure = {}
+        for line in data.splitlines():
+            fields = line.split()
+            if len(fields) > 1 and fields[1].startswith(b'avg10='):
+                pressure[fields[0].decode()] = float(fields[1][6:])
+        return pressure
+
+
+    ## Add reads done outside of snapshot in this tick to its cost.
+    def count(self, key: str, reads: int):
+        self.cost[key] += reads
+        self.total_cost[key] += reads
+
+
+    ## Read all kernel sources and the clock once.
+    def take(self):
+        self.cost = {'file_reads': 0, 'clock_reads': 0, 'sampler_reads': 0}
+
+        ## Read clock once for whole tick.
+        self.clock = time.time()
+        self.localtime = time.localtime(self.clock)
+        self.cost['clock_reads'] += 1
+
+        ## Read kernel sources.
+        self.meminfo = self.parse_meminfo(self.read('meminfo'))
+        self.stat = self.read('stat')
+        self.diskstats = self.read('diskstats')
+        self.loadavg = self.read('loadavg')
+        self.pressure = {n: self.parse_pressure(self.read(f"pressure/{n}").encode()) for n in self.pressure_names}
+        try:
+            self.uptime = float(self.read('uptime').split()[0])
+        except Exception:
+            self.uptime = 0.0
+
+        ## Update total cost.
+        self.ticks += 1
+        for key in self.cost:
+            self.total_cost[key] += self.cost[key]
+
+
+############################################################
+##                      CPU Sampler                       ##
+############################################################
+## CpuSampler reads CPU time counters from '/proc/stat' and computes
+## utilization from difference against previous read. Nothing is waited for,
+## so result covers whole time between two samples. Counters of all cores are
+## kept in one flat array (FIELDS per core, by core number) and per-core
+## results are arrays too, so many-core machine does not allocate list or
+## dictionary per core every tick. Current frequency of every core is read
+## from cpufreq files kept open.
+class CpuSampler:
+    ## Columns of 'cpu' lines in '/proc/stat' (see 'man 5 proc'). Columns
+    ## 'guest' and 'guest_nice' are already included in 'user' and 'nice'.
+    FIELDS = ('user', 'nice', 'system', 'idle', 'iowait', 'irq', 'softirq', 'steal')
+    WIDTH = len(FIELDS)
+
+    def __init__(self, proc_dir: str = "/proc", sys_dir: str = "/sys"):
+        ## File with CPU time counters.
+        self.file = f"{proc_dir}/stat"
+
+        ## Directory with cores and open 'scaling_cur_freq' files by core
+        ## number (opened on first read).
+        self.cpu_dir = f"{sys_dir}/devices/system/cpu"
+        self.freq_files = None
+
+        ## Number of reads of 'scaling_cur_freq' files.
+        self.reads = 0
+
+        ## Counters from previous sample (first sample is taken right away).
+        self.previous = self.counters()
+
+
+    ## Return tuple with counters (in USER_HZ) of whole CPU and list with
+    ## array of every column (FIELDS) with values of all cores (index is core
+    ## number, offline cores are zeros) parsed from '/proc/stat' content.
+    ## RETURN:
+    ## (array('q', [4048, 0, 860, 60608, 260, 0, 0, 32]),
+    ## [array('q', [2024, 2024]), array('q', [0, 0]), ..., array('q', [16, 16])])
+    def parse(self, text: str):
+        width = self.WIDTH
+
+        ## CPU lines are always at the beginning of the file and (normally)
+        ## have the same number of columns, so whole block is split at once.
+        end = 0
+        while text.startswith('cpu', end):
+            end = text.find('\n', end) + 1
+            if end == 0:
+                end = len(text)
+                break
+        tokens = text[:end].split()
+        if not tokens:
+            return array.array('q', bytes(8 * width)), [array.array('q') for _ in range(width)]
+        first = text.split('\n', 1)[0]
+        step = len(first.split())
+        if len(tokens) % step != 0:
+            return self.parse_lines(text[:end])
+
+        total = array.array('q', map(int, tokens[1:min(width, step - 1) + 1]))
+        total.frombytes(bytes(8 * (width - len(total))))
+        columns = [array.array('q', map(int, tokens[step + 1 + i::step])) if i < step - 1 else
+                   array.array('q', bytes(8 * (len(tokens) // step - 1))) for i in range(width)]
+
+        ## Spread values to core numbers, if some cores are offline.
+        cores = [int(name[3:]) for name in tokens[step::step]]
+        if cores and cores[-1] != len(cores) - 1:
+            for i, column in enumerate(columns):
+                spread = array.array('q', bytes(8 * (cores[-1] + 1)))
+                for core, value in zip(cores, column):
+                    spread[core] = value
+                columns[i] = spread
+
+        return total, columns
+
+
+    ## Return the same as parse() for CPU lines, which do not have the same
+    ## number of columns (each line is split alone).
+    ## RETURN:
+    ## (array('q', [4048, 0, 860, 60608, 260, 0, 0, 32]),
+    ## [array('q', [2024, 2024]), array('q', [0, 0]), ..., array('q', [16, 16])])
+    def parse_lines(self, text: str):
+        width = self.WIDTH
+        total = array.array('q', bytes(8 * width))
+        cores = {}
+        for line in text.splitlines():
+            if not line.startswith('cpu'):
+                break
+            fields = line.split()
+            values = [int(v) for v in fields[1:width + 1]] + [0] * (width + 1 - len(fields))
+            if fields[0] == 'cpu':
+                total = array.array('q', values)
+            else:
+                cores[int(fields[0][3:])] = values
+
+        columns = [array.array('q', bytes(8 * (max(cores) + 1 if cores else 0))) for _ in range(width)]
+        for core, values in cores.items():
+            for i, value in enumerate(values):
+                columns[i][core] = value
+
+        return total, columns
+
+
+    ## Return tuple with current CPU time counters (see parse()).
+    ## ERROR RETURN:
+    ## (array('q'), array('q'))
+    def counters(self, text: str = None):
+        ## Read '/proc/stat' only if content was not passed.
+        if text is None:
+            try:
+                with open(self.file, 'r') as f:
+                    text = f.read()
+            except Exception:
+                logging.error(f"File \'{self.file}\' could not be read!")
+                return array.array('q'), [array.array('q') for _ in range(self.WIDTH)]
+
+        return self.parse(text)
+
+
+    ## Return float of CPU utilization in percentage [0.0, 100.0] between two
+    ## counter lists.
+    ## RETURN:
+    ## 27.8
+    def busy(self, old, new):
+        delta = [n - o for n, o in zip(new, old)]
+        total = sum(delta)
+
+        ## Counters did not move (or went backwards after CPU hotplug).
+        if total <= 0:
+            return 0.0
+
+        ## Idle time is 'idle' + 'iowait'.
+        idle = delta[3] + delta[4]
+        return round(100.0 * (total - idle) / total, 1)
+
+
+    ## Return dictionary with minimum, maximum, mean and standard deviation
+    ## of array of per-core values (computed by builtins over whole array).
+    ## RETURN:
+    ## {'min': 25.4, 'max': 30.2, 'mean': 27.8, 'stdev': 2.4}
+    @staticmethod
+    def stats(values):
+        count = len(values)
+        if count == 0:
+            return {'min': 0.0, 'max': 0.0, 'mean': 0.0, 'stdev': 0.0}
+
+        mean = sum(values) / count
+        variance = max(sum(map(operator.mul, values, values)) / count - mean * mean, 0.0)
+        return {'min': min(values), 'max': max(values), 'mean': round(mean, 1), 'stdev': round(variance ** 0.5, 1)}
+
+
+    ## Return array with current frequency of every core in MHz (index is
+    ## core number, 0.0 for offline cores).
+    ## RETURN:
+    ## array('d', [2100.0, 3400.0])
+    ## ERROR RETURN:
+    ## array('d') (no cpufreq driver, e.g. in virtual machine)
+    def frequencies(self):
+        if self.freq_files is None:
+            self.freq_files = {}
+            try:
+                names = [n for n in os.listdir(self.cpu_dir) if n.startswith('cpu') and n[3:].isdigit()]
+            except OSError:
+                names = []
+            for name in names:
+                try:
+                    self.freq_files[int(name[3:])] = os.open(f"{self.cpu_dir}/{name}/cpufreq/scaling_cur_freq", os.O_RDONLY | os.O_CLOEXEC)
+                except OSError:
+                    continue
+
+        frequencies = array.array('d', bytes(8 * (max(self.freq_files, default=-1) + 1)))
+        self.reads += len(self.freq_files)
+        for core, fd in self.freq_files.items():
+            try:
+                frequencies[core] = int(os.pread(fd, 32, 0)) / 1000.0
+            except (OSError, ValueError):
+                continue
+
+        return frequencies
+
+
+    ## Return dictionary with CPU utilization since previous sample and store
+    ## current counters as new previous sample.
+    ## RETURN:
+    ## {'total': 27.8, 'user': 20.1, 'system': 6.9, 'iowait': 0.5,
+    ## 'steal': 0.0, 'per_core': array('d', [30.2, 25.4])}
+    def sample(self, text: str = None):
+        ## Initialize data with default values.
+        data = {
+            'total':    0.0,
+            'user':     0.0,
+            'system':   0.0,
+            'iowait':   0.0,
+            'steal':    0.0,
+            'per_core': array.array('d')
+        }
+
+        current = self.counters(text)
+        previous = self.previous
+        self.previous = current
+
+        ## Whole CPU.
+        old, new = previous[0], current[0]
+        if old and new:
+            data['total'] = self.busy(old, new)
+
+            ## Share of single columns.
+            delta = [n - o for n, o in zip(new, old)]
+            total = sum(delta)
+            if total > 0:
+                for name in ('user', 'system', 'iowait', 'steal'):
+                    i = self.FIELDS.index(name)
+                    data[name] = round(100.0 * delta[i] / total, 1)
+
+        ## Every core, computed column by column over all cores at once
+        ## (cores going on/offline are 0.0 for one sample: offline core has
+        ## zero counters in previous sample, which must not be subtracted).
+        old, new = previous[1], current[1]
+        cores = len(new[0])
+        if len(old[0]) != cores:
+            old = [o[:cores] + n[len(o):] for o, n in zip(old, new)]
+        delta = [array.array('q', map(operator.sub, n, o)) for n, o in zip(new, old)]
+        total, old_total = delta[0], old[0]
+        for column, old_column in zip(delta[1:], old[1:]):
+            total = array.array('q', map(operator.add, total, column))
+            old_total = array.array('q', map(operator.add, old_total, old_column))
+        busy = map(operator.sub, total, map(operator.add, delta[3], delta[4]))
+        data['per_core'] = array.array('d', (round(100.0 * b / t, 1) if t > 0 and o > 0 else 0.0
+                                             for b, t, o in zip(busy, total, old_total)))
+
+        return data
+
+
+############################################################
+##                      Disk Sampler                      ##
+############################################################
+## DiskSampler reports usage of mounted filesystems (statvfs) and I/O of block
+## devices computed from difference of '/proc/diskstats' counters against
+## previous sample. Mount table is parsed only after kernel signals change of
+## '/proc/self/mountinfo' (poll() returns POLLPRI), bind mounts of one
+## filesystem are measured once and pseudo filesystems are skipped. Network
+## filesystems are skipped too unless enabled, statvfs of unreachable server
+## would block whole sysinfo.
+class DiskSampler:
+    ## Filesystems without disk usage.
+    PSEUDO_FS = frozenset((
+        'autofs', 'binfmt_misc', 'bpf', 'cgroup', 'cgroup2', 'configfs', 'debugfs', 'devpts', 'devtmpfs',
+        'efivarfs', 'fusectl', 'hugetlbfs', 'mqueue', 'nsfs', 'proc', 'pstore', 'ramfs', 'rpc_pipefs',
+        'securityfs', 'selinuxfs', 'sysfs', 'tracefs'
+    ))
+
+    ## Filesystems which may hang on statvfs (also every 'fuse.*').
+    NETWORK_FS = frozenset((
+        '9p', 'afs', 'ceph', 'cifs', 'davfs', 'fuse', 'glusterfs', 'lustre', 'ncpfs', 'nfs', 'nfs4', 'smb3',
+        'smbfs', 'sshfs'
+    ))
+
+    ## Columns of '/proc/diskstats' after device name (see kernel
+    ## 'Documentation/admin-guide/iostats.rst'), times are in ms.
+    FIELDS = ('reads', 'reads_merged', 'read_sectors', 'read_time', 'writes', 'writes_merged',
+              'write_sectors', 'write_time', 'in_flight', 'io_time', 'weighted_time')
+
+    ## Size of sector in '/proc/diskstats' (always 512 B, whatever the
+    ## device uses).
+    SECTOR = 512
+
+    def __init__(self, proc_dir: str = "/proc", network: bool = False, timeout: float = 2.0):
+        ## Network filesystems are measured in separate thread and given up
+        ## after timeout, thread still hanging in statvfs by mount point.
+        self.network = network
+        self.timeout = timeout
+        self.hanging = {}
+
+        ## Mount table watched for changes.
+        self.mountinfo_file = f"{proc_dir}/self/mountinfo"
+        self.mountinfo = None
+        self.poller = select.poll()
+
+        ## Mounted filesystems by device number from last parse of mount table
+        ## and number of parses.
+        self.mounts = {}
+        self.parses = 0
+
+        ## Number of system calls reading mount table (polls and reads) and
+        ## filesystem usage (statvfs).
+        self.reads = 0
+
+        ## Counters of every device from previous sample and its time.
+        self.previous = {}
+        self.time = None
+
+        ## Device names by device number ('8:1': 'sda1').
+        self.names = {}
+
+
+    ## Return dictionary with filesystems by device number parsed from
+    ## '/proc/self/mountinfo' content (pseudo filesystems are skipped). Every
+    ## filesystem is listed once with all its mount points (bind mounts).
+    ## RETURN:
+    ## {'254:0': {'mount': '/', 'mounts': ['/', '/srv/www'], 'source': '/dev/vda',
+    ## 'fstype': 'ext4'}}
+    def parse_mountinfo(self, text: str):
+        mounts = {}
+        numbers = {}
+
+        ## Line format: '28 1 254:0 / / rw,relatime - ext4 /dev/vda rw'
+        ## (optional fields end with '-', spaces in paths are '\040').
+        for line in text.splitlines():
+            left, _, right = line.partition(' - ')
+            left, right = left.split(), right.split()
+            if len(left) < 5 or len(right) < 2:
+                continue
+            number, mount = left[2], re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)), left[4])
+
+            ## Later mount on the same path hides the earlier one.
+            hidden = mounts.get(numbers.get(mount))
+            if hidden is not None:
+                hidden['mounts'].remove(mount)
+                if not hidden['mounts']:
+                    del mounts[numbers[mount]]
+                elif hidden['mount'] == mount:
+                    hidden['mount'] = hidden['mounts'][0]
+            numbers[mount] = number
+            if right[0] in self.PSEUDO_FS:
+                continue
+
+            if number in mounts:
+                mounts[number]['mounts'].append(mount)
+            else:
+                mounts[number] = {'mount': mount, 'mounts': [mount], 'source': right[1], 'fstype': right[0]}
+
+        return mounts
+
+
+    ## Return dictionary with mounted filesystems (see parse_mountinfo()),
+    ## mount table is read only if it changed since last call.
+    ## ERROR RETURN:
+    ## {}
+    def filesystems(self):
+        try:
+            if self.mountinfo is None:
+                self.mountinfo = open(self.mountinfo_file, 'r')
+                self.poller.register(self.mountinfo, select.POLLPRI | select.POLLERR)
+            else:
+                self.reads += 1
+                if not self.poller.poll(0):
+                    return self.mounts
+
+            ## Reading whole file again clears the event.
+            self.mountinfo.seek(0)
+            self.mounts = self.parse_mountinfo(self.mountinfo.read())
+            self.parses += 1
+            self.reads += 1
+        except Exception:
+            logging.error(f"File \'{self.mountinfo_file}\' could not be read!")
+            self.close()
+
+        return self.mounts
+
+
+    ## Return True if filesystem type is network filesystem.
+    @classmethod
+    def is_network(cls, fstype: str):
+        return fstype in cls.NETWORK_FS or fstype.startswith('fuse.')
+
+
+    ## Return os.statvfs() result of network filesystem. Call runs in separate
+    ## thread, so unreachable server blocks only that thread, and is not
+    ## repeated while previous call of the same mount point still hangs.
+    ## ERROR RETURN:
+    ## None
+    def statvfs_network(self, mount: str):
+        thread = self.hanging.get(mount)
+        if thread is not None:
+            if thread.is_alive():
+                return None
+            del self.hanging[mount]
+
+        result = []
+        def run():
+            try:
+                result.append(os.statvfs(mount))
+            except OSError:
+                pass
+
+        thread = threading.Thread(target=run, name='statvfs', daemon=True)
+        thread.start()
+        thread.join(self.timeout)
+        if thread.is_alive():
+            logging.warning(f"Filesystem \'{mount}\' does not respond, its usage is skipped!")
+            self.hanging[mount] = thread
+            return None
+
+        return result[0] if result else None
+
+
+    ## Return list of dictionaries with usage of every mounted filesystem
+    ## (sizes in bytes, 'free' is space available to unprivileged users).
+    ## RETURN:
+    ## [{'mount': '/', 'mounts': ['/'], 'device': 'vda', 'source': '/dev/vda',
+    ## 'fstype': 'ext4', 'total': 105089261568, 'used': 26589700096,
+    ## 'free': 78482706432, 'used_pct': 25.3, 'inodes_used_pct': 3.1}]
+    def usage(self):
+        data = []
+        for number, fs in self.filesystems().items():
+            if self.is_network(fs['fstype']):
+                if not self.network:
+                    continue
+                self.reads += 1
+                st = self.statvfs_network(fs['mount'])
+            else:
+                self.reads += 1
+                try:
+                    st = os.statvfs(fs['mount'])
+                except OSError:
+                    continue
+            if st is None or st.f_blocks == 0:
+                continue
+
+            total = st.f_blocks * st.f_frsize
+            used = (st.f_blocks - st.f_bfree) * st.f_frsize
+            free = st.f_bavail * st.f_frsize
+            data.append({
+                **fs,
+                'mounts':          list(fs['mounts']),
+                'device':          self.names.get(number),
+                'total':           total,
+                'used':            used,
+                'free':            free,
+                ## Same as 'df' (reserved blocks are not counted as free).
+                'used_pct':        round(100.0 * used / (used + free), 1) if used + free else 0.0,
+                'inodes_used_pct': round(100.0 * (st.f_files - st.f_ffree) / st.f_files, 1) if st.f_files else 0.0
+            })
+
+        return data
+
+
+    ## Return dictionary with counters of every block device parsed from
+    ## '/proc/diskstats' content (devices without any I/O are skipped) and
+    ## remember their device numbers.
+    ## RETURN:
+    ## {'vda': [24516, 7012, 1811310, 9436, 57122, 61650, 2385000, 61124, 0, 61352, 72920]}
+    def parse(self, text: str):
+        counters = {}
+        count = len(self.FIELDS)
+
+        ## Line format: '254  0 vda 24516 7012 1811310 9436 57122 ...'.
+        for line in text.splitlines():
+            values = line.split()
+            if len(values) < count + 3 or (values[3] == '0' and values[7] == '0'):
+                continue
+            counters[values[2]] = list(map(int, values[3:count + 3]))
+            if values[2] not in self.previous:
+                self.names[f"{values[0]}:{values[1]}"] = values[2]
+
+        return counters
+
+
+    ## Return list of dictionaries with I/O of every block device since
+    ## previous sample and store current counters as new previous sample.
+    ## 'queue_depth' is average number of requests in flight, 'await_ms'
+    ## average time of request (queue and service) and 'util_pct' share of
+    ## time device was busy.
+    ## RETURN:
+    ## [{'device': 'vda', 'read_iops': 12.0, 'write_iops': 40.5,
+    ## 'read_bytes': 98304.0, 'write_bytes': 1638400.0, 'queue_depth': 0.21,
+    ## 'await_ms': 4.1, 'util_pct': 3.5, 'in_flight': 0}]
+    def sample(self, text: str, now: float = None):
+        now = time.monotonic() if now is None else now
+        current = self.parse(text)
+        previous, elapsed = self.previous, (now - self.time) if self.time is not None else 0.0
+        self.previous, self.time = current, now
+
+        data = []
+        if elapsed <= 0:
+            return data
+
+        for name, new in current.items():
+            if name not in previous:
+                continue
+            ## Counters going backwards (device recreated, 32-bit wrap) are
+            ## counted from zero.
+            d = [n - o if n >= o else n for n, o in zip(new, previous[name])]
+            ios = d[0] + d[4]
+            data.append({
+                'device':      name,
+                'read_iops':   round(d[0] / elapsed, 1),
+                'write_iops':  round(d[4] / elapsed, 1),
+                'read_bytes':  round(d[2] * self.SECTOR / elapsed, 1),
+                'write_bytes': round(d[6] * self.SECTOR / elapsed, 1),
+                'queue_depth': round(d[10] / (elapsed * 1000.0), 2),
+                'await_ms':    round((d[3] + d[7]) / ios, 2) if ios else 0.0,
+                'util_pct':    round(min(d[9] / (elapsed * 10.0), 100.0), 1),
+                'in_flight':   new[8]
+            })
+
+        return data
+
+
+    ## Stop watching mount table.
+    def close(self):
+        if self.mountinfo is not None:
+            try:
+                self.poller.unregister(self.mountinfo)
+            except (KeyError, ValueError):
+                pass
+            self.mountinfo.close()
+            self.mountinfo = None
+
+
+############################################################
+##                    Process Sampler                     ##
+############################################################
+## ProcessSampler finds processes using most CPU, memory and disk I/O. Fields
+## which do not change while process lives (command line, executable, user,
+## start time) are read once per process, keyed by (pid, start time), so
+## reused PID is detected. Every tick reads only '/proc/<pid>/stat' (CPU time,
+## RSS) and '/proc/<pid>/io' of every process (process can issue I/O without
+## getting whole clock tick of CPU time). I/O rate is computed against last
+## successful read of 'io', with time of that read.
+## Top processes are selected by bounded heap (heapq.nlargest()).
+class ProcessSampler:
+    ## Clock ticks per second and page size (units of '/proc/<pid>/stat').
+    CLK_TCK = os.sysconf('SC_CLK_TCK')
+    PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+    def __init__(self, proc_dir: str = "/proc", top: int = 10):
+        self.proc_dir = proc_dir
+        self.top = top
+
+        ## Static fields by pid: (start time, fields).
+        self.static = {}
+
+        ## Counters by pid from previous tick: (start time, CPU ticks, I/O
+        ## bytes read, I/O bytes written, time of last read of 'io') and time
+        ## of tick.
+        self.previous = {}
+        self.time = None
+
+        ## User names by uid.
+        self.users = {}
+
+        ## Time of boot (start times are relative to it).
+        self.boot_time = psutil.boot_time()
+
+
+    ## Return content of file of process (None if process is gone).
+    def read(self, pid: str, name: str):
+        try:
+            fd = os.open(f"{self.proc_dir}/{pid}/{name}", os.O_RDONLY)
+        except OSError:
+            return None
+        try:
+            return os.read(fd, 4096)
+        except OSError:
+            return None
+        finally:
+            os.close(fd)
+
+
+    ## Return name of user with passed uid (uid if it has no name).
+    ## RETURN:
+    ## 'root'
+    def user(self, uid: int):
+        if uid not in self.users:
+            try:
+                self.users[uid] = pwd.getpwuid(uid).pw_name
+            except KeyError:
+                self.users[uid] = str(uid)
+        return self.users[uid]
+
+
+    ## Return dictionary with fields of process which do not change while it
+    ## lives ('exe' is '' for kernel threads and processes of other users,
+    ## if NEMESIS is not root).
+    ## RETURN:
+    ## {'pid': 812, 'name': 'nginx', 'user': 'www-data',
+    ## 'cmdline': 'nginx: worker process', 'exe': '/usr/sbin/nginx',
+    ## 'started': '2022-01-16 14:08:01'}
+    def static_fields(self, pid: str, name: str, start: int):
+        cmdline = self.read(pid, 'cmdline') or b''
+        try:
+            exe = os.readlink(f"{self.proc_dir}/{pid}/exe")
+        except OSError:
+            exe = ""
+        try:
+            user = self.user(os.stat(f"{self.proc_dir}/{pid}").st_uid)
+        except OSError:
+            user = ""
+
+        return {
+            'pid':     int(pid),
+            'name':    name,
+            'user':    user,
+            'cmdline': cmdline.rstrip(b'\0').replace(b'\0', b' ').decode(errors='replace'),
+            'exe':     exe,
+            'started': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.boot_time + start / self.CLK_TCK))
+        }
+
+
+    ## Return dictionary with number of processes and threads and lists of top
+    ## processes by CPU utilization (percentage of one core), RSS (bytes) and
+    ## disk I/O (bytes per second) since previous call.
+    ## RETURN:
+    ## {'processes': 312, 'threads': 1204,
+    ## 'top_cpu': [{'pid': 812, 'name': 'nginx', ..., 'cpu_pct': 41.0,
+    ## 'rss': 104857600, 'read_bytes': 0.0, 'write_bytes': 40960.0}],
+    ## 'top_rss': [...], 'top_io': [...]}
+    def sample(self, now: float = None):
+        now = time.monotonic() if now is None else now
+        elapsed = (now - self.time) if self.time is not None else 0.0
+        previous, static = self.previous, self.static
+        current = {}
+        rows = []
+        threads = 0
+
+        try:
+            pids = [p for p in os.listdir(self.proc_dir) if p.isdigit()]
+        except OSError:
+            logging.error(f"Directory \'{self.proc_dir}\' could not be read!")
+            pids = []
+
+        for pid in pids:
+            stat = self.read(pid, 'stat')
+            if stat is None:
+                continue
+
+            ## Format: '812 (nginx) S 1 812 ...', name can contain spaces and
+            ## parentheses, so fields are counted from the last ')'.
+            head, _, tail = stat.rpartition(b')')
+            fields = tail.split()
+            try:
+                ticks = int(fields[11]) + int(fields[12])
+                threads += int(fields[17])
+                start = int(fields[19])
+                rss = int(fields[21]) * self.PAGE_SIZE
+            except (IndexError, ValueError):
+                continue
+
+            ## Same pid with other start time is new process.
+            if pid not in static or static[pid][0] != start:
+                static[pid] = (start, self.static_fields(pid, head.partition(b'(')[2].decode(errors='replace'), start))
+            old = previous.get(pid)
+            if old is None or old[0] != start:
+                old = None
+
+            ## Counters of 'io' which could not be read (process of other
+            ## user) are kept with time of their last read.
+            read_bytes, write_bytes, io_time = (old[2], old[3], old[4]) if old is not None else (0, 0, None)
+            io = self.read(pid, 'io')
+            if io is not None:
+                for line in io.splitlines():
+                    if line.startswith(b'read_bytes'):
+                        read_bytes = int(line.split()[1])
+                    elif line.startswith(b'write_bytes'):
+                        write_bytes = int(line.split()[1])
+                io_time = now
+            current[pid] = (start, ticks, read_bytes, write_bytes, io_time)
+
+            ## Rows: (pid, CPU ticks, RSS, read B/s, written B/s).
+            if old is not None and elapsed > 0:
+                io_elapsed = (io_time - old[4]) if io_time is not None and old[4] is not None else 0.0
+                if io_elapsed > 0:
+                    rows.append((pid, ticks - old[1], rss, max(read_bytes - old[2], 0) / io_elapsed,
+                                 max(write_bytes - old[3], 0) / io_elapsed))
+                else:
+                    rows.append((pid, ticks - old[1], rss, 0.0, 0.0))
+            else:
+                rows.append((pid, 0, rss, 0.0, 0.0))
+
+        ## Forget processes which exited.
+        for pid in static.keys() - current.keys():
+            del static[pid]
+        self.previous, self.time = current, now
+
+        def record(row: tuple):
+            return {
+                **static[row[0]][1],
+                'cpu_pct':     round(100.0 * row[1] / self.CLK_TCK / elapsed, 1) if elapsed > 0 else 0.0,
+                'rss':         row[2],
+                'read_bytes':  round(row[3], 1),
+                'write_bytes': round(row[4], 1)
+            }
+
+        return {
+            'processes': len(current),
+            'threads':   threads,
+            'top_cpu':   [record(r) for r in heapq.nlargest(self.top, rows, key=lambda r: r[1]) if r[1] > 0],
+            'top_rss':   [record(r) for r in heapq.nlargest(self.top, rows, key=lambda r: r[2])],
+            'top_io':    [record(r) for r in heapq.nlargest(self.top, rows, key=lambda r: r[3] + r[4]) if r[3] + r[4] > 0]
+        }
+
+
+############################################################
+##                     Cgroup Sampler                     ##
+############################################################
+## CgroupSampler reports CPU, memory, I/O and pressure (PSI) of every cgroup
+## in cgroup v2 hierarchy. Tree is walked once, then cgroups created and
+## removed are followed by inotify (every cgroup directory is watched), so
+## tick only reads stat files of known cgroups. Stat files are kept open and
+## re-read from offset 0 (files missing because controller is not enabled
+## are skipped). CPU and I/O rates are computed from difference against
+## previous tick.
+class CgroupSampler:
+    ## Files read every tick (kept open).
+    FILES = ('cpu.stat', 'memory.current', 'memory.stat', 'io.stat', 'cpu.pressure', 'memory.pressure', 'io.pressure')
+
+    ## inotify flags (see 'man 7 inotify').
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_Q_OVERFLOW = 0x00004000
+    IN_ISDIR = 0x40000000
+    IN_ONLYDIR = 0x01000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    EVENT = struct.Struct('=iIII')
+
+    ## Fields of 'io.stat' summed over devices (index in parse_io() result).
+    IO_FIELDS = {b'rbytes': 0, b'wbytes': 1, b'rios': 2, b'wios': 3}
+
+    def __init__(self, root: str = ""):
+        ## Root of cgroup v2 hierarchy.
+        self.root = root or self.find_root()
+
+        ## Open stat files by cgroup path (relative to root, '/' is root
+        ## itself): {name: fd}.
+        self.cgroups = {}
+
+        ## Counters by cgroup from previous tick: (CPU usec, user usec,
+        ## system usec, throttled usec, read B, written B, reads, writes) and
+        ## time of tick.
+        self.previous = {}
+        self.time = None
+
+        ## inotify descriptor and watched cgroups by watch descriptor.
+        self.inotify = None
+        self.watches = {}
+        self.events = 0
+        self.walks = 0
+
+        if self.root:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            self.add_watch = libc.inotify_add_watch
+            self.add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+            self.inotify = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+            if self.inotify < 0:
+                logging.warning("inotify is not available! Cgroup tree is walked every tick.")
+                self.inotify = None
+            self.walk('/')
+
+
+    ## Return mount point of cgroup v2 hierarchy ('/sys/fs/cgroup', or
+    ## '/sys/fs/cgroup/unified' on hybrid systems).
+    ## RETURN:
+    ## '/sys/fs/cgroup'
+    ## ERROR RETURN:
+    ## ''
+    @staticmethod
+    def find_root():
+        try:
+            with open('/proc/self/mountinfo', 'r') as f:
+                for line in f:
+                    left, _, right = line.partition(' - ')
+                    if right.startswith('cgroup2 '):
+                        return left.split()[4]
+        except OSError:
+            logging.error("File '/proc/self/mountinfo' could not be read!")
+        return ""
+
+
+    ## Return absolute path of cgroup.
+    def path(self, name: str):
+        return self.root if name == '/' else f"{self.root}{name}"
+
+
+    ## Start following cgroup and all cgroups below it (new cgroup can get
+    ## children before its watch is added, so whole subtree is walked).
+    def walk(self, name: str):
+        self.walks += 1
+        for directory, subdirectories, _ in os.walk(self.path(name)):
+            self.add(directory[len(self.root):] or '/')
+
+
+    ## Walk whole tree again (events were lost or inotify is not available).
+    ## Only cgroups no longer found are removed, others keep their stat files
+    ## and previous counters, so their rates are not lost.
+    def rewalk(self):
+        self.walks += 1
+        found = set()
+        for directory, subdirectories, _ in os.walk(self.root):
+            name = directory[len(self.root):] or '/'
+            found.add(name)
+            self.add(name)
+        for name in [c for c in self.cgroups if c not in found]:
+            self.remove(name)
+
+
+    ## Open stat files of cgroup and watch its directory.
+    def add(self, name: str):
+        if name in self.cgroups:
+            return
+
+        files = {}
+        for file in self.FILES:
+            try:
+                files[file] = os.open(f"{self.path(name)}/{file}", os.O_RDONLY | os.O_CLOEXEC)
+            except OSError as e:
+                if e.errno == errno.EMFILE:
+                    logging.warning(f"No descriptors left, cgroup '{name}' is reported without '{file}'!")
+                continue
+        self.cgroups[name] = files
+
+        if self.inotify is not None:
+            wd = self.add_watch(self.inotify, self.path(name).encode(),
+                                self.IN_CREATE | self.IN_DELETE | self.IN_MOVED_FROM | self.IN_MOVED_TO | self.IN_ONLYDIR)
+            if wd >= 0:
+                self.watches[wd] = name
+
+
+    ## Close stat files of cgroup and of all cgroups below it (watches of
+    ## removed directories are removed by kernel).
+    def remove(self, name: str):
+        prefix = name.rstrip('/') + '/'
+        for cgroup in [c for c in self.cgroups if c == name or c.startswith(prefix)]:
+            for fd in self.cgroups.pop(cgroup).values():
+                os.close(fd)
+            self.previous.pop(cgroup, None)
+        for wd in [wd for wd, c in self.watches.items() if c == name or c.startswith(prefix)]:
+            del self.watches[wd]
+
+
+    ## Apply cgroups created and removed since previous call (all queued
+    ## inotify events).
+    def follow(self):
+        if self.inotify is None:
+            self.rewalk()
+            return
+
+        while True:
+            try:
+                data = os.read(self.inotify, 65536)
+            except BlockingIOError:
+                return
+
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = self.EVENT.unpack_from(data, offset)
+                name = data[offset + self.EVENT.size:offset + self.EVENT.size + length].rstrip(b'\0').decode(errors='replace')
+                offset += self.EVENT.size + length
+                self.events += 1
+
+                ## Events were lost, only full walk is reliable.
+                if mask & self.IN_Q_OVERFLOW:
+                    logging.warning("Cgroup events were lost! Cgroup tree is walked again.")
+                    self.rewalk()
+                    continue
+                if not (mask & self.IN_ISDIR) or wd not in self.watches:
+                    continue
+
+                parent = self.watches[wd]
+                cgroup = f"{'' if parent == '/' else parent}/{name}"
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    try:
+                        self.walk(cgroup)
+                    except OSError:
+                        pass
+                else:
+                    self.remove(cgroup)
+
+
+    ## Return dictionary with 'key value' lines of passed content.
+    ## RETURN:
+    ## {'usage_usec': 241547778, 'user_usec': 199297657, ...}
+    @staticmethod
+    def parse_keyed(data: bytes):
+        values = {}
+        for line in data.splitlines():
+            key, _, value = line.partition(b' ')
+            try:
+                values[key.decode()] = int(value)
+            except ValueError:
+                continue
+        return values
+
+
+    ## Return list with sums of bytes read and written and of read and write
+    ## requests of all devices in 'io.stat' content.
+    ## RETURN:
+    ## [98304, 1638400, 24, 400]
+    @staticmethod
+    def parse_io(data: bytes):
+        total = [0, 0, 0, 0]
+        for line in data.splitlines():
+            ## Line format: '8:0 rbytes=98304 wbytes=1638400 rios=24 wios=400 ...'.
+            for field in line.split()[1:]:
+                key, _, value = field.partition(b'=')
+                i = CgroupSampler.IO_FIELDS.get(key)
+                if i is not None:
+                    total[i] += int(value)
+        return total
+
+
+    ## Return dictionary with usage of every cgroup since previous call and
+    ## store current counters as new previous sample. CPU is in percentage of
+    ## one core, I/O per second, pressure is 'avg10' of PSI.
+    ## RETURN:
+    ## {'root': '/sys/fs/cgroup', 'count': 214,
+    ## 'cgroups': [{'cgroup': '/system.slice/docker-3f2a.scope', 'cpu_pct': 41.0,
+    ## 'cpu_user_pct': 30.2, 'cpu_system_pct': 10.8, 'throttled_pct': 0.0,
+    ## 'memory': 104857600, 'memory_anon': 73400320, 'memory_file': 28311552,
+    ## 'io_read_bytes': 0.0, 'io_write_bytes': 40960.0, 'io_read_iops': 0.0,
+    ## 'io_write_iops': 10.0, 'pressure': {'cpu': {'some': 2.21, 'full': 0.0},
+    ## 'memory': {...}, 'io': {...}}}]}
+    def sample(self, now: float = None):
+        now = time.monotonic() if now is None else now
+        elapsed = (now - self.time) if self.time is not None else 0.0
+        self.follow()
+
+        current = {}
+        cgroups = []
+        for name, files in list(self.cgroups.items()):
+            content = {}
+            try:
+                for file, fd in files.items():
+                    content[file] = os.pread(fd, 65536, 0)
+            except OSError:
+                ## Cgroup was removed (event was not read yet, or it was
+                ## created again while events were lost, so it is added by
+                ## next walk with new stat files).
+                self.remove(name)
+                continue
+
+            cpu = self.parse_keyed(content.get('cpu.stat', b''))
+            memory = self.parse_keyed(content.get('memory.stat', b''))
+            io = self.parse_io(content.get('io.stat', b''))
+            counters = (cpu.get('usage_usec', 0), cpu.get('user_usec', 0), cpu.get('system_usec', 0),
+                        cpu.get('throttled_usec', 0), *io)
+            current[name] = counters
+
+            old = self.previous.get(name)
+            d = [max(n - o, 0) for n, o in zip(counters, old)] if old is not None and elapsed > 0 else [0] * len(counters)
+            usec = elapsed * 1000000.0 if elapsed > 0 else 1.0
+
+            try:
+                memory_current = int(content['memory.current'])
+            except (KeyError, ValueError):
+                memory_current = None
+
+            cgroups.append({
+                'cgroup':         name,
+                'cpu_pct':        round(100.0 * d[0] / usec, 1),
+                'cpu_user_pct':   round(100.0 * d[1] / usec, 1),
+                'cpu_system_pct': round(100.0 * d[2] / usec, 1),
+                'throttled_pct':  round(100.0 * d[3] / usec, 1),
+                'memory':         memory_current,
+                'memory_anon':    memory.get('anon'),
+                'memory_file':    memory.get('file'),
+                'io_read_bytes':  round(d[4] * 1000000.0 / usec, 1),
+                'io_write_bytes': round(d[5] * 1000000.0 / usec, 1),
+                'io_read_iops':   round(d[6] * 1000000.0 / usec, 1),
+                'io_write_iops':  round(d[7] * 1000000.0 / usec, 1),
+                'pressure':       {resource: SysSnapshot.parse_pressure(content[f"{resource}.pressure"])
+                                   for resource in ('cpu', 'memory', 'io') if f"{resource}.pressure" in content}
+            })
+
+        self.previous, self.time = current, now
+        return {'root': self.root, 'count': len(cgroups), 'cgroups': cgroups}
+
+
+    ## Close stat files and inotify descriptor.
+    def close(self):
+        self.remove('/')
+        if self.inotify is not None:
+            os.close(self.inotify)
+            self.inotify = None
 
 
 ############################################################
 ##                      Network Info                      ##
 ############################################################
 class NetInfo:
-    def __init__(self, interface: str = ""):
+    def __init__(self, interface: str = "", addrs: dict = None, reader = None):
         ## Passed Interface that will be used in all functions.
         self.interface = interface
 
+        ## Reader of '/sys/class/net' attributes (without shared reader, every
+        ## attribute is opened and closed on each read).
+        if reader is None:
+            reader = SysfsReader(keep_open=False)
+        self.reader = reader
+
+        ## Addresses of interface in netifaces format, e.g.
+        ## {netifaces.AF_LINK: [{'addr': '4c:f4:5b:1d:08:24'}], ...}
+        ## (Detected on first use, unless passed by NetSweep.)
+        self.addrs = addrs
+
+
+    ## Return dictionary with addresses of the passed interface. Addresses are
+    ## detected only once per NetInfo instance.
+    ## RETURN:
+    ## {17: [{'addr': '4c:f4:5b:1d:08:24'}],
+    ## 2: [{'addr': '10.0.100.34', 'netmask': '255.255.255.0'}]}
+    ## ERROR RETURN:
+    ## {}
+    def addresses(self):
+        if self.addrs is None:
+            try:
+                self.addrs = netifaces.ifaddresses(self.interface)
+            except Exception:
+                self.addrs = {}
+
+        return self.addrs
+
 
     ########################################
     ##           MAC Addresses            ##
@@ -311,7 +1609,7 @@ class NetInfo:
     def mac(self):
         ## Try to detect MAC address of interface.
         try:
-            return netifaces.ifaddresses(self.interface)[netifaces.AF_LINK][0]['addr']
+            return self.addresses()[netifaces.AF_LINK][0]['addr']
         except Exception:
             return "None"
 
@@ -327,7 +1625,7 @@ class NetInfo:
     def ipv4_addr(self):
         ## Try to detect first IPv4 address of interface.
         try:
-            return netifaces.ifaddresses(self.interface)[netifaces.AF_INET][0]['addr']
+            return self.addresses()[netifaces.AF_INET][0]['addr']
         except Exception:
             return "None"
 
@@ -340,7 +1638,7 @@ class NetInfo:
     def ipv4_mask(self):
         ## Try to detect first IPv4 subnet mask.
         try:
-            return str(netaddr.IPAddress(netifaces.ifaddresses(self.interface)[netifaces.AF_INET][0]['netmask']))
+            return str(netaddr.IPAddress(self.addresses()[netifaces.AF_INET][0]['netmask']))
         except Exception:
             return "None"
 
@@ -353,15 +1651,61 @@ class NetInfo:
     def ipv4_cidr(self):
         ## Try to detect first IPv4 CIDR.
         try:
-            return str(netaddr.IPAddress(netifaces.ifaddresses(self.interface)[netifaces.AF_INET][0]['netmask']).netmask_bits())
+            return str(netaddr.IPAddress(self.addresses()[netifaces.AF_INET][0]['netmask']).netmask_bits())
         except Exception:
             return "None"
 
 
+    ## Return list of all IPv4 addresses (aliases) of the passed interface.
+    ## RETURN:
+    ## [{'addr': '10.0.100.34', 'mask': '255.255.255.0', 'cidr': '24'},
+    ## {'addr': '10.0.100.35', 'mask': '255.255.255.255', 'cidr': '32'}]
+    ## ERROR RETURN:
+    ## []
+    def ipv4_addrs(self):
+        addrs = []
+        for entry in self.addresses().get(netifaces.AF_INET, []):
+            try:
+                mask = netaddr.IPAddress(entry['netmask'])
+                addrs.append({'addr': entry['addr'], 'mask': str(mask), 'cidr': str(mask.netmask_bits())})
+            except Exception:
+                continue
+
+        return addrs
+
+
     ########################################
     ##           IPv6 Addresses           ##
     ########################################
-    ## Yet to be added.
+    ## Return list of all IPv6 addresses of the passed interface with their
+    ## scope: 'global', 'site' (deprecated fec0::/10), 'link' or 'host'.
+    ## RETURN:
+    ## [{'addr': 'fd00::2', 'prefixlen': '64', 'scope': 'global'},
+    ## {'addr': 'fe80::fc:ff:fe00:1', 'prefixlen': '64', 'scope': 'link'}]
+    ## ERROR RETURN:
+    ## []
+    def ipv6_addrs(self):
+        addrs = []
+        for entry in self.addresses().get(netifaces.AF_INET6, []):
+            try:
+                ## Link-local addresses have interface appended ('fe80::1%eth0')
+                ## and netifaces appends prefix length to mask ('ffff::/16').
+                addr = netaddr.IPAddress(entry['addr'].split('%')[0])
+                prefixlen = netaddr.IPAddress(entry['netmask'].split('/')[0]).netmask_bits()
+            except Exception:
+                continue
+
+            if addr.is_loopback():
+                scope = 'host'
+            elif addr.is_link_local():
+                scope = 'link'
+            elif addr in netaddr.IPNetwork('fec0::/10'):
+                scope = 'site'
+            else:
+                scope = 'global'
+            addrs.append({'addr': str(addr), 'prefixlen': str(prefixlen), 'scope': scope})
+
+        return addrs
 
 
     ########################################
@@ -371,10 +1715,8 @@ class NetInfo:
     ## RETURN:
     ## 'True' || 'False'
     def is_wireless(self):
-        file = f"/sys/class/net/{self.interface}/wireless"
-
         ## Interface is wireless if file exists.
-        if os.path.exists(file):
+        if self.reader.exists(self.interface, 'wireless'):
             return "True"
         else:
             return "False"
@@ -408,41 +1750,43 @@ class NetInfo:
         ## 2 | Disconnected  | UP       | down      | 0                  |
         ## 3 | Connected     | DOWN     | down      | <Invalid Argument> |
         ## 4 | Connected     | UP       | up        | 1                  |
-        file = f'/sys/class/net/{self.interface}/carrier'
         ## Protocol is UP, if carrier file is readable.
         try:
-            with open(file, 'r') as f:
-                ## Read first line.
-                f_output = f.read().split('\n')[0]
+            ## Read first line.
+            f_output = self.reader.read(self.interface, 'carrier')
 
-                ## Protocol is UP.
-                data['protocol'] = "UP"
+            ## Protocol is UP.
+            data['protocol'] = "UP"
         except Exception:
-                ## Protocol is DOWN.
-                data['protocol'] = "DOWN"
+            ## Protocol is DOWN.
+            data['protocol'] = "DOWN"
 
         ## Detect carrier state.
-        file = f'/sys/class/net/{self.interface}/operstate'
-        with open(file, 'r') as f:
+        try:
             ## Read first line.
-            f_output = f.read().split('\n')[0]
-            ## N | Carrier (eth) | protocol    | operstate  |
-            ## ================================|============|
-            ## 4 | Connected     | UP          | up (THIS)  |
-            if f_output == 'up':
-                data['carrier'] = "UP"
-            ## N | Carrier (eth) | protocol    | operstate  |
-            ## ================================|============|
-            ## 2 | Disconnected  | UP (THIS)   | down (THIS)|
-            elif (data['protocol'] == "UP") and (f_output == 'down'):
-                data['carrier'] = "DOWN"
-            ## N | Carrier (eth) | protocol    | operstate  |
-            ## ================================|============|
-            ## 1 | Disconnected  | DOWN (THIS) | down       |
-            ## 3 | Connected     | DOWN (THIS) | down       |
-            elif data['protocol'] == "DOWN":
-                ## No way how to determine carrier status when protocol is DOWN.
-                data['carrier'] = "ADMIN_DOWN"
+            f_output = self.reader.read(self.interface, 'operstate')
+        except Exception:
+            ## Interface disappeared, return default values.
+            data['protocol'] = "UNKNOWN"
+            return data
+
+        ## N | Carrier (eth) | protocol    | operstate  |
+        ## ================================|============|
+        ## 4 | Connected     | UP          | up (THIS)  |
+        if f_output == 'up':
+            data['carrier'] = "UP"
+        ## N | Carrier (eth) | protocol    | operstate  |
+        ## ================================|============|
+        ## 2 | Disconnected  | UP (THIS)   | down (THIS)|
+        elif (data['protocol'] == "UP") and (f_output == 'down'):
+            data['carrier'] = "DOWN"
+        ## N | Carrier (eth) | protocol    | operstate  |
+        ## ================================|============|
+        ## 1 | Disconnected  | DOWN (THIS) | down       |
+        ## 3 | Connected     | DOWN (THIS) | down       |
+        elif data['protocol'] == "DOWN":
+            ## No way how to determine carrier status when protocol is DOWN.
+            data['carrier'] = "ADMIN_DOWN"
 
         ## Detect link status from protocol and carrier.
         if (data['protocol'] == "UP") and (data['carrier'] == "UP"):
@@ -466,15 +1810,13 @@ class NetInfo:
             ## Link speed is not supported for wireless devices.
             data['speed'] = "none"
         else:
-            file = f'/sys/class/net/{self.interface}/speed'
             try:
-                with open(file, 'r') as f:
-                    ## Read first line.
-                    f_output = f.read().split('\n')[0]
+                ## Read first line.
+                f_output = self.reader.read(self.interface, 'speed')
 
-                    ## If output is '-1', carrier is DOWN, there is no speed.
-                    if f_output != '-1':
-                        data['speed'] = f_output
+                ## If output is '-1', carrier is DOWN, there is no speed.
+                if f_output != '-1':
+                    data['speed'] = f_output
             except Exception:
                 ## If file could not be opened, keep default 'unknown' value.
                 pass
@@ -484,13 +1826,11 @@ class NetInfo:
             ## Link duplex is not supported for wireless devices.
             data['duplex'] = "none"
         else:
-            file = f'/sys/class/net/{self.interface}/duplex'
             try:
-                with open(file, 'r') as f:
-                    ## Read first line.
-                    f_output = f.read().split('\n')[0]
+                ## Read first line.
+                f_output = self.reader.read(self.interface, 'duplex')
 
-                    data['duplex'] = f_output ## half || full
+                data['duplex'] = f_output ## half || full
             except Exception:
                 ## If file could not be opened, keep default 'unknown' value.
                 pass
@@ -500,99 +1840,4617 @@ class NetInfo:
 
 
 ############################################################
-##                        JSON Data                       ##
+##                      Sysfs Reader                      ##
 ############################################################
-## JsonData class is frontend for pulling info from classes SysInfo and NetInfo.
-class JsonData:
-    ## Return JSON string containing machine system info.
-    ## RETURN:
-    ## {"os": "LINUX", "systime": "2022-01-16 23:03:05 +0100 (CET)",
-    ## "uptime": "0 days, 08:55:21", "boottime": "2022-01-16 14:07:43",
-    ## "cpu_util": 3.7, "ram_util": 21.6, "swap_util": 0.0}
-    def sysinfo(self):
-        ## Create instance of SysInfo class.
-        si = SysInfo()
+## SysfsReader reads attributes of network interfaces from '/sys/class/net'.
+## Attribute files are kept open and re-read with pread() at offset 0, so
+## every next read costs one system call instead of lookup, open, read, close.
+class SysfsReader:
+    def __init__(self, sys_dir: str = "/sys/class/net", keep_open: bool = True):
+        ## Directory with one entry per network interface.
+        self.sys_dir = sys_dir
 
-        data = {
-            'os':        si.os(),
-            'systime':   si.systime(),
-            'uptime':    si.uptime(),
-            'boottime':  si.boottime(),
-            'cpu_util':  si.cpu_util(),
-            'ram_util':  si.ram_util(),
-            'swap_util': si.swap_util()
-        }
+        ## If False, files are closed after every read (no caching).
+        self.keep_open = keep_open
 
-        ## Return dictionary as JSON string.
-        return json.dumps(data)
+        ## Open file descriptors by (interface, attribute).
+        self.fds = {}
 
+        ## Cached existence of attributes by (interface, attribute).
+        self.present = {}
 
-    ## Return JSON string containing info for network interface.
+        ## Lock, because reader can be shared by more threads.
+        self.lock = threading.Lock()
+
+
+    ## Return first line of attribute of interface as string.
     ## RETURN:
-    ## {"interface": "eth0", "mac": "00:2b:67:ad:bb:f6", "ipv4_addr": "None",
-    ## "ipv4_mask": "None", "ipv4_cidr": "None", "link": "DOWN",
-    ## "protocol": "UP", "carrier": "DOWN", "wireless": "False",
-    ## "speed": "unknown", "duplex": "unknown"}
-    def netinfo(self, interface: str = ""):
-        ## Create instance of NetInfo class for specified interface.
-        ni = NetInfo(interface)
+    ## 'up'
+    ## ERROR RETURN:
+    ## OSError (e.g. EINVAL for 'carrier' of interface which is DOWN)
+    def read(self, interface: str, attr: str):
+        if not self.keep_open:
+            with open(f"{self.sys_dir}/{interface}/{attr}", 'rb') as f:
+                return f.read().decode().split('\n')[0]
+
+        with self.lock:
+            key = (interface, attr)
+            try:
+                data = os.pread(self.open(key), 4096, 0)
+            except OSError as e:
+                ## Attribute exists, but value can not be read right now.
+                if e.errno == errno.EINVAL:
+                    raise
 
-        ## Get link data dictionary.
-        link = ni.link_rawdata()
+                ## Interface was removed (ENODEV) or recreated, open again.
+                self.close(key)
+                data = os.pread(self.open(key), 4096, 0)
 
-        data = {
-            'interface':   ni.interface,
-            'mac':         ni.mac(),
-            'ipv4_addr':   ni.ipv4_addr(),
-            'ipv4_mask':   ni.ipv4_mask(),
-            'ipv4_cidr':   ni.ipv4_cidr(),
-            'link':        link['link'],     ## UP, DOWN, ADMIN_DOWN, UNKNOWN
-            'protocol':    link['protocol'], ## UP, DOWN, UNKNOWN
-            'carrier':     link['carrier'],  ## UP, DOWN, ADMIN_DOWN, UNKNOWN
-            'wireless':    link['wireless'], ## True, False, Unknown
-            'speed':       link['speed'],    ## 0, 100 1000, unknown, none
-            'duplex':      link['duplex'],   ## full, half, unknown, none
-        }
+        return data.decode().split('\n')[0]
 
-        ## Return dictionary as JSON string.
-        return json.dumps(data)
 
+    ## Return file descriptor of attribute (open it, if it is not open).
+    ## ERROR RETURN:
+    ## OSError
+    def open(self, key: tuple):
+        fd = self.fds.get(key)
+        if fd is None:
+            fd = os.open(f"{self.sys_dir}/{key[0]}/{key[1]}", os.O_RDONLY)
+            self.fds[key] = fd
 
-    ## This function keep writing SysInfo JSON string to specified file every
-    ## X (specified) seconds.
-    ## (Use thread for this function.)
-    def write_sysinfo(self, file: str, wait_time: int):
-        while True:
-            ## Data that has to be written (JSON string).
-            data = self.sysinfo()
+        return fd
 
-            ## Write JSON string to file.
-            with open(file, "w") as f:
-                f.write(data)
-                logging.debug(f"Written JSON data to \'{file}\'.")
 
-            ## Wait until next write request is needed.
-            time.sleep(wait_time)
+    ## Close file descriptor of attribute.
+    def close(self, key: tuple):
+        fd = self.fds.pop(key, None)
+        if fd is not None:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
 
 
-    ## This function keep writing NetInfo JSON string for specified interface
-    ## to specified file every X (specified) seconds.
-    ## (Use thread for this function.)
-    def write_netinfo(self, file: str, wait_time: int, interface: str):
-        while True:
-            ## Data that has to be written (JSON string).
-            data = self.netinfo(interface)
+    ## Return True if attribute (file or directory) of interface exists.
+    def exists(self, interface: str, attr: str):
+        if not self.keep_open:
+            return os.path.exists(f"{self.sys_dir}/{interface}/{attr}")
 
-            ## Write JSON string to file.
-            with open(file, "w") as f:
-                f.write(data)
-                logging.debug(f"Written JSON data to \'{file}\'.")
+        key = (interface, attr)
+        if key not in self.present:
+            self.present[key] = os.path.exists(f"{self.sys_dir}/{interface}/{attr}")
 
-            ## Wait until next write request is needed.
-            time.sleep(wait_time)
+        return self.present[key]
 
 
-################################################################################
+    ## Forget all cached data of interfaces which are not in passed list.
+    def prune(self, interfaces: list):
+        interfaces = set(interfaces)
+
+        with self.lock:
+            for key in [k for k in self.fds if k[0] not in interfaces]:
+                self.close(key)
+            for key in [k for k in self.present if k[0] not in interfaces]:
+                del self.present[key]
+
+
+    ## Forget all cached data of interface (e.g. when it was removed or renamed).
+    def invalidate(self, interface: str):
+        with self.lock:
+            for key in [k for k in self.fds if k[0] == interface]:
+                self.close(key)
+            for key in [k for k in self.present if k[0] == interface]:
+                del self.present[key]
+
+
+############################################################
+##                   Network Statistics                   ##
+############################################################
+## NetStats computes per-second rates of interface counters (same counters as
+## in '/sys/class/net/<interface>/statistics') as difference against previous
+## sample and keeps short history of rates for every interface. Counters of
+## all interfaces are read at once from '/proc/net/dev'.
+class NetStats:
+    ## Counters and their column in '/proc/net/dev'.
+    COUNTERS = (
+        ('rx_bytes',   0), ('tx_bytes',   8),
+        ('rx_packets', 1), ('tx_packets', 9),
+        ('rx_errors',  2), ('tx_errors',  10),
+        ('rx_dropped', 3), ('tx_dropped', 11)
+    )
+
+    def __init__(self, proc_dir: str = "/proc", history: int = 60, bits: int = None):
+        ## File with counters of all interfaces.
+        self.file = f"{proc_dir}/net/dev"
+
+        ## Width of counters: drivers keep them in 'unsigned long', which is
+        ## 32-bit on 32-bit kernels (e.g. Raspberry Pi OS).
+        if bits is None:
+            machine = os.uname().machine
+            bits = 64 if '64' in machine or machine == 's390x' else 32
+        self.bits = bits
+
+        ## Counters of all interfaces read by last update().
+        self.current = {}
+
+        ## Number of samples kept in history of every interface.
+        self.history_size = history
+
+        ## Previous sample by interface: (monotonic time, [counters]).
+        self.previous = {}
+
+        ## History by interface: deque of (epoch time, {rates}).
+        self.history = {}
+
+
+    ## Return increase of counter with passed width. Decrease of 32-bit
+    ## counter is wraparound, decrease of 64-bit counter is reset.
+    ## RETURN:
+    ## 1500
+    def delta(self, old: int, new: int, bits: int = 64):
+        if new >= old:
+            return new - old
+
+        ## 32-bit counter wrapped around (larger value was not 32-bit).
+        if bits == 32 and old < 2**32:
+            return new + 2**32 - old
+
+        ## 64-bit counter can not wrap in practice, counter was reset (e.g.
+        ## interface was recreated), so count only what is there now.
+        return new
+
+
+    ## Read counters of all interfaces (once per sweep of interfaces).
+    ## RETURN:
+    ## {'lo': [9059363, 9059363, 1375, 1375, 0, 0, 0, 0], ...}
+    def update(self):
+        self.current = {}
+
+        try:
+            with open(self.file, 'r') as f:
+                ## Skip two header lines.
+                lines = f.read().splitlines()[2:]
+        except Exception:
+            logging.error(f"File \'{self.file}\' could not be read!")
+            return self.current
+
+        ## Line format: '  eth0: 1694095 1375 0 0 0 0 0 0 9059363 1375 0 ...'.
+        for line in lines:
+            name, _, values = line.partition(':')
+            values = values.split()
+            self.current[name.strip()] = [int(values[i]) for _, i in self.COUNTERS]
+
+        return self.current
+
+
+    ## Return dictionary with rates per second of all counters since previous
+    ## sample of interface (counters are taken from last update()). Pass 'now'
+    ## (time.monotonic()) when sampling more interfaces, so clock is read once.
+    ## RETURN:
+    ## {'rx_bytes': 1520.3, 'tx_bytes': 820.0, 'rx_packets': 12.1,
+    ## 'tx_packets': 9.8, 'rx_errors': 0.0, 'tx_errors': 0.0,
+    ## 'rx_dropped': 0.0, 'tx_dropped': 0.0}
+    def sample(self, interface: str, now: float = None):
+        if now is None:
+            now = time.monotonic()
+
+        ## Initialize data with default values.
+        rates = {c: 0.0 for c, _ in self.COUNTERS}
+
+        current = self.current.get(interface)
+        if current is None:
+            self.previous.pop(interface, None)
+            return rates
+
+        previous = self.previous.get(interface)
+        self.previous[interface] = (now, current)
+
+        if previous is not None and now > previous[0]:
+            elapsed = now - previous[0]
+            for i, (name, _) in enumerate(self.COUNTERS):
+                rates[name] = round(self.delta(previous[1][i], current[i], self.bits) / elapsed, 1)
+
+            ## Store rates to history.
+            if interface not in self.history:
+                self.history[interface] = collections.deque(maxlen=self.history_size)
+            self.history[interface].append((time.time(), rates))
+
+        return rates
+
+
+    ## Return list of (epoch time, {rates}) for interface, oldest first.
+    ## RETURN:
+    ## [(1642370585.1, {'rx_bytes': 1520.3, ...}), ...]
+    def history_rawdata(self, interface: str):
+        return list(self.history.get(interface, ()))
+
+
+    ## Forget previous sample of interface (e.g. when it was removed), so its
+    ## next counters are not compared with counters of another device.
+    def forget(self, interface: str):
+        self.previous.pop(interface, None)
+
+
+    ## Forget all data of interfaces which are not in passed list.
+    def prune(self, interfaces: list):
+        interfaces = set(interfaces)
+
+        for name in [n for n in self.previous if n not in interfaces]:
+            del self.previous[name]
+        for name in [n for n in self.history if n not in interfaces]:
+            del self.history[name]
+
+
+############################################################
+##                      TCP States                        ##
+############################################################
+## TcpStates summarizes sockets in '/proc/net/tcp' and '/proc/net/tcp6' by
+## state and local port and reports accept queues of listeners. Files are read
+## in large chunks, every chunk is split once into lines (at ': ' after line
+## number), so fields are at fixed offsets. Local port and state are sliced
+## out without decoding and counted by Counter as one key per line ('01BB01',
+## no tuples), so only distinct keys are converted at the end.
+class TcpStates:
+    ## Socket states (see 'include/net/tcp_states.h').
+    STATES = {
+        b'01': 'ESTABLISHED', b'02': 'SYN_SENT', b'03': 'SYN_RECV', b'04': 'FIN_WAIT1', b'05': 'FIN_WAIT2',
+        b'06': 'TIME_WAIT', b'07': 'CLOSE', b'08': 'CLOSE_WAIT', b'09': 'LAST_ACK', b'0A': 'LISTEN',
+        b'0B': 'CLOSING', b'0C': 'NEW_SYN_RECV'
+    }
+
+    ## Line format: '   0: 0100007F:BC8F 00000000:0000 0A 00000000:00000000 ...'
+    ## (sl, local address:port, remote address:port, state, tx:rx queue).
+    ## For listeners rx queue is number of connections waiting for accept()
+    ## (backlog, its limit is not in the file).
+    LISTENER = re.compile(rb': ([0-9A-F]+):([0-9A-F]{4}) [0-9A-F]+:[0-9A-F]{4} 0A [0-9A-F]{8}:([0-9A-F]{8}) ')
+
+    ## Size of one read.
+    CHUNK = 1 << 20
+
+    def __init__(self, proc_dir: str = "/proc"):
+        self.files = (f"{proc_dir}/net/tcp", f"{proc_dir}/net/tcp6")
+
+
+    ## Return address from '/proc/net/tcp{,6}' hex (words in host byte order).
+    ## RETURN:
+    ## '127.0.0.1' || '::'
+    @staticmethod
+    def address(text: bytes):
+        data = bytes.fromhex(text.decode())
+        words = b''.join(struct.pack('@I', w) for w in struct.unpack(f">{len(data) // 4}I", data))
+        return socket.inet_ntop(socket.AF_INET if len(data) == 4 else socket.AF_INET6, words)
+
+
+    ## Count sockets of passed complete lines into passed Counters (by port and
+    ## state in hex, e.g. b'01BB01', and by state) and append their listeners
+    ## to passed list. Return number of sockets.
+    def parse(self, data: bytes, counts: collections.Counter, states: collections.Counter, listeners: list):
+        ## Every line but first piece (header or number of first line) starts
+        ## with local address (8 hex digits in 'tcp', 32 in 'tcp6').
+        lines = data.split(b': ')
+        del lines[0]
+        if not lines:
+            return 0
+        width = lines[0].find(b':')
+        port = operator.itemgetter(slice(width + 1, width + 5))
+        state = operator.itemgetter(slice(2 * width + 12, 2 * width + 14))
+        codes = list(map(state, lines))
+        states.update(codes)
+        counts.update(map(operator.add, map(port, lines), codes))
+
+        if b' 0A ' in data:
+            listeners.extend(self.LISTENER.findall(data))
+        return len(lines)
+
+
+    ## Count sockets of passed file into passed Counters (see parse()) and
+    ## append its listeners (address, port and rx queue in hex) to passed
+    ## list. Return number of sockets.
+    ## ERROR RETURN:
+    ## 0 (file could not be read)
+    def count(self, file: str, counts: collections.Counter, states: collections.Counter, listeners: list):
+        sockets = 0
+        rest = b''
+        try:
+            with open(file, 'rb', buffering=0) as f:
+                while True:
+                    chunk = f.read(self.CHUNK)
+                    if not chunk:
+                        break
+
+                    ## Line cut at end of chunk is parsed with next chunk.
+                    end = chunk.rfind(b'\n') + 1
+                    if end == 0:
+                        rest += chunk
+                        continue
+                    data, rest = rest + chunk[:end], chunk[end:]
+                    sockets += self.parse(data, counts, states, listeners)
+
+            ## Last line without newline.
+            if rest:
+                sockets += self.parse(rest, counts, states, listeners)
+        except OSError:
+            logging.error(f"File \'{file}\' could not be read!")
+        return sockets
+
+
+    ## Return dictionary with number of sockets by state, by state of every
+    ## listening port and listeners with their backlogs (connections waiting
+    ## for accept()).
+    ## RETURN:
+    ## {'sockets': 1532, 'states': {'ESTABLISHED': 1200, 'TIME_WAIT': 310,
+    ## 'LISTEN': 22}, 'ports': {'443': {'ESTABLISHED': 1150, 'LISTEN': 2,
+    ## 'SYN_RECV': 4}}, 'listeners': [{'address': '0.0.0.0', 'port': 443,
+    ## 'backlog': 3}, {'address': '::', 'port': 443, 'backlog': 0}]}
+    def sample(self):
+        counts = collections.Counter()
+        states = collections.Counter()
+        listeners = []
+        sockets = sum(self.count(file, counts, states, listeners) for file in self.files)
+
+        ## Keys stay in hex while counting, only states of listening ports are
+        ## looked up (keys of other ports are never visited).
+        ports = {}
+        for port in {port for _, port, _ in listeners}:
+            found = {name: counts[port + state] for state, name in self.STATES.items() if port + state in counts}
+            ports[str(int(port, 16))] = found
+
+        return {
+            'sockets':   sockets,
+            'states':    {self.STATES.get(state, state.decode()): count for state, count in states.items()},
+            'ports':     {port: dict(counter) for port, counter in sorted(ports.items(), key=lambda p: int(p[0]))},
+            'listeners': [{'address': self.address(address), 'port': int(port, 16), 'backlog': int(backlog, 16)}
+                          for address, port, backlog in listeners]
+        }
+
+
+############################################################
+##                     Network Sweep                      ##
+############################################################
+## NetSweep selects interfaces by pattern and collects NetInfo for all of them
+## in one pass. Pattern can be:
+## 'all' or '*'         - every interface
+## 'eth*', 'veth[0-9]*' - shell-style glob
+## 're:^(eth|bond)\d+$' - regular expression
+## 'eth0'               - single interface
+class NetSweep:
+    def __init__(self, pattern: str = "all", sys_dir: str = "/sys/class/net", reader: SysfsReader = None):
+        ## Directory with one entry per network interface.
+        self.sys_dir = sys_dir
+        self.pattern = pattern.strip()
+
+        ## Reader of interface attributes, shared by all collected interfaces.
+        if reader is None:
+            reader = SysfsReader(sys_dir)
+        self.reader = reader
+
+        ## Compile pattern once.
+        self.regex = self.compile(self.pattern)
+
+
+    ## Return compiled pattern, or None if pattern is name of one interface.
+    ## ERROR RETURN:
+    ## re.error (invalid 're:' pattern)
+    @staticmethod
+    def compile(pattern: str):
+        pattern = pattern.strip()
+        if pattern in ('all', '*'):
+            return re.compile('.*')
+        if pattern.startswith('re:'):
+            return re.compile(pattern[3:])
+        if any(c in pattern for c in '*?['):
+            return re.compile(fnmatch.translate(pattern))
+        return None
+
+
+    ## Return True if pattern selects exactly one interface by name.
+    def is_single(self):
+        return self.regex is None
+
+
+    ## Return sorted list of interface names matching pattern.
+    ## RETURN:
+    ## ['eth0', 'eth1', 'lo']
+    def interfaces(self):
+        if self.is_single():
+            return [self.pattern]
+
+        ## Enumerate interfaces once.
+        try:
+            names = os.listdir(self.sys_dir)
+        except Exception:
+            logging.error(f"Directory \'{self.sys_dir}\' could not be listed!")
+            return []
+
+        return sorted(n for n in names if self.regex.match(n))
+
+
+    ## Return dictionary of addresses of all interfaces in netifaces format
+    ## (one system call for all interfaces instead of one per interface).
+    ## RETURN:
+    ## {'lo': {17: [{'addr': '00:00:00:00:00:00'}],
+    ## 2: [{'addr': '127.0.0.1', 'netmask': '255.0.0.0'}]}, ...}
+    def addresses(self):
+        ## psutil family to netifaces family.
+        families = {
+            psutil.AF_LINK:  netifaces.AF_LINK,
+            socket.AF_INET:  netifaces.AF_INET,
+            socket.AF_INET6: netifaces.AF_INET6
+        }
+
+        addrs = {}
+        try:
+            for name, entries in psutil.net_if_addrs().items():
+                addrs[name] = {}
+                for entry in entries:
+                    if entry.family not in families:
+                        continue
+
+                    addr = {'addr': entry.address}
+                    if entry.netmask:
+                        addr['netmask'] = entry.netmask
+                    addrs[name].setdefault(families[entry.family], []).append(addr)
+        except Exception:
+            logging.error("Interface addresses could not be detected!")
+
+        return addrs
+
+
+    ## Return list of NetInfo instances for every selected interface.
+    def collect(self):
+        names = self.interfaces()
+        addrs = self.addresses()
+
+        ## Close cached files of interfaces which disappeared.
+        if not self.is_single():
+            self.reader.prune(names)
+
+        return [NetInfo(name, addrs.get(name, {}), self.reader) for name in names]
+
+
+############################################################
+##                    Netlink Listener                    ##
+############################################################
+## NetlinkListener receives rtnetlink (NETLINK_ROUTE) notifications about
+## links, addresses (and neighbours, if requested) and passes parsed events to
+## callback, so changes are seen immediately instead of after next sysfs poll.
+## (Messages are described in 'man 7 rtnetlink'.)
+class NetlinkListener:
+    ## Multicast groups.
+    RTMGRP_LINK        = 0x1
+    RTMGRP_NEIGH       = 0x4
+    RTMGRP_IPV4_IFADDR = 0x10
+    RTMGRP_IPV6_IFADDR = 0x100
+
+    ## Message types.
+    NLMSG_ERROR  = 2
+    NLMSG_DONE   = 3
+    RTM_NEWLINK  = 16
+    RTM_DELLINK  = 17
+    RTM_GETLINK  = 18
+    RTM_NEWADDR  = 20
+    RTM_DELADDR  = 21
+    RTM_NEWNEIGH = 28
+    RTM_DELNEIGH = 29
+    RTM_GETNEIGH = 30
+
+    ## Message flags of dump request.
+    NLM_F_REQUEST = 0x1
+    NLM_F_DUMP    = 0x300
+
+    ## Attribute types.
+    IFLA_IFNAME    = 3
+    IFLA_OPERSTATE = 16
+    IFLA_CARRIER   = 33
+    IFA_ADDRESS    = 1
+    IFA_LOCAL      = 2
+    NDA_DST        = 1
+    NDA_LLADDR     = 2
+
+    ## Values of IFLA_OPERSTATE (RFC 2863).
+    OPERSTATES = ('unknown', 'notpresent', 'down', 'lowerlayerdown', 'testing', 'dormant', 'up')
+
+    ## Values of ndm_state (NUD_*).
+    NEIGH_STATES = {
+        0x01: 'incomplete',
+        0x02: 'reachable',
+        0x04: 'stale',
+        0x08: 'delay',
+        0x10: 'probe',
+        0x20: 'failed',
+        0x40: 'noarp',
+        0x80: 'permanent'
+    }
+
+    def __init__(self, callback, groups: int = RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV6_IFADDR):
+        ## Function called with list of events after every received datagram.
+        self.callback = callback
+        self.groups = groups
+
+        ## Last known state of links by interface index, e.g.
+        ## {2: {'interface': 'eth0', 'operstate': 'up', 'carrier': 1}}
+        self.links = {}
+
+        self.sock = None
+        self.thread = None
+        self.running = False
+
+
+    ## Return list of (type, data) attributes from passed bytes.
+    ## RETURN:
+    ## [(3, b'eth0\x00'), (16, b'\x06')]
+    def attributes(self, data: bytes):
+        attrs = []
+        offset = 0
+
+        while offset + 4 <= len(data):
+            length, kind = struct.unpack_from('=HH', data, offset)
+            if length < 4:
+                break
+            attrs.append((kind & 0x3fff, data[offset + 4:offset + length]))
+
+            ## Attributes are aligned to 4 bytes.
+            offset += (length + 3) & ~3
+
+        return attrs
+
+
+    ## Return list of events parsed from netlink datagram (can be also datagram
+    ## captured before, e.g. for testing).
+    ## RETURN:
+    ## [{'type': 'link', 'action': 'new', 'index': 2, 'interface': 'eth0',
+    ## 'operstate': 'up', 'carrier': 1},
+    ## {'type': 'addr', 'action': 'del', 'index': 2, 'interface': None,
+    ## 'family': 2, 'address': '10.0.100.34', 'prefixlen': 24},
+    ## {'type': 'neigh', 'action': 'new', 'index': 2, 'interface': 'eth0',
+    ## 'family': 2, 'address': '10.0.100.1', 'mac': '00:2b:67:ad:bb:f6',
+    ## 'state': 'reachable'}]
+    def parse(self, data: bytes):
+        events = []
+        offset = 0
+
+        while offset + 16 <= len(data):
+            ## Netlink message header.
+            length, kind, flags, seq, pid = struct.unpack_from('=IHHII', data, offset)
+            if length < 16:
+                break
+            body = data[offset + 16:offset + length]
+
+            ## Messages are aligned to 4 bytes.
+            offset += (length + 3) & ~3
+
+            if kind in (self.RTM_NEWLINK, self.RTM_DELLINK) and len(body) >= 16:
+                ## struct ifinfomsg.
+                family, dev_type, index, if_flags, change = struct.unpack_from('=BxHiII', body)
+                event = {
+                    'type':      'link',
+                    'action':    'new' if kind == self.RTM_NEWLINK else 'del',
+                    'index':     index,
+                    'interface': None,
+                    'operstate': 'unknown',
+                    'carrier':   None
+                }
+                for attr, value in self.attributes(body[16:]):
+                    if attr == self.IFLA_IFNAME:
+                        event['interface'] = value.split(b'\x00')[0].decode()
+                    elif (attr == self.IFLA_OPERSTATE) and value:
+                        if value[0] < len(self.OPERSTATES):
+                            event['operstate'] = self.OPERSTATES[value[0]]
+                    elif (attr == self.IFLA_CARRIER) and value:
+                        event['carrier'] = value[0]
+                events.append(event)
+
+            elif kind in (self.RTM_NEWADDR, self.RTM_DELADDR) and len(body) >= 8:
+                ## struct ifaddrmsg.
+                family, prefixlen, if_flags, scope, index = struct.unpack_from('=BBBBI', body)
+                event = {
+                    'type':      'addr',
+                    'action':    'new' if kind == self.RTM_NEWADDR else 'del',
+                    'index':     index,
+                    'interface': None,
+                    'family':    family,
+                    'address':   None,
+                    'prefixlen': prefixlen
+                }
+                for attr, value in self.attributes(body[8:]):
+                    ## IFA_LOCAL is own address on point-to-point links.
+                    if (attr == self.IFA_LOCAL) or ((attr == self.IFA_ADDRESS) and event['address'] is None):
+                        try:
+                            event['address'] = socket.inet_ntop(family, value)
+                        except Exception:
+                            pass
+                events.append(event)
+
+            elif kind in (self.RTM_NEWNEIGH, self.RTM_DELNEIGH) and len(body) >= 12:
+                ## struct ndmsg.
+                family, index, state, nd_flags, nd_type = struct.unpack_from('=BxxxiHBB', body)
+                event = {
+                    'type':      'neigh',
+                    'action':    'new' if kind == self.RTM_NEWNEIGH else 'del',
+                    'index':     index,
+                    'interface': None,
+                    'family':    family,
+                    'address':   None,
+                    'mac':       None,
+                    'state':     self.NEIGH_STATES.get(state, 'none')
+                }
+                for attr, value in self.attributes(body[12:]):
+                    if attr == self.NDA_DST:
+                        try:
+                            event['address'] = socket.inet_ntop(family, value)
+                        except Exception:
+                            pass
+                    elif attr == self.NDA_LLADDR:
+                        event['mac'] = ':'.join(f"{b:02x}" for b in value)
+                events.append(event)
+
+        ## Update link state and fill interface names from known links.
+        for event in events:
+            known = self.links.get(event['index'])
+            if event['type'] == 'link':
+                if event['action'] == 'del':
+                    self.links.pop(event['index'], None)
+                else:
+                    ## Interface was renamed.
+                    if known and event['interface'] and known['interface'] != event['interface']:
+                        event['old_interface'] = known['interface']
+                    self.links[event['index']] = {
+                        'interface': event['interface'],
+                        'operstate': event['operstate'],
+                        'carrier':   event['carrier']
+                    }
+            elif known:
+                event['interface'] = known['interface']
+
+        return events
+
+
+    ## Return list of events parsed from dump of passed message type (e.g.
+    ## RTM_GETNEIGH returns all neighbours as 'new' events).
+    ## ERROR RETURN:
+    ## OSError
+    def dump(self, kind: int, family: int = socket.AF_UNSPEC):
+        events = []
+        with socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE) as sock:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+            sock.settimeout(5.0)
+            sock.bind((0, 0))
+
+            ## Header and request body (ifinfomsg or ndmsg, family and zeros).
+            body = struct.pack('=B15x' if kind == self.RTM_GETLINK else '=B11x', family)
+            sock.send(struct.pack('=IHHII', 16 + len(body), kind, self.NLM_F_REQUEST | self.NLM_F_DUMP, 1, 0) + body)
+
+            while True:
+                data = sock.recv(1 << 20)
+                events.extend(self.parse(data))
+
+                ## Dump ends with NLMSG_DONE (or NLMSG_ERROR) message.
+                offset = 0
+                while offset + 16 <= len(data):
+                    length, msg_type = struct.unpack_from('=IH', data, offset)
+                    if msg_type == self.NLMSG_DONE:
+                        return events
+                    if msg_type == self.NLMSG_ERROR:
+                        code = struct.unpack_from('=i', data, offset + 16)[0]
+                        raise OSError(-code, os.strerror(-code))
+                    if length < 16:
+                        break
+                    offset += (length + 3) & ~3
+
+
+    ## Open netlink socket and start thread receiving notifications.
+    ## ERROR RETURN:
+    ## False
+    def start(self):
+        try:
+            self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+            self.sock.bind((0, self.groups))
+            ## Timeout to check if listener should stop.
+            self.sock.settimeout(1.0)
+        except Exception:
+            logging.error("Netlink socket could not be opened! Only polling is used.")
+            return False
+
+        ## Links existing before start are known too (socket is bound first,
+        ## so no change is lost between dump and first notification).
+        self.sync()
+
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name='netlink', daemon=True)
+        self.thread.start()
+        logging.debug("Netlink listener started.")
+        return True
+
+
+    ## Receive notifications until stop() is called.
+    def run(self):
+        while self.running:
+            try:
+                data = self.sock.recv(65536)
+            except socket.timeout:
+                continue
+            except OSError as e:
+                if not self.running:
+                    break
+                ## Receive buffer overflowed, some events were lost.
+                if e.errno == errno.ENOBUFS:
+                    logging.warning("Netlink events lost, doing full refresh.")
+                    self.callback([{'type': 'resync'}] + self.sync())
+                    continue
+                logging.error(f"Netlink socket failed: {e}")
+                break
+
+            events = self.parse(data)
+            if events:
+                self.callback(events)
+
+
+    ## Replace known links by dump of all links. Return link events changing
+    ## known state: renamed links ('new' events with 'old_interface') and
+    ## links, which disappeared ('del' events).
+    ## RETURN:
+    ## [{'type': 'link', 'action': 'new', 'index': 2, 'interface': 'lan0',
+    ## 'old_interface': 'eth0', 'operstate': 'up', 'carrier': 1}]
+    ## ERROR RETURN:
+    ## [] (dump failed, known links are kept)
+    def sync(self):
+        known = dict(self.links)
+        try:
+            events = self.dump(self.RTM_GETLINK)
+        except OSError as e:
+            logging.warning(f"Links could not be dumped ({e})! Renames of existing interfaces are not detected.")
+            return []
+
+        dumped = {e['index'] for e in events if e['type'] == 'link'}
+        changes = [e for e in events if e['type'] == 'link' and 'old_interface' in e]
+        for index in [i for i in known if i not in dumped]:
+            self.links.pop(index, None)
+            changes.append({
+                'type':      'link',
+                'action':    'del',
+                'index':     index,
+                'interface': known[index]['interface'],
+                'operstate': 'unknown',
+                'carrier':   None
+            })
+        return changes
+
+
+    ## Stop receiving notifications.
+    def stop(self):
+        self.running = False
+        if self.sock is not None:
+            self.sock.close()
+
+
+############################################################
+##                   Neighbour Tracker                    ##
+############################################################
+## NeighbourTracker finds hosts passively from kernel neighbour tables (ARP
+## and NDP caches), so hosts talking to this machine are seen without any
+## probes. Table is read by netlink dump ('/proc/net/arp' if netlink is not
+## available) and compared with previous one as set of entries, so only
+## changed entries are processed. With netlink events (apply()), table is
+## dumped only every RESYNC ticks to catch lost events.
+## Host record keeps time of first and last confirmation (entry became
+## reachable) and of last state change. Hosts which left table are kept with
+## state 'gone' until they expire.
+class NeighbourTracker:
+    ## States in which neighbour has link-layer address (host exists).
+    VALID = ('reachable', 'stale', 'delay', 'probe', 'permanent')
+
+    ## Ticks between full dumps when netlink events are received.
+    RESYNC = 30
+
+    def __init__(self, proc_dir: str = "/proc", expire: int = 86400):
+        self.proc_dir = proc_dir
+
+        ## Seconds after last change, when host which is not in table any more
+        ## is forgotten.
+        self.expire = expire
+
+        ## Table entries by host key: (family, ip, interface, mac, state).
+        self.entries = {}
+
+        ## Host records by key ('10.0.100.1' or 'fe80::1%eth0').
+        self.hosts = {}
+
+        ## Time of last change (time.time()) by key and heap of (expiration,
+        ## key) of hosts which left table (at most one entry per host, keys in
+        ## heap are in 'queued').
+        self.touched = {}
+        self.expiry = []
+        self.queued = set()
+
+        ## Keys of hosts changed since last flush().
+        self.dirty = set()
+
+        ## Number of processed entry changes.
+        self.changes = 0
+
+        ## Lines of '/proc/net/arp' read last time (used without netlink).
+        self.lines = set()
+        self.use_netlink = True
+
+        ## Full dump is needed on next tick (set on start and when events were
+        ## lost) and netlink events are applied (table is kept up to date).
+        self.resync = True
+        self.listening = False
+        self.ticks = 0
+
+        ## Parser of netlink messages and interface names by index.
+        self.parser = NetlinkListener(None)
+        self.names = {}
+
+        ## OuiIndex used to add vendor to host records.
+        self.vendors = None
+
+        self.lock = threading.Lock()
+
+
+    ## Return host key of address ('fe80::1%eth0' for link-local addresses).
+    @staticmethod
+    def key(address: str, interface: str):
+        return f"{address}%{interface}" if address.startswith('fe80:') else address
+
+
+    ## Return name of interface with passed index.
+    ## ERROR RETURN:
+    ## ''
+    def interface(self, index: int):
+        if index not in self.names:
+            try:
+                self.names[index] = socket.if_indextoname(index)
+            except OSError:
+                return ""
+        return self.names[index]
+
+
+    ## Return entry tuple for netlink neighbour event (None for entries which
+    ## are not hosts, e.g. multicast or own addresses).
+    ## RETURN:
+    ## (2, '10.0.100.1', 'eth0', '00:2b:67:ad:bb:f6', 'reachable')
+    def entry(self, event: dict):
+        if event['address'] is None or event['state'] == 'noarp':
+            return None
+        return (event['family'], event['address'], self.interface(event['index']), event['mac'], event['state'])
+
+
+    ## Return set of entries of whole neighbour table.
+    ## ERROR RETURN:
+    ## OSError
+    def dump(self):
+        return {e for e in map(self.entry, self.parser.dump(NetlinkListener.RTM_GETNEIGH)) if e is not None}
+
+
+    ## Return entries of IPv4 hosts whose lines in '/proc/net/arp' changed
+    ## since last read by key (None for removed entries). Only changed lines
+    ## are parsed.
+    ## RETURN:
+    ## {'10.0.100.1': (2, '10.0.100.1', 'eth0', '00:2b:67:ad:bb:f6', 'reachable'),
+    ## '10.0.100.2': None}
+    ## ERROR RETURN:
+    ## OSError
+    def read_arp(self):
+        with open(f"{self.proc_dir}/net/arp") as f:
+            lines = set(f.read().splitlines()[1:])
+        if lines == self.lines:
+            return {}
+
+        changes = {}
+        for line in self.lines - lines:
+            fields = line.split()
+            if len(fields) == 6:
+                changes[self.key(fields[0], fields[5])] = None
+        for line in lines - self.lines:
+            ## IP address, HW type, Flags, HW address, Mask, Device.
+            fields = line.split()
+            if len(fields) != 6:
+                continue
+            flags = int(fields[2], 16)
+            ## ARP table knows only complete (ATF_COM) and permanent (ATF_PERM)
+            ## entries.
+            state = 'permanent' if flags & 0x4 else 'reachable' if flags & 0x2 else 'incomplete'
+            changes[self.key(fields[0], fields[5])] = (socket.AF_INET, fields[0], fields[5], fields[3], state)
+        self.lines = lines
+
+        return changes
+
+
+    ## Update record of host from passed entry, or mark host as gone if entry
+    ## is None.
+    def update(self, key: str, entry: tuple, now: float):
+        stamp = datetime.datetime.fromtimestamp(now).strftime('%Y-%m-%d %H:%M:%S')
+        record = self.hosts.get(key)
+
+        if entry is None:
+            self.entries.pop(key, None)
+            if record is None or record['state'] == 'gone':
+                return
+            record['state'] = 'gone'
+            record['state_changes'] += 1
+            record['state_changed'] = stamp
+        else:
+            self.entries[key] = entry
+            family, address, interface, mac, state = entry
+            if record is None:
+                ## Entries without link-layer address are not hosts (yet).
+                if state not in self.VALID:
+                    return
+                record = {
+                    'ip':            address,
+                    'family':        'ipv4' if family == socket.AF_INET else 'ipv6',
+                    'interface':     interface,
+                    'mac':           mac,
+                    'vendor':        self.vendors.lookup(mac) if self.vendors else None,
+                    'state':         state,
+                    'state_changes': 0,
+                    'state_changed': stamp,
+                    'first_seen':    stamp,
+                    'last_seen':     stamp
+                }
+                self.hosts[key] = record
+            else:
+                if mac and state in self.VALID and mac != record['mac']:
+                    record['mac'] = mac
+                    record['vendor'] = self.vendors.lookup(mac) if self.vendors else None
+                if state != record['state']:
+                    record['state'] = state
+                    record['state_changes'] += 1
+                    record['state_changed'] = stamp
+                ## Neighbour answered (or is static).
+                if state in ('reachable', 'permanent'):
+                    record['last_seen'] = stamp
+
+        self.changes += 1
+        self.dirty.add(key)
+        self.touched[key] = now
+
+        ## Only host which left table can expire.
+        if (entry is None or entry[4] not in self.VALID) and key not in self.queued:
+            self.queued.add(key)
+            heapq.heappush(self.expiry, (now + self.expire, key))
+
+
+    ## Apply netlink neighbour events (see NetlinkListener.parse()).
+    def apply(self, events: list):
+        now = time.time()
+        with self.lock:
+            for event in events:
+                entry = self.entry(event)
+                if entry is None:
+                    continue
+                key = self.key(entry[1], entry[2])
+                self.update(key, None if event['action'] == 'del' else entry, now)
+
+
+    ## Read table and process entries which changed since last read (whole
+    ## netlink dump is compared with table, '/proc/net/arp' only by lines).
+    def poll(self):
+        changes = None
+        if self.use_netlink:
+            try:
+                table = self.dump()
+                current = set(self.entries.values())
+                changes = {self.key(e[1], e[2]): None for e in current - table}
+                changes.update((self.key(e[1], e[2]), e) for e in table - current)
+            except OSError:
+                logging.warning("Neighbours could not be dumped by netlink! Using '/proc/net/arp' (IPv4 only).")
+                self.use_netlink = False
+                ## IPv6 neighbours can not be followed any more.
+                changes = {k: None for k, e in self.entries.items() if e[0] != socket.AF_INET}
+        if not self.use_netlink:
+            try:
+                changes = {**(changes or {}), **self.read_arp()}
+            except OSError:
+                logging.error(f"File \'{self.proc_dir}/net/arp\' could not be read!")
+                if not changes:
+                    return
+
+        now = time.time()
+        for key, entry in changes.items():
+            if self.entries.get(key) != entry:
+                self.update(key, entry, now)
+
+
+    ## Read table if needed and return records of hosts changed since last
+    ## call by key (None for expired hosts).
+    ## RETURN:
+    ## {'10.0.100.1': {'ip': '10.0.100.1', 'family': 'ipv4', ...},
+    ## 'fe80::1%eth0': None}
+    def tick(self):
+        with self.lock:
+            if (not self.listening) or self.resync or (self.ticks % self.RESYNC == 0):
+                self.poll()
+                self.resync = False
+            self.ticks += 1
+
+            ## Forget hosts which are gone for 'expire' seconds (hosts which
+            ## are back in table are queued again when they leave it).
+            now = time.time()
+            while self.expiry and self.expiry[0][0] <= now:
+                _, key = heapq.heappop(self.expiry)
+                self.queued.discard(key)
+                entry = self.entries.get(key)
+                if key not in self.touched or (entry is not None and entry[4] in self.VALID):
+                    continue
+                ## Host changed after it left table.
+                if self.touched[key] + self.expire > now:
+                    self.queued.add(key)
+                    heapq.heappush(self.expiry, (self.touched[key] + self.expire, key))
+                    continue
+                self.hosts.pop(key, None)
+                self.entries.pop(key, None)
+                del self.touched[key]
+                self.dirty.add(key)
+
+            changed = {key: (dict(self.hosts[key]) if key in self.hosts else None) for key in self.dirty}
+            self.dirty = set()
+
+        return changed
+
+
+############################################################
+##                     Host Discovery                     ##
+############################################################
+## HostDiscovery finds live IPv4 hosts in subnets with ICMP echo (one shared
+## socket, replies are matched by source address) and TCP connect probes to
+## hosts which did not answer ping (connection accepted or refused means host
+## is alive). All probes share one rate limit, TCP probes are limited by number
+## of hosts probed at once. Addresses are generated on the fly, so memory
+## grows only with number of live hosts, not with subnet size.
+## IPv6 subnet (/64) cannot be swept, so IPv6 hosts are found by ICMPv6 echo
+## to all-nodes multicast address (ff02::1) on every interface, which every
+## host on link answers (and resolves our address by NDP while doing so).
+class HostDiscovery:
+    ## ICMP echo request and reply types.
+    ICMP_ECHO = 8
+    ICMP_ECHO_REPLY = 0
+    ICMP6_ECHO = 128
+    ICMP6_ECHO_REPLY = 129
+
+    ## Multicast echo requests sent to every interface (and address).
+    ATTEMPTS = 3
+
+    def __init__(self, concurrency: int = 2048, rate: int = 5000, ports: tuple = (80, 443, 22), timeout: float = 0.5):
+        ## Probed TCP ports (empty: ICMP only) and seconds to wait for answer.
+        self.ports = tuple(ports)
+        self.timeout = timeout
+
+        ## Probes sent per second (0: unlimited).
+        self.rate = rate
+
+        ## Every TCP probe holds one descriptor per port, so probe only as
+        ## many hosts as fit into descriptor limit (see raise_nofile_limit()).
+        try:
+            soft = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+        except Exception:
+            soft = 1024
+        if soft == resource.RLIM_INFINITY:
+            soft = 1 << 20
+        self.concurrency = max(1, min(concurrency, (soft - 256) // max(len(self.ports), 1)))
+
+        ## Identifier of ICMP echo requests of this process.
+        self.ident = os.getpid() & 0xffff
+
+        ## Live hosts of last sweep by address (IPv4 and IPv6).
+        self.hosts = {}
+        self.hosts6 = {}
+
+        ## Statistics of last sweep (IPv4 and IPv6).
+        self.last = {'probes': 0, 'duration': 0.0}
+        self.last6 = {'probes': 0, 'duration': 0.0}
+
+
+    ## Return internet checksum of passed bytes.
+    @staticmethod
+    def checksum(data: bytes):
+        if len(data) % 2:
+            data += b'\0'
+        total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+        total = (total >> 16) + (total & 0xffff)
+        total += total >> 16
+        return ~total & 0xffff
+
+
+    ## Return list of addresses (as integers) of passed networks without
+    ## network and broadcast address. Addresses are generated lazily.
+    @staticmethod
+    def addresses(networks: list):
+        for network in networks:
+            if network.prefixlen >= 31:
+                yield from range(network.first, network.last + 1)
+            else:
+                yield from range(network.first + 1, network.last)
+
+
+    ## Wait until next probe is allowed by rate limit.
+    async def pace(self, loop):
+        self.last['probes'] += 1
+        if self.rate > 0:
+            ahead = self.last['probes'] / self.rate - (loop.time() - self.started)
+            if ahead > 0.005:
+                await asyncio.sleep(ahead)
+                return
+
+        ## Let replies and finished probes be handled now and then.
+        if self.last['probes'] % 256 == 0:
+            await asyncio.sleep(0)
+
+
+    ## Return ICMP (or ICMPv6) socket and True if it is raw (other processes'
+    ## replies have to be filtered out, IPv4 replies come with IP header).
+    ## Unprivileged ICMP socket is preferred, raw one needs root.
+    ## ERROR RETURN:
+    ## (None, False)
+    def icmp_socket(self, family: int = socket.AF_INET):
+        proto = socket.IPPROTO_ICMP if family == socket.AF_INET else socket.IPPROTO_ICMPV6
+        for kind, raw in ((socket.SOCK_DGRAM, False), (socket.SOCK_RAW, True)):
+            try:
+                sock = socket.socket(family, kind, proto)
+            except OSError:
+                continue
+            sock.setblocking(False)
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+            except OSError:
+                pass
+            return sock, raw
+
+        logging.warning(f"ICMP socket ({socket.AddressFamily(family).name}) could not be created!")
+        return None, False
+
+
+    ## Send ICMP echo request to every passed address and store addresses which
+    ## answered to found ({'10.0.100.1': {'method': 'icmp', 'rtt_ms': 0.4}}).
+    async def icmp_sweep(self, addresses, found: dict):
+        sock, raw = self.icmp_socket()
+        if sock is None:
+            return False
+        loop = asyncio.get_running_loop()
+
+        ## Read all queued replies (send time is carried in payload, so nothing
+        ## is kept per sent probe).
+        def receive():
+            while True:
+                try:
+                    data, (addr, _) = sock.recvfrom(1024)
+                except (BlockingIOError, InterruptedError):
+                    return
+                except OSError:
+                    return
+                if raw:
+                    data = data[(data[0] & 0x0f) * 4:]
+                if len(data) < 16 or data[0] != self.ICMP_ECHO_REPLY:
+                    continue
+                ## Kernel sets identifier of unprivileged ICMP socket itself.
+                if raw and struct.unpack('!H', data[4:6])[0] != self.ident:
+                    continue
+                if addr not in found:
+                    sent = struct.unpack('!d', data[8:16])[0]
+                    found[addr] = {'method': 'icmp', 'rtt_ms': round((time.monotonic() - sent) * 1000, 2)}
+
+        loop.add_reader(sock.fileno(), receive)
+        try:
+            for seq, address in enumerate(addresses):
+                await self.pace(loop)
+                header = struct.pack('!BBHHH', self.ICMP_ECHO, 0, 0, self.ident, seq & 0xffff)
+                payload = struct.pack('!d', time.monotonic())
+                packet = header[:2] + struct.pack('!H', self.checksum(header + payload)) + header[4:] + payload
+                target = socket.inet_ntoa(struct.pack('!I', address))
+                for _ in range(3):
+                    try:
+                        sock.sendto(packet, (target, 0))
+                        break
+                    except (BlockingIOError, InterruptedError):
+                        ## Send buffer is full, let replies be read.
+                        await asyncio.sleep(0.001)
+                    except OSError:
+                        ## E.g. ENOBUFS when neighbour table is full.
+                        break
+
+            ## Wait for late replies.
+            await asyncio.sleep(self.timeout)
+        finally:
+            loop.remove_reader(sock.fileno())
+            sock.close()
+
+        return True
+
+
+    ## Return True if connection to passed port was accepted or refused.
+    async def connect(self, loop, address: str, port: int):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        try:
+            await loop.sock_connect(sock, (address, port))
+            return True
+        except ConnectionRefusedError:
+            return True
+        except OSError:
+            return False
+        finally:
+            sock.close()
+
+
+    ## Return round trip time in ms of first port which answered, or None if
+    ## no port answered in time.
+    async def tcp_probe(self, loop, address: str):
+        start = loop.time()
+        pending = {loop.create_task(self.connect(loop, address, port)) for port in self.ports}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=self.timeout - (loop.time() - start),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    return None
+                if any(task.result() for task in done):
+                    return round((loop.time() - start) * 1000, 2)
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+    ## Probe passed addresses, which are not in found yet, with TCP and store
+    ## addresses which answered to found.
+    async def tcp_sweep(self, addresses, found: dict):
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+
+        async def probe(address: str):
+            try:
+                rtt = await self.tcp_probe(loop, address)
+                if rtt is not None:
+                    found[address] = {'method': 'tcp', 'rtt_ms': rtt}
+            finally:
+                slots.release()
+
+        for address in addresses:
+            address = socket.inet_ntoa(struct.pack('!I', address))
+            if address in found:
+                continue
+            await self.pace(loop)
+            await slots.acquire()
+            task = loop.create_task(probe(address))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.wait(tasks)
+
+
+    ## Return records of found hosts ordered by address, with time of first
+    ## detection kept from previous records.
+    @staticmethod
+    def records(found: dict, previous: dict):
+        now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        hosts = {}
+        for key in sorted(found, key=lambda k: netaddr.IPAddress(found[k]['ip'])):
+            first = previous.get(key, {}).get('first_seen', now)
+            hosts[key] = {**found[key], 'first_seen': first, 'last_seen': now}
+
+        return hosts
+
+
+    ## Sweep passed networks (list of netaddr.IPNetwork) and return dictionary
+    ## with live hosts by address.
+    ## RETURN:
+    ## {'10.0.100.1': {'ip': '10.0.100.1', 'method': 'icmp', 'rtt_ms': 0.4,
+    ## 'first_seen': '2022-01-16 14:07:43', 'last_seen': '2022-01-16 23:03:05'}}
+    async def sweep(self, networks: list):
+        loop = asyncio.get_running_loop()
+        self.started = loop.time()
+        self.last = {'probes': 0, 'duration': 0.0}
+
+        found = {}
+        if not await self.icmp_sweep(self.addresses(networks), found):
+            logging.warning("Only TCP probes will be used for IPv4 discovery.")
+        if self.ports:
+            await self.tcp_sweep(self.addresses(networks), found)
+
+        ## Keep time of first detection of hosts seen before.
+        self.hosts = self.records({a: {'ip': a, **f} for a, f in found.items()}, self.hosts)
+
+        self.last['duration'] = round(loop.time() - self.started, 3)
+        logging.debug(f"Discovery: {len(self.hosts)} hosts, {self.last}.")
+
+        return self.hosts
+
+
+    ## Send ICMPv6 echo requests to all-nodes multicast address on passed
+    ## interfaces and return dictionary with hosts which answered. Every
+    ## request is sent from link-local address and from each passed global
+    ## address of interface, so hosts answer from their global addresses too.
+    ## Link-local hosts are keyed with interface ('fe80::1%eth0').
+    ## RETURN:
+    ## {'fd00::1': {'ip': 'fd00::1', 'interface': 'eth0', 'method': 'icmp6',
+    ## 'rtt_ms': 0.4, 'first_seen': '2022-01-16 14:07:43',
+    ## 'last_seen': '2022-01-16 23:03:05'},
+    ## 'fe80::1%eth0': {'ip': 'fe80::1', 'interface': 'eth0', ...}}
+    async def sweep6(self, interfaces: dict):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        self.last6 = {'probes': 0, 'duration': 0.0}
+
+        sock, raw = self.icmp_socket(socket.AF_INET6)
+        if sock is None:
+            return self.hosts6
+
+        found = {}
+
+        ## Interface of reply is passed with it (global source addresses have
+        ## no scope).
+        sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_RECVPKTINFO, 1)
+
+        ## Read all queued replies (one request is answered by every host).
+        def receive():
+            while True:
+                try:
+                    data, ancdata, _, addr = sock.recvmsg(1024, socket.CMSG_SPACE(20))
+                except OSError:
+                    return
+                if len(data) < 16 or data[0] != self.ICMP6_ECHO_REPLY:
+                    continue
+                if raw and struct.unpack('!H', data[4:6])[0] != self.ident:
+                    continue
+
+                ## in6_pktinfo: destination address (16 B) and interface index.
+                index = addr[3]
+                for level, kind, value in ancdata:
+                    if level == socket.IPPROTO_IPV6 and kind == socket.IPV6_PKTINFO and len(value) >= 20:
+                        index = struct.unpack('@I', value[16:20])[0]
+
+                host = addr[0].split('%')[0]
+                try:
+                    interface = socket.if_indextoname(index) if index else ""
+                except OSError:
+                    interface = ""
+                key = f"{host}%{interface}" if host.startswith('fe80:') else host
+                if key not in found:
+                    sent = struct.unpack('!d', data[8:16])[0]
+                    found[key] = {'ip': host, 'interface': interface, 'method': 'icmp6',
+                                  'rtt_ms': round((time.monotonic() - sent) * 1000, 2)}
+
+        loop.add_reader(sock.fileno(), receive)
+        try:
+            for attempt in range(self.ATTEMPTS):
+                for interface, sources in interfaces.items():
+                    try:
+                        index = socket.if_nametoindex(interface)
+                    except OSError:
+                        continue
+
+                    ## Checksum of ICMPv6 is always computed by kernel.
+                    packet = struct.pack('!BBHHHd', self.ICMP6_ECHO, 0, 0, self.ident, attempt, time.monotonic())
+                    for source in [None] + list(sources):
+                        self.last6['probes'] += 1
+                        try:
+                            if source is None:
+                                sock.sendto(packet, ('ff02::1', 0, 0, index))
+                            else:
+                                ## Source address is chosen by IPV6_PKTINFO.
+                                info = socket.inet_pton(socket.AF_INET6, source) + struct.pack('@I', index)
+                                sock.sendmsg([packet], [(socket.IPPROTO_IPV6, socket.IPV6_PKTINFO, info)],
+                                             0, ('ff02::1', 0, 0, index))
+                        except OSError:
+                            ## E.g. interface is down or without IPv6.
+                            continue
+
+                ## Wait for replies.
+                await asyncio.sleep(self.timeout)
+        finally:
+            loop.remove_reader(sock.fileno())
+            sock.close()
+
+        self.hosts6 = self.records(found, self.hosts6)
+
+        self.last6['duration'] = round(loop.time() - started, 3)
+        logging.debug(f"Discovery IPv6: {len(self.hosts6)} hosts, {self.last6}.")
+
+        return self.hosts6
+
+
+############################################################
+##                      File Writer                       ##
+############################################################
+## FileWriter replaces output files atomically (write to temporary file, then
+## rename), so readers never see empty or half-written file. File is not
+## written at all, if its content did not change since last write.
+class FileWriter:
+    def __init__(self, fsync: str = "never"):
+        ## When to fsync written files:
+        ## 'never'  - leave it to kernel
+        ## 'always' - after every write
+        ## 'N'      - after every N-th write (e.g. '10')
+        self.fsync = fsync.strip().lower()
+        if self.fsync not in ('never', 'always'):
+            try:
+                self.fsync_every = max(int(self.fsync), 1)
+            except ValueError:
+                logging.error(f"Invalid fsync policy \'{fsync}\'! Using \'never\' instead.")
+                self.fsync = 'never'
+
+        ## Hash of last written content by file.
+        self.hashes = {}
+
+        ## Counters of done and skipped writes.
+        self.written = 0
+        self.skipped = 0
+
+        ## Lock, because writer is shared by more threads.
+        self.lock = threading.Lock()
+
+
+    ## Return True if write with passed number should be followed by fsync.
+    def need_fsync(self, count: int):
+        if self.fsync == 'always':
+            return True
+        if self.fsync == 'never':
+            return False
+
+        return count % self.fsync_every == 0
+
+
+    ## Write string to file, unless file already has the same content. Failed
+    ## write is not counted and leaves no temporary file.
+    ## RETURN:
+    ## True (written) || False (skipped)
+    ## ERROR RETURN:
+    ## OSError (e.g. ENOSPC)
+    def write(self, file: str, data: str):
+        content = data.encode()
+        digest = hashlib.blake2b(content, digest_size=16).digest()
+
+        with self.lock:
+            if self.hashes.get(file) == digest:
+                self.skipped += 1
+                return False
+            sync = self.need_fsync(self.written + 1)
+
+        ## Temporary file is hidden and in the same directory (rename must not
+        ## cross filesystems).
+        directory, name = os.path.split(file)
+        tmp = os.path.join(directory, f".{name}.tmp")
+
+        try:
+            with open(tmp, "wb") as f:
+                f.write(content)
+                if sync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp, file)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+        ## Make rename itself durable.
+        if sync:
+            fd = os.open(directory or '.', os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+        with self.lock:
+            self.written += 1
+            self.hashes[file] = digest
+
+        return True
+
+
+    ## Remove file and forget its content.
+    def remove(self, file: str):
+        with self.lock:
+            self.hashes.pop(file, None)
+
+        try:
+            os.remove(file)
+        except FileNotFoundError:
+            pass
+
+
+    ## Return dictionary with counters of done and skipped writes.
+    ## RETURN:
+    ## {'written': 120, 'skipped': 480}
+    def stats(self):
+        with self.lock:
+            return {'written': self.written, 'skipped': self.skipped}
+
+
+############################################################
+##                      Ring Storage                      ##
+############################################################
+## RingStore keeps metric history in pre-allocated memory-mapped file of
+## fixed-width binary records (timestamp + float fields). When file is full,
+## the oldest record is overwritten, so disk space and RAM stay constant.
+## Other processes can open the file with RingStore(file, writable=False)
+## and read records without parsing JSON. File which is truncated or has
+## invalid header is created again.
+##
+## Writer writes record to slot of the oldest one and then publishes it by
+## moving 'head'. Reader copies records and then reads 'head' again: records
+## whose slots were (or are being) overwritten meanwhile are dropped, so
+## reader never returns torn record.
+## Timestamps are wall clock time, which may step back (NTP, manual change).
+## Number of record written earlier than its predecessor is kept in header
+## and while that record has predecessor in ring, ranges are found by linear
+## scan instead of bisection.
+##
+## File layout (little-endian):
+## HEADER (64 B) | field names (32 B each) | padding | records
+## Record: timestamp (double) + one double per field.
+class RingStore:
+    MAGIC   = b'NMSRING1'
+    VERSION = 2
+    ## magic, version, record_size, capacity, field count, reserved,
+    ## data offset, head (total records written), count (records stored),
+    ## number of last record older than its predecessor (0 = none).
+    HEADER  = struct.Struct('<8sIIQIIQQQQ')
+    ## Offset of 'head' and 'count' in header and of 'back' after them.
+    HEAD    = struct.Struct('<QQ')
+    HEAD_OFFSET = 40
+    BACK    = struct.Struct('<Q')
+    BACK_OFFSET = 56
+    ## Maximal length of field name.
+    NAME_SIZE = 32
+
+    def __init__(self, file: str, fields: list = None, capacity: int = 0, writable: bool = True):
+        self.file = file
+        self.writable = writable
+
+        if writable:
+            self.create(list(fields), capacity)
+        else:
+            self.load()
+
+        ## Record format: timestamp + fields.
+        self.record = struct.Struct(f"<d{len(self.fields)}d")
+
+
+    ## Create ring file, or reuse existing one with same fields and capacity.
+    def create(self, fields: list, capacity: int):
+        names_size = len(fields) * self.NAME_SIZE
+        ## Records start at page boundary.
+        data_offset = (self.HEADER.size + names_size + mmap.PAGESIZE - 1) // mmap.PAGESIZE * mmap.PAGESIZE
+        record_size = 8 * (len(fields) + 1)
+        size = data_offset + record_size * capacity
+
+        ## Reuse existing file, if it has same layout.
+        try:
+            self.load()
+            if (self.fields == fields) and (self.capacity == capacity) and (self.data_offset == data_offset):
+                return
+            self.close()
+        except Exception as e:
+            if not isinstance(e, FileNotFoundError):
+                logging.warning(f"Ring file '{self.file}' is invalid, creating new one: {e}")
+
+        ## Create new (sparse) file of final size.
+        fd = os.open(self.file, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            self.mm = mmap.mmap(fd, size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        finally:
+            os.close(fd)
+
+        ## Write header and field names.
+        self.HEADER.pack_into(self.mm, 0, self.MAGIC, self.VERSION, record_size, capacity,
+                              len(fields), 0, data_offset, 0, 0, 0)
+        for i, name in enumerate(fields):
+            offset = self.HEADER.size + i * self.NAME_SIZE
+            self.mm[offset:offset + self.NAME_SIZE] = name.encode()[:self.NAME_SIZE].ljust(self.NAME_SIZE, b'\x00')
+
+        self.fields = fields
+        self.capacity = capacity
+        self.record_size = record_size
+        self.data_offset = data_offset
+
+
+    ## Map existing ring file and read its layout from header.
+    ## ERROR RETURN:
+    ## Exception
+    def load(self):
+        fd = os.open(self.file, os.O_RDWR if self.writable else os.O_RDONLY)
+        try:
+            if self.writable:
+                self.mm = mmap.mmap(fd, 0, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+            else:
+                self.mm = mmap.mmap(fd, 0, mmap.MAP_SHARED, mmap.PROT_READ)
+        finally:
+            os.close(fd)
+
+        if len(self.mm) < self.HEADER.size:
+            self.close()
+            raise ValueError(f"File \'{self.file}\' is not NEMESIS ring file (too short)!")
+
+        magic, version, self.record_size, self.capacity, count, _, self.data_offset, head, stored, _ = \
+            self.HEADER.unpack_from(self.mm, 0)
+        if (magic != self.MAGIC) or (version != self.VERSION):
+            self.close()
+            raise ValueError(f"File \'{self.file}\' is not NEMESIS ring file!")
+
+        ## Header must describe file which is all there (e.g. not truncated
+        ## or partially copied), otherwise every append would fail.
+        if ((self.record_size != 8 * (count + 1)) or (self.capacity < 1) or (stored > self.capacity)
+                or (stored > head) or (self.data_offset < self.HEADER.size + count * self.NAME_SIZE)
+                or (len(self.mm) < self.data_offset + self.record_size * self.capacity)):
+            self.close()
+            raise ValueError(f"File \'{self.file}\' has invalid header or is truncated!")
+
+        self.fields = []
+        for i in range(count):
+            offset = self.HEADER.size + i * self.NAME_SIZE
+            self.fields.append(bytes(self.mm[offset:offset + self.NAME_SIZE]).rstrip(b'\x00').decode())
+
+
+    ## Append record (one copy into mapped file, no allocation of storage).
+    def append(self, values: list, timestamp: float = None):
+        if timestamp is None:
+            timestamp = time.time()
+
+        head, count = self.HEAD.unpack_from(self.mm, self.HEAD_OFFSET)
+        offset = self.data_offset + (head % self.capacity) * self.record_size
+
+        ## Clock stepped back, so records are not ordered by time.
+        if count and timestamp < self.get(count - 1, head, count)[0]:
+            self.BACK.pack_into(self.mm, self.BACK_OFFSET, head)
+
+        ## Write record first, then publish it by moving head.
+        self.record.pack_into(self.mm, offset, timestamp, *values)
+        self.HEAD.pack_into(self.mm, self.HEAD_OFFSET, head + 1, min(count + 1, self.capacity))
+
+
+    ## Return record with passed index (0 = oldest stored record).
+    ## RETURN:
+    ## (1642370585.1, 3.7, 21.6, 0.0)
+    def get(self, index: int, head: int, count: int):
+        slot = (head - count + index) % self.capacity
+        return self.record.unpack_from(self.mm, self.data_offset + slot * self.record_size)
+
+
+    ## Return copied records with passed indexes (see get()) which were not
+    ## overwritten while they were copied. Writer may be writing record
+    ## number 'head' (slot of record 'head - capacity'), so records up to it
+    ## are dropped.
+    ## RETURN:
+    ## [(1642370585.1, 3.7, 21.6, 0.0), (1642370615.1, 4.1, 21.6, 0.0)]
+    def copy(self, indexes: range, head: int, count: int):
+        records = [self.get(i, head, count) for i in indexes]
+        overwritten = self.HEAD.unpack_from(self.mm, self.HEAD_OFFSET)[0] - self.capacity
+        first = head - count + indexes.start
+        return records[max(0, overwritten + 1 - first):]
+
+
+    ## Return list of records with timestamp in range [start, end], oldest
+    ## first. Records are found by bisection, or by linear scan when clock
+    ## stepped back within stored records.
+    ## RETURN:
+    ## [(1642370585.1, 3.7, 21.6, 0.0), (1642370615.1, 4.1, 21.6, 0.0)]
+    def read_range(self, start: float = 0.0, end: float = float('inf')):
+        head, count = self.HEAD.unpack_from(self.mm, self.HEAD_OFFSET)
+        back = self.BACK.unpack_from(self.mm, self.BACK_OFFSET)[0]
+
+        ## Record older than its predecessor (and the predecessor) is stored.
+        if back > head - count:
+            return [r for r in self.copy(range(count), head, count) if start <= r[0] <= end]
+
+        ## Find first record with timestamp >= start and first one > end.
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if self.get(middle, head, count)[0] < start:
+                low = middle + 1
+            else:
+                high = middle
+
+        last, high = low, count
+        while last < high:
+            middle = (last + high) // 2
+            if self.get(middle, head, count)[0] <= end:
+                last = middle + 1
+            else:
+                high = middle
+
+        ## Oldest records may be overwritten while bisecting, so range is
+        ## checked again.
+        return [r for r in self.copy(range(low, last), head, count) if start <= r[0] <= end]
+
+
+    ## Return list of last N records, oldest first.
+    def latest(self, n: int = 1):
+        head, count = self.HEAD.unpack_from(self.mm, self.HEAD_OFFSET)
+        return self.copy(range(max(count - n, 0), count), head, count)
+
+
+    ## Unmap file.
+    def close(self):
+        if getattr(self, 'mm', None) is not None:
+            self.mm.close()
+            self.mm = None
+
+
+############################################################
+##                    OUI Vendor Index                    ##
+############################################################
+## OuiIndex finds vendor of MAC address in index compiled from IEEE OUI
+## (24-bit prefix) and IAB (36-bit prefix) registries bundled with netaddr.
+## Index is memory-mapped file of sorted prefix arrays (binary search, no
+## parsing on lookup) and vendor names, so it is shared by all processes and
+## costs no heap memory. Index is rebuilt when registry files are newer, or
+## when it is truncated or invalid.
+##
+## File layout (native byte order):
+## HEADER (32 B) | OUI prefixes (uint32) | OUI name offsets (uint32) |
+## padding | IAB prefixes (uint64) | IAB name offsets (uint32) | names
+## Names are UTF-8 strings terminated by NUL, each stored once.
+class OuiIndex:
+    MAGIC = b'NMSOUI01'
+    ## magic, byte order check, OUI count, IAB count, file size, names offset.
+    HEADER = struct.Struct('=8sIIIIQ')
+    BYTE_ORDER = 0x01020304
+
+    def __init__(self, file: str):
+        self.file = file
+
+        with open(file, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.mm) < self.HEADER.size:
+            self.mm.close()
+            raise ValueError(f"File \'{file}\' is not OUI index (too short)!")
+        magic, order, oui_count, iab_count, size, names = self.HEADER.unpack_from(self.mm)
+        if magic != self.MAGIC or order != self.BYTE_ORDER:
+            self.mm.close()
+            raise ValueError(f"File \'{file}\' is not OUI index (or has other byte order)!")
+
+        ## Arrays must end where names start and file must have its full size
+        ## (truncated or corrupted index is rebuilt by load()).
+        iab_offset = (self.HEADER.size + 8 * oui_count + 7) // 8 * 8
+        if names != iab_offset + 12 * iab_count or size != len(self.mm) or names > size:
+            self.mm.close()
+            raise ValueError(f"File \'{file}\' is not complete OUI index!")
+
+        ## Arrays are views of mapped file (nothing is copied).
+        view = memoryview(self.mm)
+        offset = self.HEADER.size
+        self.oui_keys = view[offset:offset + 4 * oui_count].cast('I')
+        offset += 4 * oui_count
+        self.oui_names = view[offset:offset + 4 * oui_count].cast('I')
+        offset = iab_offset
+        self.iab_keys = view[offset:offset + 8 * iab_count].cast('Q')
+        offset += 8 * iab_count
+        self.iab_names = view[offset:offset + 4 * iab_count].cast('I')
+        self.names_offset = names
+
+        ## Decoded names by offset (every vendor is decoded once).
+        self.names = {}
+
+
+    ## Return dictionaries with vendor names of OUI (24-bit) and IAB (36-bit)
+    ## prefixes parsed from IEEE registry files.
+    ## RETURN:
+    ## ({0x10e992: 'INGRAM MICRO SERVICES', ...},
+    ## {0x40d8550d7: 'Avant Technologies', ...})
+    @staticmethod
+    def parse(oui_file: str, iab_file: str):
+        ouis = {}
+        with open(oui_file, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                ## '10E992     (base 16)		INGRAM MICRO SERVICES'
+                if '(base 16)' in line:
+                    prefix, _, name = line.partition('(base 16)')
+                    ouis[int(prefix.strip(), 16)] = name.strip()
+
+        iabs = {}
+        oui = None
+        with open(iab_file, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                ## '40-D8-55   (hex)   Avant Technologies' followed by
+                ## '0D7000-0D7FFF   (base 16)   Avant Technologies'.
+                if '(hex)' in line:
+                    oui = int(line.partition('(hex)')[0].strip().replace('-', ''), 16)
+                elif '(base 16)' in line and oui is not None:
+                    block, _, name = line.partition('(base 16)')
+                    start = int(block.strip().split('-')[0], 16)
+                    iabs[(oui << 12) | (start >> 12)] = name.strip()
+
+        return ouis, iabs
+
+
+    ## Return paths of registry files bundled with netaddr.
+    ## RETURN:
+    ## ('/usr/lib/python3/dist-packages/netaddr/eui/oui.txt',
+    ## '/usr/lib/python3/dist-packages/netaddr/eui/iab.txt')
+    @staticmethod
+    def sources():
+        directory = os.path.dirname(netaddr.eui.__file__)
+        return (f"{directory}/oui.txt", f"{directory}/iab.txt")
+
+
+    ## Compile registry files (netaddr ones if not passed) to index file.
+    @classmethod
+    def build(cls, file: str, oui_file: str = None, iab_file: str = None):
+        if oui_file is None or iab_file is None:
+            oui_file, iab_file = cls.sources()
+        ouis, iabs = cls.parse(oui_file, iab_file)
+
+        ## Every name is stored once.
+        names = bytearray()
+        offsets = {}
+        def offset(name: str):
+            if name not in offsets:
+                offsets[name] = len(names)
+                names.extend(name.encode() + b'\0')
+            return offsets[name]
+
+        oui_keys = sorted(ouis)
+        iab_keys = sorted(iabs)
+        data = bytearray()
+        data += array.array('I', oui_keys).tobytes()
+        data += array.array('I', (offset(ouis[k]) for k in oui_keys)).tobytes()
+        data += b'\0' * ((8 - (cls.HEADER.size + len(data)) % 8) % 8)
+        data += array.array('Q', iab_keys).tobytes()
+        data += array.array('I', (offset(iabs[k]) for k in iab_keys)).tobytes()
+        header = cls.HEADER.pack(cls.MAGIC, cls.BYTE_ORDER, len(oui_keys), len(iab_keys),
+                                 cls.HEADER.size + len(data) + len(names), cls.HEADER.size + len(data))
+
+        ## Readers never see half-written index.
+        tmp = f"{file}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(header + data + names)
+        os.replace(tmp, file)
+        logging.debug(f"OUI index \'{file}\' built: {len(oui_keys)} OUIs, {len(iab_keys)} IABs.")
+
+
+    ## Return OuiIndex of passed file, which is built first if it is missing
+    ## or older than registry files.
+    @classmethod
+    def load(cls, file: str):
+        try:
+            mtime = os.path.getmtime(file)
+        except OSError:
+            mtime = 0
+        if mtime < max(os.path.getmtime(source) for source in cls.sources()):
+            cls.build(file)
+
+        try:
+            return cls(file)
+        except ValueError:
+            cls.build(file)
+            return cls(file)
+
+
+    ## Return name stored at passed offset.
+    def name(self, offset: int):
+        if offset not in self.names:
+            start = self.names_offset + offset
+            self.names[offset] = self.mm[start:self.mm.find(b'\0', start)].decode()
+        return self.names[offset]
+
+
+    ## Return vendor of MAC address ('40:d8:55:0d:70:01', '40-D8-55-0D-70-01'
+    ## or integer). IAB (more specific) is tried first.
+    ## RETURN:
+    ## 'Avant Technologies'
+    ## ERROR RETURN:
+    ## None
+    def lookup(self, mac):
+        if isinstance(mac, str):
+            try:
+                mac = int(mac.replace(':', '').replace('-', ''), 16)
+            except ValueError:
+                return None
+
+        key = mac >> 12
+        i = bisect.bisect_left(self.iab_keys, key)
+        if i < len(self.iab_keys) and self.iab_keys[i] == key:
+            return self.name(self.iab_names[i])
+
+        key = mac >> 24
+        i = bisect.bisect_left(self.oui_keys, key)
+        if i < len(self.oui_keys) and self.oui_keys[i] == key:
+            return self.name(self.oui_names[i])
+
+        return None
+
+
+    ## Unmap index file.
+    def close(self):
+        for view in (self.oui_keys, self.oui_names, self.iab_keys, self.iab_names):
+            view.release()
+        self.mm.close()
+
+
+############################################################
+##                   Subnet Classifier                    ##
+############################################################
+## SubnetClassifier tags addresses (site, VLAN, zone, ...) by longest matching
+## prefix from list of configured networks. Every family has its own trie with
+## stride of 8 bits (IPv4 address takes at most 4 steps, IPv6 at most 16).
+## Nodes are blocks of 256 slots in flat arrays (child node and tags index of
+## longest prefix ending in slot), so lookup is only few array reads. Prefix
+## not aligned to 8 bits is expanded to all slots it covers, longer prefix
+## wins in shared slots.
+##
+## File format (one network per line, '#' starts comment):
+## 10.0.0.0/8      site=prague
+## 10.1.20.0/24    site=prague vlan=20 zone=dmz
+## fd00:1::/48     site=brno
+class SubnetClassifier:
+    ## Slots of one node.
+    FANOUT = 256
+    EMPTY = array.array('i', [-1]) * FANOUT
+
+    ## Shifts of address bits read on every level.
+    SHIFTS = {4: tuple(range(24, -1, -8)), 6: tuple(range(120, -1, -8))}
+
+    def __init__(self):
+        ## Trie arrays by family (4, 6): child node (offset of its first
+        ## slot), tags index and length of prefix which set tags of slot.
+        self.children = {4: array.array('i'), 6: array.array('i')}
+        self.values = {4: array.array('i'), 6: array.array('i')}
+        self.lengths = {4: array.array('B'), 6: array.array('B')}
+
+        ## Tags of default route ('0.0.0.0/0', '::/0') by family.
+        self.default = {4: -1, 6: -1}
+
+        ## Tags of networks (with matched network) by index.
+        self.tags = []
+
+        for family in (4, 6):
+            self.node(family)
+
+
+    ## Append empty node to trie of family and return offset of its first
+    ## slot.
+    def node(self, family: int):
+        offset = len(self.children[family])
+        self.children[family].extend(self.EMPTY)
+        self.values[family].extend(self.EMPTY)
+        self.lengths[family].extend(bytes(self.FANOUT))
+        return offset
+
+
+    ## Add network with its tags.
+    ## ERROR RETURN:
+    ## netaddr.AddrFormatError (invalid network)
+    def add(self, network: str, tags: dict):
+        network = netaddr.IPNetwork(network).cidr
+        family, prefix, value = network.version, network.prefixlen, int(network.network)
+        bits = 32 if family == 4 else 128
+
+        index = len(self.tags)
+        self.tags.append({'network': str(network), **tags})
+        if prefix == 0:
+            self.default[family] = index
+            return
+
+        ## Walk (and create) nodes of full bytes of prefix.
+        children, values, lengths = self.children[family], self.values[family], self.lengths[family]
+        level = (prefix - 1) // 8
+        node = 0
+        for shift in self.SHIFTS[family][:level]:
+            slot = node + ((value >> shift) & 0xff)
+            if children[slot] < 0:
+                children[slot] = self.node(family)
+            node = children[slot]
+
+        ## Remaining bits of prefix cover range of slots of last node.
+        first = node + ((value >> (bits - 8 * (level + 1))) & 0xff)
+        for slot in range(first, first + (1 << (8 * (level + 1) - prefix))):
+            if lengths[slot] <= prefix:
+                values[slot] = index
+                lengths[slot] = prefix
+
+
+    ## Return SubnetClassifier with networks from passed file.
+    ## ERROR RETURN:
+    ## OSError (file could not be read)
+    ## ValueError (invalid line)
+    @classmethod
+    def load(cls, file: str):
+        classifier = cls()
+        with open(file) as f:
+            for number, line in enumerate(f, 1):
+                fields = line.partition('#')[0].split()
+                if not fields:
+                    continue
+                try:
+                    tags = dict(field.split('=', 1) for field in fields[1:])
+                    classifier.add(fields[0], tags)
+                except (ValueError, netaddr.AddrFormatError):
+                    raise ValueError(f"Invalid line {number} of subnet file \'{file}\': {line.strip()}")
+
+        logging.debug(f"Subnet classifier loaded from \'{file}\': {len(classifier.tags)} networks.")
+        return classifier
+
+
+    ## Return index of tags of longest prefix containing address (integer of
+    ## passed family).
+    ## RETURN:
+    ## 1
+    ## ERROR RETURN:
+    ## -1 (no network contains address)
+    def match(self, value: int, family: int = 4):
+        children, values = self.children[family], self.values[family]
+        best = self.default[family]
+        node = 0
+        for shift in self.SHIFTS[family]:
+            slot = node + ((value >> shift) & 0xff)
+            if values[slot] >= 0:
+                best = values[slot]
+            node = children[slot]
+            if node < 0:
+                break
+        return best
+
+
+    ## Return list with tags of every passed address ('10.1.20.5', 'fd00:1::1',
+    ## 'fe80::1%eth0'), None for addresses which no network contains (or which
+    ## are invalid).
+    ## RETURN:
+    ## [{'network': '10.1.20.0/24', 'site': 'prague', 'vlan': '20', 'zone': 'dmz'},
+    ## None]
+    def classify(self, addresses: list):
+        ## Walk of match() is inlined, batch pays for attribute lookups once.
+        tries = {family: (self.children[family], self.values[family], self.default[family], self.SHIFTS[family])
+                 for family in (4, 6)}
+        tags = self.tags
+        inet_pton, from_bytes = socket.inet_pton, int.from_bytes
+        AF_INET, AF_INET6 = socket.AF_INET, socket.AF_INET6
+
+        result = []
+        for address in addresses:
+            try:
+                if ':' in address:
+                    value = from_bytes(inet_pton(AF_INET6, address.partition('%')[0]), 'big')
+                    children, values, best, shifts = tries[6]
+                    ## IPv4 mapped to IPv6 ('::ffff:10.1.20.5') is IPv4 address
+                    ## (same as in classify_ints()).
+                    if value >> 32 == 0xffff:
+                        value &= 0xffffffff
+                        children, values, best, shifts = tries[4]
+                else:
+                    value = from_bytes(inet_pton(AF_INET, address), 'big')
+                    children, values, best, shifts = tries[4]
+            except OSError:
+                result.append(None)
+                continue
+
+            node = 0
+            for shift in shifts:
+                slot = node + ((value >> shift) & 0xff)
+                if values[slot] >= 0:
+                    best = values[slot]
+                node = children[slot]
+                if node < 0:
+                    break
+            result.append(tags[best] if best >= 0 else None)
+
+        return result
+
+
+    ## Return list with tags of every passed address given as 128-bit integer
+    ## (IPv4 address mapped to IPv6, '::ffff:10.1.20.5', as in packed
+    ## addresses of HostInventory), None for addresses which no network
+    ## contains. Hosts come in few subnets, so walk of leading bytes (3 of
+    ## IPv4, 8 of IPv6) is done once per distinct prefix and cached for the
+    ## batch, most addresses take one dictionary and one array read.
+    ## RETURN:
+    ## [{'network': '10.1.20.0/24', 'site': 'prague', 'vlan': '20', 'zone': 'dmz'},
+    ## None]
+    def classify_ints(self, values: list):
+        children4, values4 = self.children[4], self.values[4]
+        children6, values6 = self.children[6], self.values[6]
+        shifts4, shifts6 = self.SHIFTS[4], self.SHIFTS[6]
+        tags = self.tags
+
+        ## (tags index, next node) after leading bytes by prefix.
+        cache4, cache6 = {}, {}
+
+        ## Continue walk from node, return tags index and next node.
+        def walk(children, values, best, node, value, shifts):
+            for shift in shifts:
+                slot = node + ((value >> shift) & 0xff)
+                if values[slot] >= 0:
+                    best = values[slot]
+                node = children[slot]
+                if node < 0:
+                    break
+            return best, node
+
+        result = []
+        for value in values:
+            if value >> 32 == 0xffff:
+                prefix = (value >> 8) & 0xffffff
+                entry = cache4.get(prefix)
+                if entry is None:
+                    entry = cache4[prefix] = walk(children4, values4, self.default[4], 0, value, shifts4[:3])
+                best, node = entry
+                if node >= 0 and values4[node + (value & 0xff)] >= 0:
+                    best = values4[node + (value & 0xff)]
+            else:
+                prefix = value >> 64
+                entry = cache6.get(prefix)
+                if entry is None:
+                    entry = cache6[prefix] = walk(children6, values6, self.default[6], 0, value, shifts6[:8])
+                best, node = entry
+                if node >= 0:
+                    best, node = walk(children6, values6, best, node, value, shifts6[8:])
+            result.append(tags[best] if best >= 0 else None)
+
+        return result
+
+
+    ## Return tags of one address (see classify()).
+    ## RETURN:
+    ## {'network': '10.0.0.0/8', 'site': 'prague'}
+    ## ERROR RETURN:
+    ## None
+    def lookup(self, address: str):
+        return self.classify([address])[0]
+
+
+############################################################
+##                      Port Scanner                      ##
+############################################################
+## PortScanner finds open TCP ports of hosts with connect probes. Probes are
+## limited by global and per-host number of open connections and by rate,
+## which is adapted to network (AIMD): rate is halved when too many probes in
+## window timed out and raised by small step otherwise. Between full cycles
+## only new hosts and hosts which changed are scanned.
+## Port states: 'open' (connected), 'closed' (refused), 'filtered' (no answer).
+## Probes which failed locally (e.g. no free descriptor, no route) are
+## 'error': they are not stored as port state and do not change the rate.
+class PortScanner:
+    ## Probes in one window of rate control and share of timed out probes
+    ## which halves rate.
+    WINDOW = 100
+    TIMEOUT_SHARE = 0.2
+
+    def __init__(self, ports: tuple, concurrency: int = 512, per_host: int = 32, timeout: float = 1.0,
+                 rate: int = 1000, full_every: int = 12):
+        self.ports = tuple(ports)
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, min(per_host, self.concurrency))
+        self.timeout = timeout
+
+        ## Probes per second: current, highest and lowest allowed.
+        self.max_rate = max(1, rate)
+        self.min_rate = max(1, self.max_rate // 20)
+        self.rate = self.max_rate
+
+        ## Every 'full_every' cycle scans all hosts.
+        self.full_every = max(1, full_every)
+        self.cycles = 0
+
+        ## Signature of every host at its last scan by key.
+        self.known = {}
+
+        ## Time of next allowed probe and probes/timeouts in current window.
+        self.next = 0.0
+        self.window = [0, 0]
+
+        ## Statistics of last cycle.
+        self.last = {'hosts': 0, 'probes': 0, 'open': 0, 'timeouts': 0, 'errors': 0, 'rate': self.rate,
+                     'duration': 0.0}
+
+
+    ## Return tuple of ports from string of ports and ranges.
+    ## RETURN:
+    ## (22, 80, 8000, 8001, 8002)
+    ## ERROR RETURN:
+    ## ValueError
+    @staticmethod
+    def parse_ports(text: str):
+        ports = set()
+        for part in text.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            first, _, last = part.partition('-')
+            first, last = int(first), int(last or first)
+            if first > last:
+                raise ValueError(f"Invalid port range \'{part}\'!")
+            ports.update(range(first, last + 1))
+        if any(not 0 < p < 65536 for p in ports):
+            raise ValueError(f"Invalid port in \'{text}\'!")
+
+        return tuple(sorted(ports))
+
+
+    ## Wait until next probe is allowed by current rate.
+    async def pace(self, loop):
+        now = loop.time()
+        self.next = max(self.next, now) + 1 / self.rate
+        if self.next - now > 0.005:
+            await asyncio.sleep(self.next - now)
+
+
+    ## Count probe result and adapt rate at the end of window.
+    def adapt(self, timed_out: bool):
+        self.window[0] += 1
+        self.window[1] += timed_out
+        if self.window[0] < self.WINDOW:
+            return
+
+        if self.window[1] > self.TIMEOUT_SHARE * self.window[0]:
+            self.rate = max(self.min_rate, self.rate // 2)
+        else:
+            self.rate = min(self.max_rate, self.rate + max(1, self.max_rate // 20))
+        self.window = [0, 0]
+
+
+    ## Return state of TCP port or 'error' when probe failed locally.
+    ## RETURN:
+    ## 'open' || 'closed' || 'filtered' || 'error'
+    async def probe(self, loop, address: str, port: int):
+        sock = None
+        try:
+            ## Socket can not be created e.g. without free descriptor (EMFILE).
+            sock = socket.socket(socket.AF_INET6 if ':' in address else socket.AF_INET, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            await asyncio.wait_for(loop.sock_connect(sock, (address, port)), self.timeout)
+            return 'open'
+        except ConnectionRefusedError:
+            return 'closed'
+        except asyncio.TimeoutError:
+            self.last['timeouts'] += 1
+            return 'filtered'
+        except OSError as e:
+            logging.debug(f"Probe of port {port} of {address} failed: {e}.")
+            self.last['errors'] += 1
+            return 'error'
+        finally:
+            if sock is not None:
+                sock.close()
+
+
+    ## Return dictionary with state of every port of host, ports whose probe
+    ## failed locally are left out.
+    ## RETURN:
+    ## {22: 'open', 80: 'closed', 443: 'filtered'}
+    async def scan_host(self, loop, address: str, slots):
+        host_slots = asyncio.Semaphore(self.per_host)
+        states = {}
+        tasks = set()
+
+        async def probe(port: int):
+            try:
+                await self.pace(loop)
+                state = await self.probe(loop, address, port)
+                self.last['probes'] += 1
+                if state != 'error':
+                    states[port] = state
+                    self.adapt(state == 'filtered')
+            finally:
+                host_slots.release()
+                slots.release()
+
+        ## Per-host slot is taken first, so waiting probes hold no global slot.
+        for port in self.ports:
+            await host_slots.acquire()
+            await slots.acquire()
+            task = loop.create_task(probe(port))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.wait(tasks)
+
+        return dict(sorted(states.items()))
+
+
+    ## Scan passed hosts ({key: (address, signature)}) and return port states
+    ## of scanned hosts by key. Only hosts which are new or whose signature
+    ## (e.g. MAC address) changed are scanned, except every 'full_every' cycle.
+    ## Host counts as scanned only when all its probes finished without local
+    ## error, so host of interrupted scan is scanned again next cycle.
+    ## RETURN:
+    ## {'10.0.100.1': {22: 'open', 80: 'closed'}}
+    async def scan(self, hosts: dict):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        full = self.cycles % self.full_every == 0
+        self.cycles += 1
+        targets = {k: a for k, (a, sig) in hosts.items() if full or k not in self.known or self.known[k] != sig}
+        self.known = {k: sig for k, (_, sig) in hosts.items() if k not in targets}
+        self.last = {'hosts': len(targets), 'probes': 0, 'open': 0, 'timeouts': 0, 'errors': 0, 'rate': self.rate,
+                     'duration': 0.0}
+
+        ## Enough hosts at once to fill all global slots.
+        slots = asyncio.Semaphore(self.concurrency)
+        hosts_at_once = asyncio.Semaphore(self.concurrency // self.per_host + 1)
+
+        async def scan_host(key: str, address: str):
+            async with hosts_at_once:
+                return key, await self.scan_host(loop, address, slots)
+
+        results = dict(await asyncio.gather(*(scan_host(k, a) for k, a in targets.items())))
+        self.known.update((k, hosts[k][1]) for k, states in results.items() if len(states) == len(self.ports))
+
+        self.last['open'] = sum(s == 'open' for states in results.values() for s in states.values())
+        self.last['rate'] = self.rate
+        self.last['duration'] = round(loop.time() - started, 3)
+        logging.debug(f"Port scan ({'full' if full else 'changed'}): {self.last}.")
+
+        return results
+
+
+############################################################
+##                     Host Inventory                     ##
+############################################################
+## HostInventory keeps all found hosts in one SQLite database (WAL mode, so
+## readers are not blocked by writes), indexed by address, MAC, subnet and
+## last detection. Hosts of one scan are written in one transaction and
+## records from different sources (sweeps, neighbour tables) are merged.
+## Addresses are stored as 16 bytes (IPv4 mapped to '::ffff:0:0/96'), so
+## subnet of any size is one index range.
+## Services table keeps ports of hosts which were ever open, with time of
+## first and last detection and of last change of state.
+## Hosts expired from neighbour tables lose their neighbour data and hosts
+## not found by sweeps for 'expire' seconds lose their sweep data, host
+## without any data is deleted (so exported files follow found hosts).
+class HostInventory:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS hosts (
+            key        TEXT PRIMARY KEY,
+            ip         TEXT NOT NULL,
+            ip_bin     BLOB NOT NULL,
+            family     TEXT NOT NULL,
+            mac        TEXT,
+            subnet     TEXT,
+            interface  TEXT,
+            method     TEXT,
+            state      TEXT,
+            rtt_ms     REAL,
+            first_seen REAL NOT NULL,
+            last_seen  REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS hosts_ip ON hosts (ip_bin);
+        CREATE INDEX IF NOT EXISTS hosts_mac ON hosts (mac);
+        CREATE INDEX IF NOT EXISTS hosts_subnet ON hosts (subnet);
+        CREATE INDEX IF NOT EXISTS hosts_last_seen ON hosts (last_seen);
+        CREATE TABLE IF NOT EXISTS services (
+            key        TEXT NOT NULL,
+            port       INTEGER NOT NULL,
+            state      TEXT NOT NULL,
+            first_seen REAL NOT NULL,
+            last_seen  REAL NOT NULL,
+            changed    REAL NOT NULL,
+            PRIMARY KEY (key, port)
+        );
+    """
+
+    ## Columns added to hosts table after first release (added to existing
+    ## databases on open): method of last sweep which found host (NULL if it
+    ## was only in neighbour tables) and state changes of host in neighbour
+    ## tables (NULL if it was only found by sweep).
+    COLUMNS = (
+        ('sweep_method',  'TEXT'),
+        ('state_changes', 'INTEGER'),
+        ('state_changed', 'REAL')
+    )
+
+    ## Missing values of new record keep stored ones, first and last
+    ## detection only move outwards.
+    UPSERT = """
+        INSERT INTO hosts (key, ip, ip_bin, family, mac, subnet, interface, method, state, rtt_ms, first_seen, last_seen,
+                           sweep_method, state_changes, state_changed)
+        VALUES (:key, :ip, :ip_bin, :family, :mac, :subnet, :interface, :method, :state, :rtt_ms, :first_seen, :last_seen,
+                :sweep_method, :state_changes, :state_changed)
+        ON CONFLICT (key) DO UPDATE SET
+            mac           = COALESCE(excluded.mac, mac),
+            subnet        = COALESCE(excluded.subnet, subnet),
+            interface     = COALESCE(excluded.interface, interface),
+            method        = COALESCE(excluded.method, method),
+            state         = COALESCE(excluded.state, state),
+            rtt_ms        = COALESCE(excluded.rtt_ms, rtt_ms),
+            first_seen    = MIN(first_seen, excluded.first_seen),
+            last_seen     = MAX(last_seen, excluded.last_seen),
+            sweep_method  = COALESCE(excluded.sweep_method, sweep_method),
+            state_changes = COALESCE(excluded.state_changes, state_changes),
+            state_changed = COALESCE(excluded.state_changed, state_changed)
+    """
+
+    ## Time of first detection is kept, last detection moves only while port
+    ## is open.
+    UPSERT_SERVICE = """
+        INSERT INTO services (key, port, state, first_seen, last_seen, changed)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (key, port) DO UPDATE SET
+            state     = excluded.state,
+            last_seen = CASE WHEN excluded.state = 'open' THEN excluded.last_seen ELSE last_seen END,
+            changed   = CASE WHEN excluded.state != state THEN excluded.changed ELSE changed END
+    """
+
+    ## Format of times in host records.
+    TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+    def __init__(self, file: str, expire: float = 0):
+        self.file = file
+
+        ## Seconds since last detection after which sweep data of host is
+        ## forgotten (0 = never).
+        self.expire = expire
+
+        ## Writer and reader connections (used from different threads).
+        self.db = sqlite3.connect(file, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(self.SCHEMA)
+        known = {row[1] for row in self.db.execute('PRAGMA table_info(hosts)')}
+        for column, kind in self.COLUMNS:
+            if column not in known:
+                self.db.execute(f"ALTER TABLE hosts ADD COLUMN {column} {kind}")
+        self.db.commit()
+        self.reader = sqlite3.connect(file, check_same_thread=False)
+
+        self.write_lock = threading.Lock()
+        self.read_lock = threading.Lock()
+
+        ## Networks used to fill subnet of hosts (most specific first).
+        self.networks = []
+
+        ## OuiIndex used to add vendor to host records.
+        self.vendors = None
+
+        ## SubnetClassifier used to add tags to host records.
+        self.classifier = None
+
+
+    ## Return address as 16 bytes (IPv4 address mapped to IPv6).
+    ## RETURN:
+    ## b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\xff\xff\n\x00d\x01'
+    @staticmethod
+    def packed(address: str):
+        if ':' in address:
+            return socket.inet_pton(socket.AF_INET6, address)
+        return b'\0' * 10 + b'\xff\xff' + socket.inet_aton(address)
+
+
+    ## Set networks of interfaces used to fill subnet of hosts.
+    def set_networks(self, networks: list):
+        ## (first, last, name) of packed addresses, most specific first.
+        self.networks = [(self.packed(str(n.network)), self.packed(str(n.broadcast or n[-1])), str(n))
+                         for n in sorted(networks, key=lambda n: n.prefixlen, reverse=True)]
+
+
+    ## Return most specific known network containing packed address.
+    ## RETURN:
+    ## '10.0.100.0/24'
+    ## ERROR RETURN:
+    ## None
+    def subnet(self, packed: bytes):
+        for first, last, name in self.networks:
+            if first <= packed <= last:
+                return name
+        return None
+
+
+    ## Write host records of one scan (see HostDiscovery.sweep() and
+    ## NeighbourTracker.tick()) in one transaction.
+    def upsert(self, records: list):
+        ## Records of one scan share few distinct times, parse each once.
+        times = {}
+        def timestamp(text: str):
+            if text not in times:
+                times[text] = datetime.datetime.strptime(text, self.TIME_FORMAT).timestamp()
+            return times[text]
+
+        rows = []
+        for r in records:
+            packed = self.packed(r['ip'])
+            ## Records of neighbour tables have state, records of sweeps not.
+            neigh = 'state' in r
+            rows.append({
+                'key':        NeighbourTracker.key(r['ip'], r.get('interface', "")),
+                'ip':         r['ip'],
+                'ip_bin':     packed,
+                'family':     r.get('family', 'ipv6' if ':' in r['ip'] else 'ipv4'),
+                'mac':        r.get('mac'),
+                'subnet':     self.subnet(packed),
+                'interface':  r.get('interface') or None,
+                'method':     r.get('method', 'neigh' if 'state' in r else None),
+                'state':      r.get('state'),
+                'rtt_ms':     r.get('rtt_ms'),
+                'first_seen': timestamp(r['first_seen']),
+                'last_seen':  timestamp(r['last_seen']),
+                'sweep_method':  None if neigh else r.get('method'),
+                'state_changes': r.get('state_changes') if neigh else None,
+                'state_changed': timestamp(r['state_changed']) if neigh and r.get('state_changed') else None
+            })
+
+        with self.write_lock, self.db:
+            self.db.executemany(self.UPSERT, rows)
+
+
+    ## Forget neighbour table data of passed hosts (keys of hosts expired from
+    ## neighbour tables, see NeighbourTracker.tick()) and forget sweep data of
+    ## hosts not found for 'expire' seconds. Hosts left without any data are
+    ## deleted with their services.
+    def prune(self, keys: list = ()):
+        with self.write_lock, self.db:
+            self.db.executemany('UPDATE hosts SET state = NULL, state_changes = NULL, state_changed = NULL, '
+                                'method = sweep_method WHERE key = ?', [(key,) for key in keys])
+            if self.expire > 0:
+                self.db.execute('UPDATE hosts SET sweep_method = NULL WHERE last_seen < ? AND sweep_method IS NOT NULL',
+                                (time.time() - self.expire,))
+            if self.db.execute('DELETE FROM hosts WHERE sweep_method IS NULL AND state_changes IS NULL').rowcount:
+                self.db.execute('DELETE FROM services WHERE key NOT IN (SELECT key FROM hosts)')
+
+
+    ## Return list of host records matching all passed filters: network
+    ## ('10.0.0.0/16'), seconds since last detection, MAC address, family.
+    ## RETURN:
+    ## [{'ip': '10.0.100.1', 'family': 'ipv4', 'mac': '00:2b:67:ad:bb:f6',
+    ## 'subnet': '10.0.100.0/24', 'interface': 'eth0', 'method': 'icmp',
+    ## 'state': 'reachable', 'rtt_ms': 0.4, 'first_seen': '2022-01-16 14:07:43',
+    ## 'last_seen': '2022-01-16 23:03:05', 'open_ports': [22, 80],
+    ## 'vendor': 'Dell Inc.', 'tags': {'network': '10.0.0.0/8', 'site': 'prague'}}]
+    ## ('tags' only with classifier, see SubnetClassifier)
+    ## ERROR RETURN:
+    ## ValueError (invalid network)
+    def query(self, network: str = None, since: float = None, mac: str = None, family: str = None):
+        where, args = [], []
+        if network:
+            network = netaddr.IPNetwork(network)
+            if network.version == 4:
+                first, last = (self.packed(str(netaddr.IPAddress(a, 4))) for a in (network.first, network.last))
+            else:
+                first, last = (netaddr.IPAddress(a, 6).packed for a in (network.first, network.last))
+            where.append('hosts.ip_bin BETWEEN ? AND ?')
+            args += [first, last]
+        if since is not None:
+            where.append('hosts.last_seen >= ?')
+            args.append(time.time() - since)
+        if mac:
+            where.append('hosts.mac = ?')
+            args.append(mac.lower())
+        if family:
+            where.append('hosts.family = ?')
+            args.append(family)
+        where = ' AND '.join(where)
+
+        sql = ('SELECT ip, family, mac, subnet, interface, method, state, rtt_ms, first_seen, last_seen, key, ip_bin FROM hosts' +
+               (' WHERE ' + where if where else '') + ' ORDER BY ip_bin')
+        ## Open ports only of selected hosts (same conditions on joined hosts).
+        ports_sql = ("SELECT services.key, services.port FROM hosts JOIN services ON services.key = hosts.key "
+                     "WHERE services.state = 'open'" + (' AND ' + where if where else '') + ' ORDER BY services.port')
+        with self.read_lock:
+            rows = self.reader.execute(sql, args).fetchall()
+            ports = {}
+            for key, port in self.reader.execute(ports_sql, args):
+                ports.setdefault(key, []).append(port)
+
+        ## Hosts of one scan share few distinct times, format each once.
+        times = {}
+        def text(timestamp: float):
+            if timestamp not in times:
+                times[timestamp] = datetime.datetime.fromtimestamp(timestamp).strftime(self.TIME_FORMAT)
+            return times[timestamp]
+
+        records = [{'ip': row[0], 'family': row[1], 'mac': row[2], 'subnet': row[3], 'interface': row[4],
+                    'method': row[5], 'state': row[6], 'rtt_ms': row[7], 'first_seen': text(row[8]), 'last_seen': text(row[9]),
+                    'open_ports': ports.get(row[10], []),
+                    'vendor': self.vendors.lookup(row[2]) if (row[2] and self.vendors) else None}
+                   for row in rows]
+
+        ## Tags of all hosts in one batch.
+        if self.classifier is not None:
+            for record, tags in zip(records, self.classifier.classify_ints([int.from_bytes(row[11], 'big') for row in rows])):
+                record['tags'] = tags
+
+        return records
+
+
+    ## Write port states of scanned hosts (see PortScanner.scan()) in one
+    ## transaction and return list of changes. Ports which were never open
+    ## are not stored.
+    ## RETURN:
+    ## [{'key': '10.0.100.1', 'port': 22, 'old': None, 'new': 'open'},
+    ## {'key': '10.0.100.1', 'port': 80, 'old': 'open', 'new': 'closed'}]
+    def upsert_services(self, results: dict):
+        now = time.time()
+        changes = []
+        with self.write_lock, self.db:
+            for key, states in results.items():
+                known = dict(self.db.execute('SELECT port, state FROM services WHERE key = ?', (key,)).fetchall())
+                rows = []
+                for port, state in states.items():
+                    old = known.get(port)
+                    if state != 'open' and old is None:
+                        continue
+                    if state != old:
+                        changes.append({'key': key, 'port': port, 'old': old, 'new': state})
+                    rows.append((key, port, state, now, now, now))
+                self.db.executemany(self.UPSERT_SERVICE, rows)
+
+        return changes
+
+
+    ## Return number of hosts by family.
+    ## RETURN:
+    ## {'ipv4': 120, 'ipv6': 14}
+    def count(self):
+        with self.read_lock:
+            return dict(self.reader.execute('SELECT family, COUNT(*) FROM hosts GROUP BY family').fetchall())
+
+
+    ## Return dictionary with JSON string of every host by file in passed
+    ## directories by family, in the same layout and with the same fields as
+    ## written without inventory: '<key>.json' for hosts found by sweeps (see
+    ## HostDiscovery.sweep()) and 'neigh_<key>.json' for hosts found in
+    ## neighbour tables (see NeighbourTracker.tick()). Host found both ways
+    ## has both files. Records of sweeps also have open ports (see
+    ## PortScanner).
+    ## RETURN:
+    ## {'/etc/nemesis/nemesis_data/json/ipv4/10.0.100.1.json': '{"ip": "10.0.100.1", "method": "icmp", ...}',
+    ## '/etc/nemesis/nemesis_data/json/ipv4/neigh_10.0.100.1.json': '{"ip": "10.0.100.1", "family": "ipv4", ...}',
+    ## '/etc/nemesis/nemesis_data/json/ipv6/fe80::1%eth0.json': '{"ip": "fe80::1", "interface": "eth0", ...}'}
+    def export(self, directories: tuple):
+        with self.read_lock:
+            rows = self.reader.execute('SELECT key, ip, family, mac, interface, state, rtt_ms, first_seen, last_seen, '
+                                       'sweep_method, state_changes, state_changed, ip_bin FROM hosts ORDER BY ip_bin').fetchall()
+            ports = {}
+            for key, port in self.reader.execute("SELECT key, port FROM services WHERE state = 'open' ORDER BY port"):
+                ports.setdefault(key, []).append(port)
+
+        times = {}
+        def text(timestamp: float):
+            if timestamp not in times:
+                times[timestamp] = datetime.datetime.fromtimestamp(timestamp).strftime(self.TIME_FORMAT)
+            return times[timestamp]
+
+        tags = (self.classifier.classify_ints([int.from_bytes(row[12], 'big') for row in rows])
+                if self.classifier is not None else [None] * len(rows))
+
+        files = {}
+        for (key, ip, family, mac, interface, state, rtt_ms, first_seen, last_seen,
+             sweep_method, state_changes, state_changed, _), tag in zip(rows, tags):
+            directory = directories[0] if family == 'ipv4' else directories[1]
+            if sweep_method is not None:
+                record = {'ip': ip}
+                if family == 'ipv6':
+                    record['interface'] = interface or ""
+                record.update({'method': sweep_method, 'rtt_ms': rtt_ms, 'first_seen': text(first_seen),
+                               'last_seen': text(last_seen), 'open_ports': ports.get(key, [])})
+                if self.classifier is not None:
+                    record['tags'] = tag
+                files[f"{directory}/{key}.json"] = json.dumps(record)
+            if state_changes is not None:
+                record = {
+                    'ip':            ip,
+                    'family':        family,
+                    'interface':     interface or "",
+                    'mac':           mac,
+                    'vendor':        self.vendors.lookup(mac) if (mac and self.vendors) else None,
+                    'state':         state,
+                    'state_changes': state_changes,
+                    'state_changed': text(state_changed) if state_changed is not None else text(first_seen),
+                    'first_seen':    text(first_seen),
+                    'last_seen':     text(last_seen)
+                }
+                if self.classifier is not None:
+                    record['tags'] = tag
+                files[f"{directory}/neigh_{key}.json"] = json.dumps(record)
+
+        return files
+
+
+    ## Close database.
+    def close(self):
+        with self.read_lock:
+            self.reader.close()
+        with self.write_lock:
+            self.db.close()
+
+
+############################################################
+##                       Scheduler                        ##
+############################################################
+## Scheduler runs many jobs, each every X seconds, with one dispatcher thread
+## and small pool of worker threads. Every job runs right after start, then
+## deadlines are absolute (start + phase + N * interval), so time spent by job
+## does not shift next run. Jobs get different phase inside their interval,
+## so they do not all run at once later. Long jobs (e.g. sweeps and scans)
+## get own worker thread each, so they never hold workers of short jobs.
+class Scheduler:
+    def __init__(self, workers: int = 1):
+        ## Jobs by name, e.g.
+        ## {'sysinfo': {'function': f, 'interval': 30, 'deadline': 1234.5,
+        ## 'second': None, 'running': False, 'pending': False, 'runs': 10,
+        ## 'missed': 0}}
+        self.jobs = {}
+
+        ## Heap of (deadline, sequence, name).
+        self.heap = []
+        self.sequence = 0
+
+        ## Jobs ready to run, taken by worker threads (None stops worker).
+        self.ready = queue.Queue()
+        self.workers = workers
+
+        ## Queues of long jobs (each has own worker) by name and worker
+        ## threads with queue they take jobs from.
+        self.long = {}
+        self.threads = []
+
+        ## Start time of scheduler (deadlines are relative to it).
+        self.start_time = time.monotonic()
+
+        ## Statistics: missed deadlines and lateness of job start.
+        self.missed = 0
+        self.jitter = collections.deque(maxlen=1000)
+
+        self.cond = threading.Condition()
+        self.running = False
+
+
+    ## Add job which runs passed function right after start and then every
+    ## 'interval' seconds. Without passed phase, job gets phase derived from
+    ## its name. Long job runs in its own worker thread.
+    def add(self, name: str, function, interval: float, phase: float = None, long: bool = False):
+        phase = self.phase(name, interval, phase)
+
+        with self.cond:
+            if long:
+                self.long[name] = queue.Queue()
+            self.jobs[name] = {
+                'function': function,
+                'interval': interval,
+                'deadline': self.start_time,
+                'second':   self.start_time + phase,
+                'running':  False,
+                'pending':  False,
+                'runs':     0,
+                'missed':   0
+            }
+            self.push(name)
+
+
+    ## Return offset of second run of job from start. Phase spreads jobs over
+    ## interval (same name gets always same phase), second run is at least
+    ## half of interval after first one.
+    ## RETURN:
+    ## 29.1
+    @staticmethod
+    def phase(name: str, interval: float, phase: float = None):
+        if phase is None:
+            phase = (zlib.crc32(name.encode()) / 2**32) * interval
+        if phase < interval / 2:
+            phase += interval
+        return phase
+
+
+    ## Put job to heap by its deadline (call with self.cond locked).
+    def push(self, name: str):
+        self.sequence += 1
+        heapq.heappush(self.heap, (self.jobs[name]['deadline'], self.sequence, name))
+        self.cond.notify()
+
+
+    ## Pass job to its worker (own queue of long job or shared one).
+    def dispatch(self, name: str, deadline: float):
+        self.long.get(name, self.ready).put((name, deadline))
+
+
+    ## Run job as soon as possible, outside of its schedule (e.g. after
+    ## netlink event). Scheduled deadlines are not changed.
+    def trigger(self, name: str):
+        with self.cond:
+            job = self.jobs.get(name)
+            if job is None:
+                return
+
+            ## Job which is running right now runs once more after it ends.
+            if job['running']:
+                job['pending'] = True
+            else:
+                job['running'] = True
+                self.dispatch(name, time.monotonic())
+
+
+    ## Dispatch jobs until stop() is called (blocks calling thread).
+    def run(self):
+        self.running = True
+
+        ## Start worker threads.
+        workers = [(f"worker-{i}", self.ready) for i in range(self.workers)]
+        workers += [(f"worker-{name}", ready) for name, ready in self.long.items()]
+        for name, ready in workers:
+            thread = threading.Thread(target=self.work, args=(ready,), name=name, daemon=True)
+            thread.start()
+            self.threads.append((thread, ready))
+
+        while self.running:
+            with self.cond:
+                now = time.monotonic()
+
+                ## Wait until first deadline (at most 1 s, so stop() is noticed
+                ## also when it was called from signal handler).
+                if (not self.heap) or (self.heap[0][0] > now):
+                    timeout = 1.0 if not self.heap else min(self.heap[0][0] - now, 1.0)
+                    self.cond.wait(timeout)
+                    continue
+
+                deadline, _, name = heapq.heappop(self.heap)
+                job = self.jobs[name]
+
+                ## Next deadline is absolute (after first run it is the phased
+                ## second one), skip deadlines which already passed.
+                if job['second'] is not None:
+                    job['deadline'], job['second'] = job['second'], None
+                else:
+                    job['deadline'] = deadline + job['interval']
+                if job['deadline'] <= now:
+                    skipped = int((now - job['deadline']) // job['interval']) + 1
+                    job['deadline'] += skipped * job['interval']
+                    job['missed'] += skipped
+                    self.missed += skipped
+                self.push(name)
+
+                ## Previous run did not end yet, this deadline is missed.
+                if job['running']:
+                    job['missed'] += 1
+                    self.missed += 1
+                    continue
+
+                job['running'] = True
+                self.dispatch(name, deadline)
+
+        ## Stop worker threads (running jobs can finish).
+        for _, ready in self.threads:
+            ready.put(None)
+        for thread, _ in self.threads:
+            thread.join(timeout=5)
+
+
+    ## Worker thread: run jobs from passed queue until None is received.
+    def work(self, ready: queue.Queue):
+        while True:
+            item = ready.get()
+            if item is None:
+                break
+
+            name, deadline = item
+            job = self.jobs[name]
+            self.jitter.append(time.monotonic() - deadline)
+
+            try:
+                job['function']()
+            except Exception:
+                logging.exception(f"Job \'{name}\' failed!")
+
+            with self.cond:
+                job['runs'] += 1
+
+                ## Job was triggered while it was running.
+                if job['pending']:
+                    job['pending'] = False
+                    self.dispatch(name, time.monotonic())
+                else:
+                    job['running'] = False
+
+
+    ## Stop dispatching (safe to call from signal handler).
+    def stop(self):
+        self.running = False
+
+
+    ## Return dictionary with scheduler statistics (jitter in milliseconds).
+    ## RETURN:
+    ## {'jobs': 2, 'runs': 120, 'missed': 0, 'jitter_avg': 0.12,
+    ## 'jitter_max': 1.05}
+    def stats(self):
+        jitter = list(self.jitter)
+
+        return {
+            'jobs':       len(self.jobs),
+            'runs':       sum(job['runs'] for job in self.jobs.values()),
+            'missed':     self.missed,
+            'jitter_avg': round(1000 * sum(jitter) / len(jitter), 2) if jitter else 0.0,
+            'jitter_max': round(1000 * max(jitter), 2) if jitter else 0.0
+        }
+
+
+############################################################
+##                     Async Runtime                      ##
+############################################################
+## AsyncRuntime is asyncio alternative to Scheduler. Collectors are coroutines
+## running on absolute deadlines in one event loop, blocking work (kernel
+## reads, file writes) is sent to bounded thread pool. Thousands of waiting
+## coroutines (e.g. network probes) cost only their small frames.
+## It has the same add(), trigger(), run(), stop() and stats() as Scheduler.
+class AsyncRuntime:
+    def __init__(self, workers: int = 4):
+        ## Thread pool for blocking calls and number of calls allowed to wait
+        ## for it (more callers wait in event loop, not in pool queue).
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='blocking')
+        self.workers = workers
+        self.slots = None
+
+        ## Collectors by name, e.g.
+        ## {'sysinfo': {'function': f, 'interval': 30, 'phase': 12.5,
+        ## 'event': asyncio.Event, 'runs': 10, 'missed': 0}}
+        self.collectors = {}
+
+        ## Statistics: missed deadlines and lateness of collector start.
+        self.missed = 0
+        self.jitter = collections.deque(maxlen=1000)
+
+        self.loop = None
+        self.stopped = None
+
+
+    ## Add collector: function returning awaitable (e.g. coroutine function),
+    ## which is awaited right after start and then every 'interval' seconds.
+    def add(self, name: str, function, interval: float, phase: float = None):
+        self.collectors[name] = {
+            'function': function,
+            'interval': interval,
+            ## Offset of second run from start (same as Scheduler).
+            'phase':    Scheduler.phase(name, interval, phase),
+            'event':    None,
+            'runs':     0,
+            'missed':   0
+        }
+
+
+    ## Run blocking function in thread pool and return its result.
+    async def blocking(self, function, *args):
+        async with self.slots:
+            return await self.loop.run_in_executor(self.executor, function, *args)
+
+
+    ## Run collector on its deadlines (or when triggered) until cancelled.
+    async def collector(self, name: str):
+        job = self.collectors[name]
+        job['event'] = asyncio.Event()
+        deadline = self.loop.time()
+        second = deadline + job['phase']
+
+        while True:
+            ## Wait until deadline or trigger.
+            try:
+                await asyncio.wait_for(job['event'].wait(), max(deadline - self.loop.time(), 0))
+            except asyncio.TimeoutError:
+                now = self.loop.time()
+                self.jitter.append(now - deadline)
+
+                ## Next deadline is absolute (after first run it is the phased
+                ## second one), skip deadlines which already passed.
+                if second is not None:
+                    deadline, second = second, None
+                else:
+                    deadline += job['interval']
+                if deadline <= now:
+                    skipped = int((now - deadline) // job['interval']) + 1
+                    deadline += skipped * job['interval']
+                    job['missed'] += skipped
+                    self.missed += skipped
+            job['event'].clear()
+
+            try:
+                await job['function']()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logging.exception(f"Collector \'{name}\' failed!")
+            job['runs'] += 1
+
+
+    ## Run collector as soon as possible (thread safe, e.g. from netlink thread).
+    def trigger(self, name: str):
+        job = self.collectors.get(name)
+        if (self.loop is not None) and job and (job['event'] is not None):
+            self.loop.call_soon_threadsafe(job['event'].set)
+
+
+    ## Run all collectors until stop() is called.
+    async def main(self):
+        self.loop = asyncio.get_running_loop()
+        self.slots = asyncio.Semaphore(self.workers * 2)
+        self.stopped = asyncio.Event()
+
+        tasks = [asyncio.create_task(self.collector(name)) for name in self.collectors]
+        await self.stopped.wait()
+
+        ## Cancel collectors and let running blocking calls finish.
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.executor.shutdown(wait=True)
+
+
+    ## Run event loop (blocks calling thread until stop() is called).
+    def run(self):
+        asyncio.run(self.main())
+
+
+    ## Stop event loop (safe to call from signal handler or other thread).
+    def stop(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.stopped.set)
+
+
+    ## Return dictionary with runtime statistics (jitter in milliseconds).
+    ## RETURN:
+    ## {'jobs': 2, 'runs': 120, 'missed': 0, 'jitter_avg': 0.12,
+    ## 'jitter_max': 1.05}
+    def stats(self):
+        jitter = list(self.jitter)
+
+        return {
+            'jobs':       len(self.collectors),
+            'runs':       sum(job['runs'] for job in self.collectors.values()),
+            'missed':     self.missed,
+            'jitter_avg': round(1000 * sum(jitter) / len(jitter), 2) if jitter else 0.0,
+            'jitter_max': round(1000 * max(jitter), 2) if jitter else 0.0
+        }
+
+
+############################################################
+##                     Snapshot Store                     ##
+############################################################
+## SnapshotStore keeps latest serialized JSON data of every section (e.g.
+## 'sys', 'net') in memory. Every change of section gets new sequence number.
+## Section of big table which changes by parts (e.g. 'neigh') can be published
+## lazily: it is joined only when reader asks for it (see publish_lazy()).
+class SnapshotStore:
+    def __init__(self):
+        ## Sections by name: (sequence number, JSON bytes or function
+        ## returning JSON string of lazy section).
+        self.sections = {}
+        self.seq = 0
+
+        ## Data of sections before serialization by name (e.g. for metrics).
+        self.raw = {}
+
+        ## Number of changes of every section.
+        self.counts = {}
+
+        ## Functions called (from collector thread) after every change.
+        self.listeners = []
+
+        self.lock = threading.Lock()
+
+
+    ## Store new JSON string of section and its data before serialization
+    ## (nothing happens if it did not change).
+    def publish(self, name: str, data: str, raw = None):
+        content = data.encode()
+
+        with self.lock:
+            if (name in self.sections) and (self.sections[name][1] == content):
+                return
+            self.seq += 1
+            self.sections[name] = (self.seq, content)
+            self.raw[name] = raw
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+        for listener in self.listeners:
+            listener()
+
+
+    ## Store new section without serializing it: 'data' and 'raw' are
+    ## functions returning JSON string and data before serialization, which
+    ## are called at most once, on first read. Caller publishes only when
+    ## section changed and functions must lock data they read.
+    def publish_lazy(self, name: str, data, raw):
+        with self.lock:
+            self.seq += 1
+            self.sections[name] = (self.seq, data)
+            self.raw[name] = raw
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+        for listener in self.listeners:
+            listener()
+
+
+    ## Serialize passed lazy sections (call with self.lock locked).
+    def materialize(self, names):
+        for name in names:
+            seq, data = self.sections.get(name, (None, b''))
+            if callable(data):
+                self.sections[name] = (seq, data().encode())
+
+
+    ## Return dictionary of (sequence number, JSON bytes) for passed section
+    ## names (all sections if none passed). Unknown sections are left out.
+    ## RETURN:
+    ## {'sys': (12, b'{"os": "LINUX", ...}')}
+    def get(self, names: list = None):
+        with self.lock:
+            if not names:
+                self.materialize(list(self.sections))
+                return dict(self.sections)
+            self.materialize(names)
+            return {n: self.sections[n] for n in names if n in self.sections}
+
+
+    ## Same as get(), but every section has also number of its changes.
+    ## RETURN:
+    ## {'sys': (12, b'{"os": "LINUX", ...}', 6)}
+    def get_counted(self, names: list = None):
+        with self.lock:
+            if not names:
+                names = list(self.sections)
+            self.materialize(names)
+            return {n: self.sections[n] + (self.counts[n],) for n in names if n in self.sections}
+
+
+    ## Return sequence number of last change and dictionary with sequence
+    ## number of last change and data before serialization of all sections.
+    ## RETURN:
+    ## (19, {'sys': (19, {'os': 'LINUX', ...}), 'net': (17, {...})})
+    def get_raw(self):
+        with self.lock:
+            for name, raw in self.raw.items():
+                if callable(raw):
+                    self.raw[name] = raw()
+            return self.seq, {n: (self.sections[n][0], raw) for n, raw in self.raw.items()}
+
+
+############################################################
+##                   Metrics Renderer                     ##
+############################################################
+## MetricsRenderer renders data of SnapshotStore in Prometheus text format
+## (version 0.0.4, which OpenMetrics scrapers accept too). Metrics of every
+## section are cached until that section changes, so all scrapes of one tick
+## share one render and fast collectors do not render slow sections again.
+class MetricsRenderer:
+    def __init__(self, store: SnapshotStore):
+        self.store = store
+
+        ## Functions adding metrics of section by section name:
+        ## function(metrics: MetricsRenderer, raw) -> None
+        self.sections = {
+            'sys':   self.sys_metrics,
+            'net':   self.net_metrics,
+            'hosts':  self.hosts_metrics,
+            'hosts6': self.hosts_metrics,
+            'neigh':    self.neigh_metrics,
+            'services': self.services_metrics,
+            'procs':    self.procs_metrics,
+            'cgroups':  self.cgroups_metrics,
+            'tcp':      self.tcp_metrics
+        }
+
+        ## Functions adding metrics not stored in sections (e.g. statistics
+        ## of NEMESIS itself): function(metrics: MetricsRenderer) -> None
+        ## They are rendered on every call of render(), so they must not add
+        ## metrics of sections.
+        self.extra = []
+
+        ## Metric families being rendered: name -> [type, help, [lines]].
+        self.families = {}
+
+        ## Metric families of every section and its sequence number they were
+        ## rendered for: name -> (seq, families).
+        self.rendered = {}
+
+        ## Text of all sections and store sequence number it was joined for.
+        self.cache = (-1, b'')
+        self.lock = threading.Lock()
+
+
+    ## Add sample of metric (family is created on first sample).
+    def add(self, name: str, kind: str, text: str, value, labels: dict = None):
+        if name not in self.families:
+            self.families[name] = [kind, text, []]
+
+        if labels:
+            ## Escape backslash, double-quote and new line in label values.
+            pairs = ','.join(
+                f'{k}="' + str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+                for k, v in labels.items()
+            )
+            self.families[name][2].append(f"{name}{{{pairs}}} {value}")
+        else:
+            self.families[name][2].append(f"{name} {value}")
+
+
+    ## Return text of added metric families as bytes.
+    def text(self):
+        lines = []
+        for name, (kind, text, samples) in self.families.items():
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+
+        return ('\n'.join(lines) + '\n').encode() if lines else b''
+
+
+    ## Return metrics text as bytes (section is rendered at most once per its
+    ## change, extra metrics on every call).
+    def render(self):
+        with self.lock:
+            seq, raw = self.store.get_raw()
+            if seq != self.cache[0]:
+                for name, (section_seq, data) in raw.items():
+                    if (name not in self.sections) or (self.rendered.get(name, (-1,))[0] == section_seq):
+                        continue
+                    self.families = {}
+                    if data is not None:
+                        try:
+                            self.sections[name](data)
+                        except Exception:
+                            logging.exception(f"Metrics of section \'{name}\' could not be rendered!")
+                    self.rendered[name] = (section_seq, self.families)
+
+                ## Join families of sections (sections may share family, e.g.
+                ## 'hosts' and 'hosts6'), samples are not rendered again.
+                self.families = {}
+                for name in raw:
+                    for family, (kind, text, samples) in self.rendered.get(name, (-1, {}))[1].items():
+                        if family not in self.families:
+                            self.families[family] = [kind, text, []]
+                        self.families[family][2].extend(samples)
+                self.cache = (seq, self.text())
+
+            ## Statistics of NEMESIS (e.g. missed deadlines) change also
+            ## without store change.
+            self.families = {}
+            for function in self.extra:
+                try:
+                    function(self)
+                except Exception:
+                    logging.exception("Metrics could not be rendered!")
+
+            return self.cache[1] + self.text()
+
+
+    ## Add metrics of 'sys' section (JsonData.sysinfo_rawdata()).
+    def sys_metrics(self, data: dict):
+        self.add('nemesis_cpu_utilization_percent', 'gauge', 'CPU utilization since previous sample.', data['cpu_util'])
+        for mode in ('user', 'system', 'iowait', 'steal'):
+            self.add('nemesis_cpu_mode_percent', 'gauge', 'CPU time share by mode.', data[f"cpu_{mode}"], {'mode': mode})
+        for core, value in enumerate(data['cpu_util_per_core']):
+            self.add('nemesis_cpu_core_utilization_percent', 'gauge', 'CPU utilization by core.', value, {'core': core})
+        for stat, value in data.get('cpu_util_stats', {}).items():
+            self.add('nemesis_cpu_core_utilization_stats_percent', 'gauge', 'Statistics of CPU utilization of cores.',
+                     value, {'stat': stat})
+        for core, value in enumerate(data.get('cpu_freq_per_core', [])):
+            self.add('nemesis_cpu_core_frequency_mhz', 'gauge', 'Current frequency by core.', value, {'core': core})
+        for period, value in zip(('1m', '5m', '15m'), data.get('load_avg', [])):
+            self.add('nemesis_load_average', 'gauge', 'Load average.', value, {'period': period})
+        for name, pressure in data.get('pressure', {}).items():
+            for kind, value in pressure.items():
+                self.add('nemesis_pressure_percent', 'gauge', 'Share of time tasks were stalled (avg10).',
+                         value, {'resource': name, 'kind': kind})
+        self.add('nemesis_ram_utilization_percent', 'gauge', 'RAM utilization.', data['ram_util'])
+        self.add('nemesis_swap_utilization_percent', 'gauge', 'SWAP utilization.', data['swap_util'])
+        for d in data.get('disks', []):
+            labels = {'mount': d['mount'], 'fstype': d['fstype']}
+            self.add('nemesis_disk_used_percent', 'gauge', 'Filesystem usage.', d['used_pct'], labels)
+            self.add('nemesis_disk_free_bytes', 'gauge', 'Space available to unprivileged users.', d['free'], labels)
+            self.add('nemesis_disk_inodes_used_percent', 'gauge', 'Filesystem inode usage.', d['inodes_used_pct'], labels)
+        for d in data.get('disk_io', []):
+            for op in ('read', 'write'):
+                labels = {'device': d['device'], 'op': op}
+                self.add('nemesis_disk_iops', 'gauge', 'Completed I/O requests per second.', d[f"{op}_iops"], labels)
+                self.add('nemesis_disk_bytes_per_second', 'gauge', 'Disk throughput.', d[f"{op}_bytes"], labels)
+            labels = {'device': d['device']}
+            self.add('nemesis_disk_queue_depth', 'gauge', 'Average requests in flight.', d['queue_depth'], labels)
+            self.add('nemesis_disk_await_ms', 'gauge', 'Average time of I/O request.', d['await_ms'], labels)
+            self.add('nemesis_disk_utilization_percent', 'gauge', 'Share of time disk was busy.', d['util_pct'], labels)
+
+
+    ## Add metrics of 'net' section ({'interfaces': [...], 'counters': {...}}).
+    def net_metrics(self, data: dict):
+        for d in data['interfaces']:
+            labels = {'interface': d['interface']}
+            self.add('nemesis_interface_up', 'gauge', 'Interface link is UP (1) or not (0).',
+                     1 if d['link'] == 'UP' else 0, labels)
+            if d['speed'].isdigit():
+                self.add('nemesis_interface_speed_mbps', 'gauge', 'Interface link speed.', d['speed'], labels)
+            for name, value in d['traffic'].items():
+                self.add(f"nemesis_interface_{name}_per_second", 'gauge', f"Interface {name.replace('_', ' ')} per second.", value, labels)
+
+        for interface, counters in data['counters'].items():
+            for name, value in counters.items():
+                self.add(f"nemesis_interface_{name}_total", 'counter', f"Interface {name.replace('_', ' ')} since boot.",
+                         value, {'interface': interface})
+
+
+    ## Add metrics of 'hosts' and 'hosts6' sections ({'family': 'ipv4',
+    ## 'hosts': {...}, 'probes': 0, 'duration': 0.0}).
+    def hosts_metrics(self, data: dict):
+        labels = {'family': data['family']}
+        methods = collections.Counter(h['method'] for h in data['hosts'].values())
+        for method in (('icmp', 'tcp') if data['family'] == 'ipv4' else ('icmp6',)):
+            self.add('nemesis_discovery_hosts', 'gauge', 'Live hosts found by last sweep by probe.', methods[method],
+                     {**labels, 'method': method})
+        self.add('nemesis_discovery_probes', 'gauge', 'Probes sent by last sweep.', data['probes'], labels)
+        self.add('nemesis_discovery_duration_seconds', 'gauge', 'Duration of last sweep.', data['duration'], labels)
+
+
+    ## Add metrics of 'neigh' section ({'hosts': [...], 'changes': 0}).
+    def neigh_metrics(self, data: dict):
+        states = collections.Counter((h['family'], h['state']) for h in data['hosts'])
+        for (family, state), count in sorted(states.items()):
+            self.add('nemesis_neighbour_hosts', 'gauge', 'Hosts in neighbour tables by state.', count,
+                     {'family': family, 'state': state})
+        self.add('nemesis_neighbour_changes_total', 'counter', 'Processed neighbour table changes.', data['changes'])
+
+
+    ## Add metrics of 'services' section (PortScanner.last).
+    def services_metrics(self, data: dict):
+        self.add('nemesis_portscan_hosts', 'gauge', 'Hosts scanned by last port scan.', data['hosts'])
+        self.add('nemesis_portscan_probes', 'gauge', 'Probes sent by last port scan.', data['probes'])
+        self.add('nemesis_portscan_open_ports', 'gauge', 'Open ports found by last port scan.', data['open'])
+        self.add('nemesis_portscan_timeouts', 'gauge', 'Probes of last port scan without answer.', data['timeouts'])
+        self.add('nemesis_portscan_errors', 'gauge', 'Probes of last port scan which failed locally.', data['errors'])
+        self.add('nemesis_portscan_rate', 'gauge', 'Probe rate (per second) adapted by last port scan.', data['rate'])
+        self.add('nemesis_portscan_duration_seconds', 'gauge', 'Duration of last port scan.', data['duration'])
+
+
+    ## Add metrics of 'cgroups' section (CgroupSampler.sample()).
+    def cgroups_metrics(self, data: dict):
+        self.add('nemesis_cgroups', 'gauge', 'Followed cgroups.', data['count'])
+        for c in data['cgroups']:
+            labels = {'cgroup': c['cgroup']}
+            self.add('nemesis_cgroup_cpu_percent', 'gauge', 'CPU utilization of cgroup (one core = 100).', c['cpu_pct'], labels)
+            self.add('nemesis_cgroup_throttled_percent', 'gauge', 'Share of time cgroup was throttled.', c['throttled_pct'], labels)
+            if c['memory'] is not None:
+                self.add('nemesis_cgroup_memory_bytes', 'gauge', 'Memory used by cgroup.', c['memory'], labels)
+            for op in ('read', 'write'):
+                self.add('nemesis_cgroup_io_bytes_per_second', 'gauge', 'Disk I/O of cgroup.',
+                         c[f"io_{op}_bytes"], {**labels, 'op': op})
+            for name, pressure in c['pressure'].items():
+                for kind, value in pressure.items():
+                    self.add('nemesis_cgroup_pressure_percent', 'gauge', 'Share of time tasks were stalled (avg10).',
+                             value, {**labels, 'resource': name, 'kind': kind})
+
+
+    ## Add metrics of 'tcp' section (TcpStates.sample()).
+    def tcp_metrics(self, data: dict):
+        self.add('nemesis_tcp_sockets_all', 'gauge', 'TCP sockets in all states.', data['sockets'])
+        for state, count in data['states'].items():
+            self.add('nemesis_tcp_sockets', 'gauge', 'TCP sockets by state.', count, {'state': state})
+        for port, states in data['ports'].items():
+            for state, count in states.items():
+                self.add('nemesis_tcp_port_sockets', 'gauge', 'TCP sockets of listening port by state.', count,
+                         {'port': port, 'state': state})
+        for listener in data['listeners']:
+            self.add('nemesis_tcp_listen_backlog', 'gauge', 'Connections waiting for accept() on listener.',
+                     listener['backlog'], {'address': listener['address'], 'port': str(listener['port'])})
+
+
+    ## Add metrics of 'procs' section (ProcessSampler.sample()).
+    def procs_metrics(self, data: dict):
+        self.add('nemesis_processes', 'gauge', 'Running processes.', data['processes'])
+        self.add('nemesis_threads', 'gauge', 'Running threads.', data['threads'])
+        for p in data['top_cpu']:
+            self.add('nemesis_top_process_cpu_percent', 'gauge', 'CPU utilization of top processes (one core = 100).',
+                     p['cpu_pct'], {'pid': p['pid'], 'name': p['name']})
+        for p in data['top_rss']:
+            self.add('nemesis_top_process_rss_bytes', 'gauge', 'Resident memory of top processes.',
+                     p['rss'], {'pid': p['pid'], 'name': p['name']})
+        for p in data['top_io']:
+            labels = {'pid': p['pid'], 'name': p['name']}
+            self.add('nemesis_top_process_io_bytes_per_second', 'gauge', 'Disk I/O of top processes.',
+                     p['read_bytes'], {**labels, 'op': 'read'})
+            self.add('nemesis_top_process_io_bytes_per_second', 'gauge', 'Disk I/O of top processes.',
+                     p['write_bytes'], {**labels, 'op': 'write'})
+
+
+############################################################
+##                       API Server                       ##
+############################################################
+## ApiServer serves data from SnapshotStore over HTTP/1.1 on Unix domain socket
+## and/or TCP (meant for localhost), in its own thread with asyncio loop.
+## Clients never trigger collection, they get what collectors published last.
+##
+## GET /snapshot?sections=sys,net&wait=30
+##   Body:   {"sys": {...}, "net": {...}} (pre-serialized data is only joined)
+##   ETag:   "5f1c09a2/sys:12,net:7" (instance of server and sequence numbers
+##           of returned sections, so tag of previous run never matches)
+##   With 'If-None-Match: <ETag>' answers '304 Not Modified', or with 'wait'
+##   holds request up to 'wait' seconds until any of sections changes.
+## GET /sections
+##   Body:   {"sys": 12, "net": 7} (sequence numbers of all sections)
+## GET /metrics
+##   Body:   Prometheus text format (see MetricsRenderer)
+## GET /hosts?network=10.0.0.0/16&since=300&mac=...&family=ipv4
+##   Body:   [{"ip": "10.0.1.7", ...}] (hosts from HostInventory matching all
+##   passed filters, 'since' is seconds since last detection)
+## GET /events?sections=sys,net
+##   Server-Sent Events stream, one event per change of section:
+##   'id: <seq>', 'event: <section>', 'data: <JSON>'. Every change is
+##   serialized to frame once for all subscribers. Slow subscriber gets only
+##   the newest frame of section, older ones are skipped (and counted).
+##
+## Example: curl --unix-socket /run/nemesis.sock http://localhost/snapshot
+class ApiServer:
+    ## Longest allowed long-poll (seconds).
+    MAX_WAIT = 300
+
+    ## Seconds between keep-alive comments of event stream.
+    KEEP_ALIVE = 15
+
+    def __init__(self, store: SnapshotStore, socket_path: str = "", http: str = "", metrics: MetricsRenderer = None,
+                 inventory: HostInventory = None, socket_mode: int = 0o660, socket_group: str = ""):
+        self.store = store
+
+        ## Host database queried by '/hosts' (route is missing without it).
+        self.inventory = inventory
+
+        ## Renderer of '/metrics' (created for store if not passed).
+        if metrics is None:
+            metrics = MetricsRenderer(store)
+        self.metrics = metrics
+
+        ## Unix socket path (e.g. '/run/nemesis.sock') and TCP address (e.g.
+        ## '127.0.0.1:8080'), empty string disables it.
+        self.socket_path = socket_path
+        self.http = http
+
+        ## Permissions and group of Unix socket (only root and group can read
+        ## data by default).
+        self.socket_mode = socket_mode
+        self.socket_group = socket_group
+
+        ## Random prefix of ETags (sequence numbers start from 0 again after
+        ## restart).
+        self.instance = os.urandom(4).hex()
+
+        ## Handlers by path, every handler is coroutine:
+        ## handler(query: dict, headers: dict) -> (status, headers, body)
+        self.routes = {
+            '/snapshot': self.snapshot,
+            '/sections': self.list_sections,
+            '/metrics':  self.render_metrics,
+            '/events':   self.events
+        }
+        if inventory is not None:
+            self.routes['/hosts'] = self.hosts
+
+        ## Event stream: last frame by section (seq, bytes), number of
+        ## subscribers and number of frames skipped for slow subscribers.
+        self.frames = {}
+        self.subscribers = 0
+        self.dropped = 0
+        self.metrics.extra.append(self.stream_metrics)
+
+        ## Future resolved on every change of store (replaced by new one).
+        self.change = None
+
+        self.loop = None
+        self.stopped = None
+        self.thread = None
+
+
+    ## Start server thread.
+    def start(self):
+        self.thread = threading.Thread(target=lambda: asyncio.run(self.main()), name='api', daemon=True)
+        self.thread.start()
+
+
+    ## Stop server thread.
+    def stop(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.stopped.set)
+
+
+    ## Open sockets and serve until stop() is called.
+    async def main(self):
+        self.loop = asyncio.get_running_loop()
+        self.stopped = asyncio.Event()
+        self.change = self.loop.create_future()
+
+        ## Wake up long-polling clients on every change.
+        listener = lambda: self.loop.call_soon_threadsafe(self.changed)
+        self.store.listeners.append(listener)
+
+        servers = []
+        try:
+            if self.socket_path:
+                ## Remove socket left by previous run.
+                if os.path.exists(self.socket_path):
+                    os.remove(self.socket_path)
+                servers.append(await asyncio.start_unix_server(self.handle, path=self.socket_path))
+                if self.socket_group:
+                    try:
+                        os.chown(self.socket_path, -1, grp.getgrnam(self.socket_group).gr_gid)
+                    except (KeyError, OSError):
+                        logging.error(f"Group of \'{self.socket_path}\' could not be set to \'{self.socket_group}\'!")
+                os.chmod(self.socket_path, self.socket_mode)
+                logging.info(f"API listening on \'{self.socket_path}\'.")
+            if self.http:
+                host, _, port = self.http.rpartition(':')
+                servers.append(await asyncio.start_server(self.handle, host or '127.0.0.1', int(port)))
+                logging.info(f"API listening on \'{self.http}\'.")
+        except Exception:
+            logging.exception("API server could not be started!")
+
+        await self.stopped.wait()
+
+        self.store.listeners.remove(listener)
+        for server in servers:
+            server.close()
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+    ## Resolve current change future and create new one (runs in loop).
+    def changed(self):
+        if not self.change.done():
+            self.change.set_result(None)
+        self.change = self.loop.create_future()
+
+
+    ## Serve HTTP requests of one client connection (keep-alive supported).
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    break
+
+                ## Request line and headers.
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ', 2)
+                except ValueError:
+                    await self.respond(writer, 400, {}, b'Bad Request\n', False)
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(':')
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+                keep_alive = (version == 'HTTP/1.1') and (headers.get('connection', '').lower() != 'close')
+
+                url = urllib.parse.urlsplit(target)
+                handler = self.routes.get(url.path)
+                if method not in ('GET', 'HEAD'):
+                    status, extra, body = 405, {}, b'Method Not Allowed\n'
+                elif handler is None:
+                    status, extra, body = 404, {}, b'Not Found\n'
+                else:
+                    query = dict(urllib.parse.parse_qsl(url.query))
+                    status, extra, body = await handler(query, headers)
+
+                ## Handler can answer with async generator (stream until client
+                ## disconnects, HEAD gets only headers).
+                if not isinstance(body, bytes):
+                    await self.stream(writer, status, extra, body, method == 'HEAD')
+                    break
+
+                await self.respond(writer, status, extra, b'' if method == 'HEAD' else body, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+
+    ## Write HTTP response.
+    async def respond(self, writer, status: int, headers: dict, body: bytes, keep_alive: bool = True):
+        reasons = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                   500: 'Internal Server Error'}
+        head = [f"HTTP/1.1 {status} {reasons.get(status, 'Unknown')}"]
+        headers = dict(headers)
+        headers.setdefault('Content-Type', 'text/plain; charset=utf-8')
+        headers['Content-Length'] = str(len(body))
+        headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+        for name, value in headers.items():
+            head.append(f"{name}: {value}")
+
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+
+    ## Write HTTP response with body from async generator (no Content-Length,
+    ## connection is closed at the end). Without body only headers are written.
+    async def stream(self, writer, status: int, headers: dict, body, head_only: bool = False):
+        head = [f"HTTP/1.1 {status} OK", 'Connection: close', 'Cache-Control: no-cache']
+        for name, value in headers.items():
+            head.append(f"{name}: {value}")
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+
+        try:
+            if head_only:
+                await writer.drain()
+                return
+            async for chunk in body:
+                writer.write(chunk)
+                ## Slow client blocks only its own generator here.
+                await writer.drain()
+        finally:
+            await body.aclose()
+
+
+    ## Return ETag for passed sections.
+    ## RETURN:
+    ## '"5f1c09a2/sys:12,net:7"'
+    def etag(self, sections: dict):
+        return f'"{self.instance}/' + ','.join(f"{name}:{seq}" for name, (seq, _) in sections.items()) + '"'
+
+
+    ## Handler of '/snapshot'.
+    async def snapshot(self, query: dict, headers: dict):
+        names = [n for n in query.get('sections', '').split(',') if n]
+        known = headers.get('if-none-match')
+        try:
+            wait = min(float(query.get('wait', 0)), self.MAX_WAIT)
+        except ValueError:
+            wait = 0
+
+        ## Future is taken before store is read, so no change can be missed.
+        change = self.change
+        sections = self.store.get(names)
+        tag = self.etag(sections)
+
+        ## Long-poll: wait until sections change.
+        deadline = self.loop.time() + wait
+        while (tag == known) and (self.loop.time() < deadline):
+            try:
+                await asyncio.wait_for(asyncio.shield(change), deadline - self.loop.time())
+            except asyncio.TimeoutError:
+                break
+            change = self.change
+            sections = self.store.get(names)
+            tag = self.etag(sections)
+
+        if tag == known:
+            return 304, {'ETag': tag}, b''
+
+        ## Join pre-serialized sections into one JSON object.
+        body = b'{' + b', '.join(b'"' + name.encode() + b'": ' + data for name, (_, data) in sections.items()) + b'}'
+        return 200, {'ETag': tag, 'Content-Type': 'application/json'}, body
+
+
+    ## Handler of '/metrics'.
+    async def render_metrics(self, query: dict, headers: dict):
+        return 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}, self.metrics.render()
+
+
+    ## Handler of '/hosts' (database is queried outside of event loop).
+    async def hosts(self, query: dict, headers: dict):
+        try:
+            since = float(query['since']) if 'since' in query else None
+            hosts = await self.loop.run_in_executor(None, lambda: self.inventory.query(
+                query.get('network'), since, query.get('mac'), query.get('family')))
+        except (ValueError, netaddr.AddrFormatError):
+            return 400, {}, b'Bad Request\n'
+
+        return 200, {'Content-Type': 'application/json'}, json.dumps(hosts).encode()
+
+
+    ## Handler of '/events'.
+    async def events(self, query: dict, headers: dict):
+        names = [n for n in query.get('sections', '').split(',') if n]
+        return 200, {'Content-Type': 'text/event-stream'}, self.event_stream(names)
+
+
+    ## Return Server-Sent Events frame of section change (built once per change
+    ## and shared by all subscribers).
+    ## RETURN:
+    ## b'id: 12\nevent: sys\ndata: {"os": "LINUX", ...}\n\n'
+    def frame(self, name: str, seq: int, data: bytes):
+        cached = self.frames.get(name)
+        if (cached is None) or (cached[0] != seq):
+            cached = (seq, b'id: %d\nevent: %s\ndata: %s\n\n' % (seq, name.encode(), data))
+            self.frames[name] = cached
+
+        return cached[1]
+
+
+    ## Yield frames of passed sections (all if none passed) whenever they
+    ## change, until client disconnects.
+    async def event_stream(self, names: list):
+        self.subscribers += 1
+
+        ## Number of changes of section already sent to this subscriber.
+        sent = {}
+        try:
+            while True:
+                change = self.change
+                for name, (seq, data, count) in self.store.get_counted(names).items():
+                    if sent.get(name) == count:
+                        continue
+                    ## Changes between last sent and newest frame were skipped.
+                    if name in sent:
+                        self.dropped += count - sent[name] - 1
+                    sent[name] = count
+                    yield self.frame(name, seq, data)
+
+                try:
+                    await asyncio.wait_for(asyncio.shield(change), self.KEEP_ALIVE)
+                except asyncio.TimeoutError:
+                    yield b': keep-alive\n\n'
+        finally:
+            self.subscribers -= 1
+
+
+    ## Add metrics of event stream to passed MetricsRenderer.
+    def stream_metrics(self, metrics: MetricsRenderer):
+        metrics.add('nemesis_stream_subscribers', 'gauge', 'Connected event stream subscribers.', self.subscribers)
+        metrics.add('nemesis_stream_dropped_frames_total', 'counter', 'Frames skipped for slow subscribers.', self.dropped)
+
+
+    ## Handler of '/sections'.
+    async def list_sections(self, query: dict, headers: dict):
+        body = json.dumps({name: seq for name, (seq, _) in self.store.get().items()}).encode()
+        return 200, {'Content-Type': 'application/json'}, body
+
+
+############################################################
+##                        JSON Data                       ##
+############################################################
+## JsonData class is frontend for pulling info from classes SysInfo and NetInfo.
+class JsonData:
+    def __init__(self, proc_dir: str = "/proc", sys_dir: str = "/sys", fsync: str = "never"):
+        ## SysInfo instance shared by all sysinfo() calls.
+        self.si = SysInfo(proc_dir, sys_dir)
+
+        ## Directory with network interfaces and reader of their attributes
+        ## shared by all netinfo() calls.
+        self.net_dir = f"{sys_dir}/class/net"
+        self.sysfs = SysfsReader(self.net_dir)
+
+        ## Traffic rates computed between netinfo() calls.
+        self.netstats = NetStats(proc_dir)
+
+        ## NetSweep instances by interface pattern.
+        self.sweeps = {}
+
+        ## Networks of addresses of all interfaces (see local_networks()),
+        ## None when they must be read again (netinfo tick, netlink event).
+        self.networks = None
+
+        ## Writer of output files shared by all writers.
+        self.writer = FileWriter(fsync)
+
+        ## Latest JSON data by section (served by ApiServer).
+        self.store = SnapshotStore()
+
+        ## Metric history: directory, number of records kept per ring file
+        ## and open RingStore instances by name (see start_history()).
+        self.history_dir = None
+        self.history_size = {}
+        self.rings = {}
+
+        ## Files written by write_files() by group.
+        self.group_files = {}
+
+        ## Netlink listener and function called when link or address changed.
+        self.netlink = None
+        self.net_changed = None
+
+        ## Discovery of IPv4 hosts and smallest swept prefix (see
+        ## start_discovery()).
+        self.discovery = None
+        self.discovery_prefix = 16
+
+        ## Passive tracking of hosts in neighbour tables, its tagged host
+        ## records and their JSON strings by key (only changed hosts are
+        ## updated on tick, whole table is joined when it is read).
+        self.neigh = None
+        self.neigh_records = {}
+        self.neigh_json = {}
+        self.neigh_lock = threading.Lock()
+
+        ## Database of found hosts (without it, every host is written to its
+        ## own JSON file by collectors).
+        self.inventory = None
+
+        ## Vendors of MAC addresses of found hosts.
+        self.vendors = None
+
+        ## Tags of addresses of interfaces and found hosts by configured
+        ## networks.
+        self.classifier = None
+
+        ## Top processes by CPU, memory and I/O.
+        self.procs = None
+
+        ## Usage of every cgroup.
+        self.cgroups = None
+
+        ## Summary of TCP sockets by state.
+        self.tcp = None
+
+        ## Port scanning of hosts in inventory and maximal seconds since last
+        ## detection of scanned host.
+        self.portscan = None
+        self.portscan_age = 3600
+
+
+    ## Start keeping metric history in ring files in passed directory.
+    def start_history(self, history_dir: str, sys_records: int, net_records: int):
+        self.history_dir = history_dir
+        self.history_size = {'sys': max(sys_records, 1), 'net': max(net_records, 1)}
+
+
+    ## Append record to history ring file with passed name (nothing is done,
+    ## if history is not started).
+    def record_history(self, name: str, kind: str, fields: list, values: list):
+        if self.history_dir is None:
+            return
+
+        try:
+            if name not in self.rings:
+                self.rings[name] = RingStore(f"{self.history_dir}/{name}.ring", fields, self.history_size[kind])
+            self.rings[name].append(values)
+        except Exception:
+            logging.error(f"History \'{name}\' could not be written!")
+
+
+    ## Close and remove history of interfaces not in passed list (also ring
+    ## files left by previous run), so removed interfaces (e.g. veth) do not
+    ## keep mapped files.
+    def prune_history(self, interfaces: list):
+        if self.history_dir is None:
+            return
+
+        names = {f"net_{interface}" for interface in interfaces}
+        try:
+            files = {f[:-5] for f in os.listdir(self.history_dir) if f.startswith('net_') and f.endswith('.ring')}
+        except OSError:
+            files = set()
+
+        for name in (files | {n for n in self.rings if n.startswith('net_')}) - names:
+            ring = self.rings.pop(name, None)
+            if ring is not None:
+                ring.close()
+            try:
+                os.remove(f"{self.history_dir}/{name}.ring")
+            except FileNotFoundError:
+                pass
+            except OSError:
+                logging.error(f"History \'{name}\' could not be removed!")
+
+
+    ## Start listening for link and address changes. Passed function is called
+    ## after every change, so netinfo can be written immediately (polling then
+    ## only checks consistency).
+    def start_net_events(self, net_changed = None):
+        self.net_changed = net_changed
+
+        ## Neighbour changes are received too, if they are tracked.
+        groups = NetlinkListener.RTMGRP_LINK | NetlinkListener.RTMGRP_IPV4_IFADDR | NetlinkListener.RTMGRP_IPV6_IFADDR
+        if self.neigh is not None:
+            groups |= NetlinkListener.RTMGRP_NEIGH
+
+        self.netlink = NetlinkListener(self.net_events, groups)
+        started = self.netlink.start()
+        if started and self.neigh is not None:
+            self.neigh.listening = True
+        return started
+
+
+    ## Start passive tracking of hosts in neighbour tables (hosts are
+    ## forgotten 'expire' seconds after they left table). Call before
+    ## start_net_events(), so neighbour events are received too.
+    def start_neighbours(self, expire: int = 86400):
+        self.neigh = NeighbourTracker(expire=expire)
+
+
+    ## Return dictionary with JSON string of every host changed in neighbour
+    ## tables by file (None for hosts which expired). Hosts are written to
+    ## passed directories by family as 'neigh_<address>.json'.
+    ## RETURN:
+    ## {'/etc/nemesis/nemesis_data/json/ipv4/neigh_10.0.100.1.json': '{"ip": ...}',
+    ## '/etc/nemesis/nemesis_data/json/ipv6/neigh_fe80::1%eth0.json': None}
+    def collect_neighbours(self, directories: tuple):
+        changed = self.neigh.tick()
+        if not changed:
+            return {}
+
+        ## Serve latest data from memory (only changed hosts are tagged and
+        ## serialized, JSON of whole table is joined from kept strings only
+        ## when section is read).
+        self.tag_records([r for r in changed.values() if r is not None])
+        with self.neigh_lock:
+            for key, record in changed.items():
+                if record is None:
+                    self.neigh_records.pop(key, None)
+                    self.neigh_json.pop(key, None)
+                else:
+                    self.neigh_records[key] = record
+                    self.neigh_json[key] = json.dumps(record)
+        self.store.publish_lazy('neigh', self.neigh_data, lambda changes=self.neigh.changes: self.neigh_raw(changes))
+
+        ## Expired hosts are removed from inventory (and so from its export).
+        if self.inventory is not None:
+            self.store_hosts([r for r in changed.values() if r is not None],
+                             [key for key, record in changed.items() if record is None])
+            return {}
+
+        files = {}
+        for key, record in changed.items():
+            directory = directories[1] if ':' in key else directories[0]
+            files[f"{directory}/neigh_{key}.json"] = None if record is None else self.neigh_json[key]
+
+        return files
+
+
+    ## Return JSON string of whole neighbour table (see collect_neighbours()).
+    ## RETURN:
+    ## '{"hosts": [{"ip": "10.0.100.1", ...}]}'
+    def neigh_data(self):
+        with self.neigh_lock:
+            return '{"hosts": [' + ', '.join(self.neigh_json.values()) + ']}'
+
+
+    ## Return data of whole neighbour table before serialization (for
+    ## metrics) with passed number of processed changes.
+    ## RETURN:
+    ## {'hosts': [{'ip': '10.0.100.1', ...}], 'changes': 120}
+    def neigh_raw(self, changes: int):
+        with self.neigh_lock:
+            return {'hosts': list(self.neigh_records.values()), 'changes': changes}
+
+
+    ## Write JSON files of hosts changed in neighbour tables and remove files of
+    ## expired hosts (called by Scheduler every 'neigh_refresh_time' seconds).
+    ## Only changed hosts are written, so tick costs little with big tables.
+    def update_neighbours(self, directories: tuple):
+        for name, data in self.collect_neighbours(directories).items():
+            if data is None:
+                self.writer.remove(name)
+            elif self.writer.write(name, data):
+                logging.debug(f"Written JSON data to '{name}'.")
+
+
+    ## Same as update_neighbours(), but for AsyncRuntime.
+    async def update_neighbours_async(self, runtime, directories: tuple):
+        await runtime.blocking(self.update_neighbours, directories)
+
+
+    ## Start keeping found hosts in database in passed file (hosts not found
+    ## by sweeps for 'expire' seconds are forgotten, 0 = never).
+    def start_inventory(self, file: str, expire: float = 0):
+        self.inventory = HostInventory(file, expire)
+
+
+    ## Return list of networks of addresses of all interfaces (read again only
+    ## after netinfo tick or netlink event).
+    ## RETURN:
+    ## [IPNetwork('10.0.100.0/24'), IPNetwork('fe80::/64')]
+    def local_networks(self):
+        networks = self.networks
+        if networks is None:
+            networks = set()
+            for ni in self.sweep('all').collect():
+                for addr in ni.ipv4_addrs():
+                    networks.add(netaddr.IPNetwork(f"{addr['addr']}/{addr['cidr']}").cidr)
+                for addr in ni.ipv6_addrs():
+                    networks.add(netaddr.IPNetwork(f"{addr['addr']}/{addr['prefixlen']}").cidr)
+            networks = self.networks = list(networks)
+
+        return networks
+
+
+    ## Write records of found hosts to inventory in one batch and forget
+    ## expired hosts (keys of hosts expired from neighbour tables and hosts not
+    ## found by sweeps for 'inventory_expire_time', see HostInventory.prune()).
+    def store_hosts(self, records: list, expired: list = ()):
+        if records:
+            self.inventory.set_networks(self.local_networks())
+            try:
+                self.inventory.upsert(records)
+            except sqlite3.Error:
+                logging.exception(f"Hosts could not be written to '{self.inventory.file}'!")
+        try:
+            self.inventory.prune(expired)
+        except sqlite3.Error:
+            logging.exception(f"Expired hosts could not be removed from '{self.inventory.file}'!")
+
+
+    ## Write JSON files of every host in inventory to passed directories by
+    ## family ('json/ipv4/10.0.100.1.json' and 'json/ipv4/neigh_10.0.100.1.json',
+    ## same layout as without inventory, for existing readers) and remove files
+    ## of hosts, which are not in inventory any more. Called by Scheduler every
+    ## 'inventory_export_time' seconds (expired hosts are removed by
+    ## store_hosts()).
+    def update_inventory_export(self, directories: tuple):
+        self.write_files(self.inventory.export(directories), 'inventory')
+
+
+    ## Same as update_inventory_export(), but for AsyncRuntime.
+    async def update_inventory_export_async(self, runtime, directories: tuple):
+        await runtime.blocking(self.update_inventory_export, directories)
+
+
+    ## Start adding vendor to records of found hosts from OUI index in passed
+    ## file (built if missing). Call after start_neighbours() and
+    ## start_inventory().
+    def start_vendors(self, file: str):
+        self.vendors = OuiIndex.load(file)
+        if self.neigh is not None:
+            self.neigh.vendors = self.vendors
+        if self.inventory is not None:
+            self.inventory.vendors = self.vendors
+
+
+    ## Start adding tags of configured networks (see SubnetClassifier) to
+    ## addresses in netinfo and host records. Call after start_inventory().
+    def start_classifier(self, file: str):
+        self.classifier = SubnetClassifier.load(file)
+        if self.inventory is not None:
+            self.inventory.classifier = self.classifier
+
+
+    ## Add tags of networks containing 'ip' (or 'addr') to every passed record
+    ## in one batch (nothing is done without classifier).
+    def tag_records(self, records: list, field: str = 'ip'):
+        if self.classifier is None or not records:
+            return
+        for record, tags in zip(records, self.classifier.classify([r[field] for r in records])):
+            record['tags'] = tags
+
+
+    ## Start scanning TCP ports of IPv4 hosts in inventory, which were seen in
+    ## last 'max_age' seconds (see PortScanner for other arguments).
+    def start_portscan(self, ports: tuple, concurrency: int, per_host: int, timeout: float, rate: int,
+                       full_every: int, max_age: int = 3600):
+        self.portscan = PortScanner(ports, concurrency, per_host, timeout, rate, full_every)
+        self.portscan_age = max_age
+
+
+    ## Scan ports of hosts in inventory, store results to inventory and serve
+    ## open ports of scanned hosts from memory.
+    async def collect_services(self):
+        hosts = await asyncio.to_thread(self.inventory.query, None, self.portscan_age, None, 'ipv4')
+        targets = {NeighbourTracker.key(h['ip'], h['interface'] or ""): (h['ip'], h['mac'])
+                   for h in hosts if h['state'] != 'gone'}
+
+        results = await self.portscan.scan(targets)
+        try:
+            changes = await asyncio.to_thread(self.inventory.upsert_services, results)
+        except sqlite3.Error:
+            logging.exception(f"Services could not be written to '{self.inventory.file}'!")
+            changes = []
+        for change in changes:
+            logging.info(f"Port {change['port']} of '{change['key']}': {change['old']} -> {change['new']}.")
+
+        scanned = {key: [p for p, state in states.items() if state == 'open'] for key, states in results.items()}
+        self.store.publish('services', json.dumps({'scanned': scanned, 'changes': changes}), dict(self.portscan.last))
+
+
+    ## Scan ports of hosts in inventory (called by Scheduler every
+    ## 'portscan_refresh_time' seconds). Results are written to JSON files by
+    ## inventory export.
+    def update_services(self):
+        asyncio.run(self.collect_services())
+
+
+    ## Same as update_services(), but for AsyncRuntime (probes run on its loop).
+    async def update_services_async(self, runtime):
+        await self.collect_services()
+
+
+    ## Start discovery of IPv4 hosts in subnets of monitored interfaces.
+    ## Subnets larger than min_prefix (e.g. '127.0.0.0/8') are swept only
+    ## around address of interface (e.g. '127.0.0.0/16').
+    def start_discovery(self, concurrency: int, rate: int, ports: tuple, timeout: float, min_prefix: int = 16):
+        self.discovery = HostDiscovery(concurrency, rate, ports, timeout)
+        self.discovery_prefix = min_prefix
+
+
+    ## Return list of IPv4 networks of interfaces selected by pattern.
+    ## RETURN:
+    ## [IPNetwork('10.0.100.0/24'), IPNetwork('127.0.0.0/16')]
+    def discovery_networks(self, interface: str):
+        networks = set()
+        for ni in self.sweep(interface).collect():
+            for addr in ni.ipv4_addrs():
+                if int(addr['cidr']) >= 32:
+                    continue
+                networks.add(netaddr.IPNetwork(f"{addr['addr']}/{max(int(addr['cidr']), self.discovery_prefix)}").cidr)
+
+        return sorted(networks)
+
+
+    ## Return dictionary with global IPv6 addresses of every interface
+    ## selected by pattern, which has link-local address (multicast ping is
+    ## sent from all of them).
+    ## RETURN:
+    ## {'eth0': ['fd00::2']}
+    def discovery_interfaces6(self, interface: str):
+        interfaces = {}
+        for ni in self.sweep(interface).collect():
+            addrs = ni.ipv6_addrs()
+            if any(a['scope'] == 'link' for a in addrs):
+                interfaces[ni.interface] = [a['addr'] for a in addrs if a['scope'] in ('global', 'site')]
+
+        return interfaces
+
+
+    ## Sweep subnets of interfaces selected by pattern and return dictionary
+    ## with JSON string of every live host by file in passed directory. With
+    ## passed AsyncRuntime, interfaces are read in its thread pool, so event
+    ## loop is not blocked.
+    ## RETURN:
+    ## {'/etc/nemesis/nemesis_data/json/ipv4/10.0.100.1.json': '{"ip": ...}'}
+    async def collect_hosts(self, directory: str, interface: str, runtime = None):
+        if runtime is None:
+            networks = self.discovery_networks(interface)
+        else:
+            networks = await runtime.blocking(self.discovery_networks, interface)
+        hosts = await self.discovery.sweep(networks)
+        self.tag_records(list(hosts.values()))
+
+        ## Serve latest data from memory.
+        data = json.dumps({'networks': [str(n) for n in networks], 'hosts': list(hosts.values())})
+        self.store.publish('hosts', data, {'family': 'ipv4', 'hosts': hosts, **self.discovery.last})
+
+        ## Hosts are written to files by inventory export.
+        if self.inventory is not None:
+            await asyncio.to_thread(self.store_hosts, list(hosts.values()))
+            return {}
+
+        return {f"{directory}/{address}.json": json.dumps(host) for address, host in hosts.items()}
+
+
+    ## Same as collect_hosts(), but for IPv6 hosts answering multicast ping.
+    ## RETURN:
+    ## {'/etc/nemesis/nemesis_data/json/ipv6/fe80::1%eth0.json': '{"ip": ...}'}
+    async def collect_hosts6(self, directory: str, interface: str, runtime = None):
+        if runtime is None:
+            interfaces = self.discovery_interfaces6(interface)
+        else:
+            interfaces = await runtime.blocking(self.discovery_interfaces6, interface)
+        hosts = await self.discovery.sweep6(interfaces)
+        self.tag_records(list(hosts.values()))
+
+        ## Serve latest data from memory.
+        data = json.dumps({'interfaces': list(interfaces), 'hosts': list(hosts.values())})
+        self.store.publish('hosts6', data, {'family': 'ipv6', 'hosts': hosts, **self.discovery.last6})
+
+        if self.inventory is not None:
+            await asyncio.to_thread(self.store_hosts, list(hosts.values()))
+            return {}
+
+        return {f"{directory}/{key}.json": json.dumps(host) for key, host in hosts.items()}
+
+
+    ## Write JSON file of every live IPv4 host to passed directory (files of
+    ## hosts which are not live any more are removed). Called by Scheduler
+    ## every 'discovery_refresh_time' seconds.
+    def update_hosts(self, directory: str, interface: str):
+        self.write_files(asyncio.run(self.collect_hosts(directory, interface)), directory)
+
+
+    ## Same as update_hosts(), but for AsyncRuntime (probes run on its loop).
+    async def update_hosts_async(self, runtime, directory: str, interface: str):
+        files = await self.collect_hosts(directory, interface, runtime)
+        await runtime.blocking(self.write_files, files, directory)
+
+
+    ## Write JSON file of every IPv6 host answering multicast ping to passed
+    ## directory (see update_hosts()).
+    def update_hosts6(self, directory: str, interface: str):
+        self.write_files(asyncio.run(self.collect_hosts6(directory, interface)), directory)
+
+
+    ## Same as update_hosts6(), but for AsyncRuntime.
+    async def update_hosts6_async(self, runtime, directory: str, interface: str):
+        files = await self.collect_hosts6(directory, interface, runtime)
+        await runtime.blocking(self.write_files, files, directory)
+
+
+    ## Handle list of netlink events (see NetlinkListener.parse()).
+    def net_events(self, events: list):
+        ## Neighbour changes are only applied to tracked hosts (written on next
+        ## tick), they do not change netinfo.
+        neigh = [e for e in events if e['type'] == 'neigh']
+        if neigh and self.neigh is not None:
+            self.neigh.apply(neigh)
+        events = [e for e in events if e['type'] != 'neigh']
+
+        for event in events:
+            ## Cached sysfs files and counters of removed or renamed interface are
+            ## stale.
+            if event['type'] == 'link':
+                if event['action'] == 'del' and event['interface']:
+                    self.sysfs.invalidate(event['interface'])
+                    self.netstats.forget(event['interface'])
+                ## New name could be cached for other (removed) interface.
+                if 'old_interface' in event:
+                    self.sysfs.invalidate(event['old_interface'])
+                    self.sysfs.invalidate(event['interface'])
+                    self.netstats.forget(event['old_interface'])
+                    self.netstats.forget(event['interface'])
+            ## Some neighbour events could be lost too.
+            elif event['type'] == 'resync' and self.neigh is not None:
+                self.neigh.resync = True
+            logging.debug(f"Netlink event: {event}.")
+
+        ## Addresses of interfaces could change.
+        if events:
+            self.networks = None
+
+        ## Let netinfo be written.
+        if events and self.net_changed is not None:
+            self.net_changed()
+
+
+    ## Add metrics about NEMESIS itself to passed MetricsRenderer.
+    def nemesis_metrics(self, metrics: MetricsRenderer, scheduler = None):
+        writes = self.writer.stats()
+        metrics.add('nemesis_file_writes_total', 'counter', 'Output file writes by result.', writes['written'], {'result': 'written'})
+        metrics.add('nemesis_file_writes_total', 'counter', 'Output file writes by result.', writes['skipped'], {'result': 'skipped'})
+        metrics.add('nemesis_sysinfo_file_reads_total', 'counter', 'Kernel files read by sysinfo snapshots.',
+                    self.si.snapshot.total_cost['file_reads'])
+        metrics.add('nemesis_sysinfo_sampler_reads_total', 'counter', 'Kernel reads of sysinfo samplers outside of snapshots.',
+                    self.si.snapshot.total_cost['sampler_reads'])
+        metrics.add('nemesis_mount_table_parses_total', 'counter', 'Parses of changed mount table.',
+                    self.si.disk_sampler.parses)
+
+        if self.inventory is not None:
+            for family, count in self.inventory.count().items():
+                metrics.add('nemesis_inventory_hosts', 'gauge', 'Hosts in inventory.', count, {'family': family})
+
+        if scheduler is not None:
+            stats = scheduler.stats()
+            metrics.add('nemesis_scheduler_runs_total', 'counter', 'Collector runs.', stats['runs'])
+            metrics.add('nemesis_scheduler_missed_total', 'counter', 'Missed collector deadlines.', stats['missed'])
+            metrics.add('nemesis_scheduler_jitter_max_ms', 'gauge', 'Largest recent collector start delay.', stats['jitter_max'])
+
+
+    ## Return JSON string containing machine system info.
+    ## RETURN:
+    ## {"os": "LINUX", "systime": "2022-01-16 23:03:05 +0100 (CET)",
+    ## "uptime": "0 days, 08:55:21", "boottime": "2022-01-16 14:07:43",
+    ## "cpu_util": 3.7, "cpu_user": 2.9, "cpu_system": 0.7, "cpu_iowait": 0.1,
+    ## "cpu_steal": 0.0, "cpu_util_per_core": [4.1, 3.3],
+    ## "cpu_util_stats": {"min": 3.3, "max": 4.1, "mean": 3.7, "stdev": 0.4},
+    ## "cpu_freq_per_core": [2100.0, 3400.0],
+    ## "cpu_freq_stats": {"min": 2100.0, "max": 3400.0, "mean": 2750.0, "stdev": 650.0},
+    ## "load_avg": [0.16, 0.11, 0.09], "pressure": {"cpu": {"some": 2.21,
+    ## "full": 0.0}, "memory": {...}, "io": {...}}, "ram_util": 21.6,
+    ## "swap_util": 0.0, "disks": [{"mount": "/", "mounts": ["/"],
+    ## "source": "/dev/vda", "fstype": "ext4", "device": "vda",
+    ## "total": 105089261568, "used": 26589700096, "free": 78482706432,
+    ## "used_pct": 25.3, "inodes_used_pct": 3.1}], "disk_io": [{"device": "vda",
+    ## "read_iops": 12.0, "write_iops": 40.5, "read_bytes": 98304.0,
+    ## "write_bytes": 1638400.0, "queue_depth": 0.21, "await_ms": 4.1,
+    ## "util_pct": 3.5, "in_flight": 0}]}
+    def sysinfo(self):
+        ## Return dictionary as JSON string.
+        return json.dumps(self.sysinfo_rawdata())
+
+
+    ## Return dictionary containing machine system info (same keys as in
+    ## sysinfo()).
+    def sysinfo_rawdata(self):
+        ## Instance of SysInfo class is kept between calls (CPU utilization
+        ## is computed from difference against previous call).
+        si = self.si
+
+        ## Read every kernel source once for this tick.
+        si.refresh()
+
+        ## Get CPU utilization since previous call and current frequencies.
+        cpu = si.cpu_util_rawdata()
+        freq = si.cpu_freq_rawdata()
+
+        data = {
+            'os':                si.os(),
+            'systime':           si.systime(),
+            'uptime':            si.uptime(),
+            'boottime':          si.boottime(),
+            'cpu_util':          cpu['total'],
+            'cpu_user':          cpu['user'],
+            'cpu_system':        cpu['system'],
+            'cpu_iowait':        cpu['iowait'],
+            'cpu_steal':         cpu['steal'],
+            'cpu_util_per_core': cpu['per_core'].tolist(),
+            'cpu_util_stats':    CpuSampler.stats(cpu['per_core']),
+            'cpu_freq_per_core': freq.tolist(),
+            'cpu_freq_stats':    CpuSampler.stats(array.array('d', (f for f in freq if f > 0))),
+            'load_avg':          si.load_avg(),
+            'pressure':          si.pressure(),
+            'ram_util':          si.ram_util(),
+            'swap_util':         si.swap_util(),
+            'disks':             si.disk_usage(),
+            'disk_io':           si.disk_io_rawdata()
+        }
+        logging.debug(f"SysInfo tick cost: {si.snapshot.cost}.")
+
+        ## Return dictionary.
+        return data
+
+
+    ## Return JSON string containing info for network interface.
+    ## RETURN:
+    ## {"interface": "eth0", "mac": "00:2b:67:ad:bb:f6", "ipv4_addr": "None",
+    ## "ipv4_mask": "None", "ipv4_cidr": "None", "ipv4_addrs": [],
+    ## "ipv6_addrs": [{"addr": "fe80::22b:67ff:fead:bbf6", "prefixlen": "64",
+    ## "scope": "link"}], "link": "DOWN",
+    ## "protocol": "UP", "carrier": "DOWN", "wireless": "False",
+    ## "speed": "unknown", "duplex": "unknown", "traffic": {"rx_bytes": 0.0,
+    ## "tx_bytes": 0.0, "rx_packets": 0.0, "tx_packets": 0.0, "rx_errors": 0.0,
+    ## "tx_errors": 0.0, "rx_dropped": 0.0, "tx_dropped": 0.0}}
+    def netinfo(self, interface: str = ""):
+        ## Create instance of NetInfo class for specified interface.
+        ni = NetInfo(interface, reader=self.sysfs)
+
+        ## Read traffic counters.
+        self.netstats.update()
+
+        ## Return dictionary as JSON string.
+        return json.dumps(self.netinfo_rawdata(ni))
+
+
+    ## Return dictionary containing info for network interface of passed
+    ## NetInfo instance (same keys as in netinfo()). Pass 'now'
+    ## (time.monotonic()) when collecting more interfaces at once.
+    def netinfo_rawdata(self, ni: NetInfo, now: float = None):
+        ## Get link data dictionary.
+        link = ni.link_rawdata()
+
+        data = {
+            'interface':   ni.interface,
+            'mac':         ni.mac(),
+            'ipv4_addr':   ni.ipv4_addr(),
+            'ipv4_mask':   ni.ipv4_mask(),
+            'ipv4_cidr':   ni.ipv4_cidr(),
+            'ipv4_addrs':  ni.ipv4_addrs(),
+            'ipv6_addrs':  ni.ipv6_addrs(),
+            'link':        link['link'],     ## UP, DOWN, ADMIN_DOWN, UNKNOWN
+            'protocol':    link['protocol'], ## UP, DOWN, UNKNOWN
+            'carrier':     link['carrier'],  ## UP, DOWN, ADMIN_DOWN, UNKNOWN
+            'wireless':    link['wireless'], ## True, False, Unknown
+            'speed':       link['speed'],    ## 0, 100 1000, unknown, none
+            'duplex':      link['duplex'],   ## full, half, unknown, none
+            'traffic':     self.netstats.sample(ni.interface, now) ## per second
+        }
+
+        ## Tags of configured networks containing addresses.
+        self.tag_records(data['ipv4_addrs'] + data['ipv6_addrs'], 'addr')
+
+        ## Return dictionary.
+        return data
+
+
+    ## Return list of dictionaries with info for every interface matching
+    ## pattern (see NetSweep), collected in one pass.
+    ## RETURN:
+    ## [{'interface': 'eth0', 'mac': '00:2b:67:ad:bb:f6', ...},
+    ## {'interface': 'lo', 'mac': '00:00:00:00:00:00', ...}]
+    def netinfo_sweep(self, pattern: str = "all"):
+        sweep = self.sweep(pattern)
+
+        ## Read clock and traffic counters once for all interfaces.
+        now = time.monotonic()
+        nis = sweep.collect()
+        self.netstats.update()
+        self.networks = None
+
+        ## Forget traffic of interfaces which disappeared.
+        if not sweep.is_single():
+            self.netstats.prune([ni.interface for ni in nis])
+
+        return [self.netinfo_rawdata(ni, now) for ni in nis]
+
+
+    ## Return NetSweep of passed pattern (kept per pattern, so pattern is
+    ## compiled only once, and shared by netinfo and discovery).
+    def sweep(self, pattern: str):
+        if pattern not in self.sweeps:
+            self.sweeps[pattern] = NetSweep(pattern, self.net_dir, self.sysfs)
+        return self.sweeps[pattern]
+
+
+    ## Write SysInfo JSON string to specified file once (called by Scheduler
+    ## every 'sys_refresh_time' seconds).
+    def update_sysinfo(self, file: str):
+        self.write_files(self.collect_sysinfo(file))
+
+
+    ## Write NetInfo JSON string for specified interface (or interface
+    ## pattern, see NetSweep) to specified file once (called by Scheduler every
+    ## 'net_refresh_time' seconds and after netlink events). If pattern selects
+    ## more interfaces, output can be:
+    ## 'combined'      - {"interfaces": [{...}, {...}]} written to file
+    ## 'per_interface' - one file per interface, e.g. 'nemesis_net_eth0.json'
+    def update_netinfo(self, file: str, interface: str, output: str = "combined"):
+        self.write_files(self.collect_netinfo(file, interface, output), file)
+
+
+    ## Same as update_sysinfo(), but for AsyncRuntime (collection and writing
+    ## run in its executor, event loop is never blocked).
+    async def update_sysinfo_async(self, runtime, file: str):
+        files = await runtime.blocking(self.collect_sysinfo, file)
+        await runtime.blocking(self.write_files, files)
+
+
+    ## Same as update_netinfo(), but for AsyncRuntime.
+    async def update_netinfo_async(self, runtime, file: str, interface: str, output: str = "combined"):
+        files = await runtime.blocking(self.collect_netinfo, file, interface, output)
+        await runtime.blocking(self.write_files, files, file)
+
+
+    ## Return dictionary with SysInfo JSON string for passed file (and store
+    ## values to history).
+    ## RETURN:
+    ## {'/etc/nemesis/nemesis_data/json/ipv4/nemesis_sys.json': '{"os": ...}'}
+    def collect_sysinfo(self, file: str):
+        ## Numeric fields kept in history.
+        fields = ['cpu_util', 'cpu_user', 'cpu_system', 'cpu_iowait', 'cpu_steal', 'ram_util', 'swap_util']
+
+        ## Data that has to be written (JSON string).
+        raw = self.sysinfo_rawdata()
+        self.record_history('sys', 'sys', fields, [raw[f] for f in fields])
+        data = json.dumps(raw)
+
+        ## Serve latest data from memory.
+        self.store.publish('sys', data, raw)
+
+        return {file: data}
+
+
+    ## Return dictionary with NetInfo JSON strings by file (and store traffic
+    ## to history). See update_netinfo() for arguments.
+    ## RETURN:
+    ## {'/etc/nemesis/nemesis_data/json/ipv4/nemesis_net.json': '{"interface": ...}'}
+    def collect_netinfo(self, file: str, interface: str, output: str = "combined"):
+        ## Data of all selected interfaces.
+        docs = self.netinfo_sweep(interface)
+
+        if self.sweeps[interface].is_single():
+            ## Data that has to be written (JSON string).
+            data = json.dumps(docs[0])
+            files = {file: data}
+        elif output == "per_interface":
+            ## One file per interface: 'nemesis_net.json' -> 'nemesis_net_eth0.json'.
+            base = file[:-5] if file.endswith('.json') else file
+            files = {f"{base}_{d['interface']}.json": json.dumps(d) for d in docs}
+            data = json.dumps({'interfaces': docs})
+        else:
+            data = json.dumps({'interfaces': docs})
+            files = {file: data}
+
+        ## Serve latest data from memory (raw data with counters for metrics).
+        counters = {}
+        for d in docs:
+            if d['interface'] in self.netstats.current:
+                counters[d['interface']] = dict(zip((c for c, _ in NetStats.COUNTERS), self.netstats.current[d['interface']]))
+        self.store.publish('net', data, {'interfaces': docs, 'counters': counters})
+
+        ## Keep history of traffic rates of every interface.
+        for d in docs:
+            self.record_history(f"net_{d['interface']}", 'net', list(d['traffic']), list(d['traffic'].values()))
+        if not self.sweeps[interface].is_single():
+            self.prune_history([d['interface'] for d in docs])
+
+        return files
+
+
+    ## Start collecting top 'top' processes by CPU, memory and I/O.
+    def start_processes(self, top: int = 10):
+        self.procs = ProcessSampler(top=top)
+
+
+    ## Return dictionary with JSON string of top processes (see
+    ## ProcessSampler.sample()) for passed file.
+    ## RETURN:
+    ## {'/etc/nemesis/nemesis_data/json/ipv4/nemesis_proc.json': '{"processes": 312, ...}'}
+    def collect_processes(self, file: str):
+        raw = self.procs.sample()
+        data = json.dumps(raw)
+
+        ## Serve latest data from memory.
+        self.store.publish('procs', data, raw)
+
+        return {file: data}
+
+
+    ## Write JSON string of top processes to specified file once (called by
+    ## Scheduler every 'proc_refresh_time' seconds).
+    def update_processes(self, file: str):
+        self.write_files(self.collect_processes(file))
+
+
+    ## Same as update_processes(), but for AsyncRuntime.
+    async def update_processes_async(self, runtime, file: str):
+        files = await runtime.blocking(self.collect_processes, file)
+        await runtime.blocking(self.write_files, files)
+
+
+    ## Start collecting usage of cgroups in cgroup v2 hierarchy mounted at
+    ## passed root (found in mount table if not passed).
+    ## ERROR RETURN:
+    ## False (no cgroup v2 hierarchy)
+    def start_cgroups(self, root: str = ""):
+        sampler = CgroupSampler(root)
+        if not sampler.root:
+            return False
+        self.cgroups = sampler
+        return True
+
+
+    ## Return dictionary with JSON string of usage of cgroups (see
+    ## CgroupSampler.sample()) for passed file.
+    ## RETURN:
+    ## {'/etc/nemesis/nemesis_data/json/ipv4/nemesis_cgroups.json': '{"root": "/sys/fs/cgroup", ...}'}
+    def collect_cgroups(self, file: str):
+        raw = self.cgroups.sample()
+        data = json.dumps(raw)
+
+        ## Serve latest data from memory.
+        self.store.publish('cgroups', data, raw)
+
+        return {file: data}
+
+
+    ## Write JSON string of usage of cgroups to specified file once (called
+    ## by Scheduler every 'cgroup_refresh_time' seconds).
+    def update_cgroups(self, file: str):
+        self.write_files(self.collect_cgroups(file))
+
+
+    ## Same as update_cgroups(), but for AsyncRuntime.
+    async def update_cgroups_async(self, runtime, file: str):
+        files = await runtime.blocking(self.collect_cgroups, file)
+        await runtime.blocking(self.write_files, files)
+
+
+    ## Start summarizing TCP sockets by state.
+    def start_tcp_states(self):
+        self.tcp = TcpStates()
+
+
+    ## Return dictionary with JSON string of summary of TCP sockets (see
+    ## TcpStates.sample()) for passed file.
+    ## RETURN:
+    ## {'/etc/nemesis/nemesis_data/json/ipv4/nemesis_tcp.json': '{"sockets": 1532, ...}'}
+    def collect_tcp(self, file: str):
+        raw = self.tcp.sample()
+        data = json.dumps(raw)
+
+        ## Serve latest data from memory.
+        self.store.publish('tcp', data, raw)
+
+        return {file: data}
+
+
+    ## Write JSON string of summary of TCP sockets to specified file once
+    ## (called by Scheduler every 'net_refresh_time' seconds).
+    def update_tcp(self, file: str):
+        self.write_files(self.collect_tcp(file))
+
+
+    ## Same as update_tcp(), but for AsyncRuntime.
+    async def update_tcp_async(self, runtime, file: str):
+        files = await runtime.blocking(self.collect_tcp, file)
+        await runtime.blocking(self.write_files, files)
+
+
+    ## Write JSON strings to files (skipped if nothing changed). If group is
+    ## passed, files written with the same group before, which are not passed
+    ## now, are removed (e.g. files of interfaces which disappeared).
+    def write_files(self, files: dict, group: str = None):
+        for name, data in files.items():
+            if self.writer.write(name, data):
+                logging.debug(f"Written JSON data to \'{name}\'.")
+
+        if group is not None:
+            for name in self.group_files.get(group, set()) - files.keys():
+                self.writer.remove(name)
+                logging.debug(f"File \'{name}\' removed.")
+            self.group_files[group] = set(files)
+
+        logging.debug(f"Output files: {self.writer.stats()}.")
+
+
+################################################################################
 ##                                 Functions                                  ##
 ################################################################################
 ############################################################
@@ -638,13 +6496,48 @@ def rootcheck():
         sys.exit(errno.EPERM)
 
 
+########################################
+##          Descriptor Limit          ##
+########################################
+## Raise soft limit of open descriptors to hard limit (cgroup stat files are
+## kept open, host discovery and port scan hold descriptor per probe).
+## RETURN:
+## 524288 (soft limit after call)
+def raise_nofile_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+            soft = hard
+        except (OSError, ValueError):
+            logging.warning("Limit of open descriptors could not be raised!")
+    return soft
+
+
 ########################################
 ##            Config file             ##
 ########################################
 ## Return configuration from config file as dictionary.
 ## RETURN:
 ## {'nemesis_dir': '/etc/nemesis/', 'interface': 'lo',
-## 'sys_refresh_time': '30', 'net_refresh_time': '30'}
+## 'net_output': 'combined', 'fsync': 'never', 'runtime': 'threads',
+## 'sys_refresh_time': '30', 'net_refresh_time': '30', 'net_events': 'no',
+## 'tcp_states': 'no', 'history_days': '0', 'network_fs': 'no', 'api_socket': '', 'api_http': '',
+## 'api_socket_mode': '0660', 'api_socket_group': '',
+## 'discovery': 'no', 'discovery_refresh_time': '300',
+## 'discovery_concurrency': '2048', 'discovery_rate': '5000',
+## 'discovery_ports': '80,443,22', 'discovery_timeout': '0.5',
+## 'discovery_min_prefix': '16', 'discovery_ipv6': 'yes', 'neigh': 'no',
+## 'neigh_refresh_time': '10', 'neigh_expire_time': '86400', 'inventory': 'no',
+## 'inventory_export': 'yes', 'inventory_export_time': '60',
+## 'inventory_db': '/etc/nemesis/nemesis_inventory.db',
+## 'inventory_expire_time': '604800', 'portscan': 'no',
+## 'portscan_ports': '21,22,...', 'portscan_refresh_time': '300',
+## 'portscan_full_every': '12', 'portscan_concurrency': '512',
+## 'portscan_per_host': '32', 'portscan_timeout': '1.0', 'portscan_rate': '1000',
+## 'portscan_max_age': '3600', 'oui_index': '/etc/nemesis/nemesis_oui.idx',
+## 'subnets_file': '', 'procs': 'no', 'proc_refresh_time': '10', 'proc_top': '10',
+## 'cgroups': 'no', 'cgroup_refresh_time': '10', 'cgroup_root': ''}
 def load_config():
     ## Conf file: '/etc/nemesis/nemesis_conf.ini'.
     file = '/etc/nemesis/nemesis_conf.ini'
@@ -652,12 +6545,58 @@ def load_config():
     ## Setup config parser.
     parser = configparser.ConfigParser()
 
-    ## Dictionary data from config file (filled with default values).
+    ## Dictionary data from config file (filled with default values). Features
+    ## added after first release are off unless enabled in config file (see
+    ## 'generate_config.py'), so upgrade does not change running system.
     conf = {
         'nemesis_dir':      '/etc/nemesis/',
         'interface':        'lo',
+        'net_output':       'combined',
+        'fsync':            'never',
+        'runtime':          'threads',
         'sys_refresh_time': '30',
-        'net_refresh_time': '30'
+        'net_refresh_time': '30',
+        'net_events':       'no',
+        'tcp_states':       'no',
+        'history_days':     '0',
+        'network_fs':       'no',
+        'api_socket':       '',
+        'api_http':         '',
+        'api_socket_mode':  '0660',
+        'api_socket_group': '',
+        'discovery':              'no',
+        'discovery_refresh_time': '300',
+        'discovery_concurrency':  '2048',
+        'discovery_rate':         '5000',
+        'discovery_ports':        '80,443,22',
+        'discovery_timeout':      '0.5',
+        'discovery_min_prefix':   '16',
+        'discovery_ipv6':         'yes',
+        'neigh':                  'no',
+        'neigh_refresh_time':     '10',
+        'neigh_expire_time':      '86400',
+        'inventory':              'no',
+        'inventory_export':       'yes',
+        'inventory_export_time':  '60',
+        'inventory_db':           '/etc/nemesis/nemesis_inventory.db',
+        'inventory_expire_time':  '604800',
+        'portscan':               'no',
+        'portscan_ports':         '21,22,23,25,53,80,110,143,443,445,993,995,3306,3389,5432,5900,8080,8443',
+        'portscan_refresh_time':  '300',
+        'portscan_full_every':    '12',
+        'portscan_concurrency':   '512',
+        'portscan_per_host':      '32',
+        'portscan_timeout':       '1.0',
+        'portscan_rate':          '1000',
+        'portscan_max_age':       '3600',
+        'oui_index':              '/etc/nemesis/nemesis_oui.idx',
+        'subnets_file':           '',
+        'procs':                  'no',
+        'proc_refresh_time':      '10',
+        'proc_top':               '10',
+        'cgroups':                'no',
+        'cgroup_refresh_time':    '10',
+        'cgroup_root':            ''
     }
 
     ## Try to read config file.
@@ -668,8 +6607,52 @@ def load_config():
         ## Get values from config file.
         conf['nemesis_dir']      = parser.get('nemesis',      'nemesis_dir',      fallback='/etc/nemesis/')
         conf['interface']        = parser.get('nemesis',      'interface',        fallback='lo')
+        conf['net_output']       = parser.get('nemesis',      'net_output',       fallback='combined')
+        conf['fsync']            = parser.get('nemesis',      'fsync',            fallback='never')
+        conf['runtime']          = parser.get('nemesis',      'runtime',          fallback='threads')
         conf['sys_refresh_time'] = parser.get('data_pulling', 'sys_refresh_time', fallback='30')
         conf['net_refresh_time'] = parser.get('data_pulling', 'net_refresh_time', fallback='30')
+        conf['net_events']       = parser.get('data_pulling', 'net_events',       fallback='no')
+        conf['tcp_states']       = parser.get('data_pulling', 'tcp_states',       fallback='no')
+        conf['history_days']     = parser.get('data_pulling', 'history_days',     fallback='0')
+        conf['network_fs']       = parser.get('data_pulling', 'network_fs',       fallback='no')
+        conf['api_socket']       = parser.get('api',          'socket',           fallback='')
+        conf['api_http']         = parser.get('api',          'http',             fallback='')
+        conf['api_socket_mode']  = parser.get('api',          'socket_mode',      fallback='0660')
+        conf['api_socket_group'] = parser.get('api',          'socket_group',     fallback='')
+        conf['discovery']              = parser.get('discovery', 'enabled',      fallback='no')
+        conf['discovery_refresh_time'] = parser.get('discovery', 'refresh_time', fallback='300')
+        conf['discovery_concurrency']  = parser.get('discovery', 'concurrency',  fallback='2048')
+        conf['discovery_rate']         = parser.get('discovery', 'rate',         fallback='5000')
+        conf['discovery_ports']        = parser.get('discovery', 'ports',        fallback='80,443,22')
+        conf['discovery_timeout']      = parser.get('discovery', 'timeout',      fallback='0.5')
+        conf['discovery_min_prefix']   = parser.get('discovery', 'min_prefix',   fallback='16')
+        conf['discovery_ipv6']         = parser.get('discovery', 'ipv6',         fallback='yes')
+        conf['neigh']                  = parser.get('neighbours', 'enabled',      fallback='no')
+        conf['neigh_refresh_time']     = parser.get('neighbours', 'refresh_time', fallback='10')
+        conf['neigh_expire_time']      = parser.get('neighbours', 'expire_time',  fallback='86400')
+        conf['inventory']              = parser.get('inventory',  'enabled',      fallback='no')
+        conf['inventory_export']       = parser.get('inventory',  'export',       fallback='yes')
+        conf['inventory_export_time']  = parser.get('inventory',  'export_time',  fallback='60')
+        conf['inventory_db']           = parser.get('inventory',  'db',           fallback='/etc/nemesis/nemesis_inventory.db')
+        conf['inventory_expire_time']  = parser.get('inventory',  'expire_time',  fallback='604800')
+        conf['portscan']               = parser.get('portscan',   'enabled',      fallback='no')
+        conf['portscan_ports']         = parser.get('portscan',   'ports',        fallback=conf['portscan_ports'])
+        conf['portscan_refresh_time']  = parser.get('portscan',   'refresh_time', fallback='300')
+        conf['portscan_full_every']    = parser.get('portscan',   'full_every',   fallback='12')
+        conf['portscan_concurrency']   = parser.get('portscan',   'concurrency',  fallback='512')
+        conf['portscan_per_host']      = parser.get('portscan',   'per_host',     fallback='32')
+        conf['portscan_timeout']       = parser.get('portscan',   'timeout',      fallback='1.0')
+        conf['portscan_rate']          = parser.get('portscan',   'rate',         fallback='1000')
+        conf['portscan_max_age']       = parser.get('portscan',   'max_age',      fallback='3600')
+        conf['oui_index']              = parser.get('inventory',  'oui_index',    fallback='/etc/nemesis/nemesis_oui.idx')
+        conf['subnets_file']           = parser.get('subnets',    'file',         fallback='')
+        conf['procs']                  = parser.get('processes',  'enabled',      fallback='no')
+        conf['proc_refresh_time']      = parser.get('processes',  'refresh_time', fallback='10')
+        conf['proc_top']               = parser.get('processes',  'top',          fallback='10')
+        conf['cgroups']                = parser.get('cgroups',    'enabled',      fallback='no')
+        conf['cgroup_refresh_time']    = parser.get('cgroups',    'refresh_time', fallback='10')
+        conf['cgroup_root']            = parser.get('cgroups',    'root',         fallback='')
 
         ## Return dictionary with data loaded from config file.
         return conf
@@ -680,10 +6663,11 @@ def load_config():
         return conf
 
 
-## Creates data directories for IPv4 and IPv6 and return directory path as
-## strings in a tuple.
+## Creates data directories for IPv4, IPv6 and history and return directory
+## path as strings in a tuple. JSON directories are emptied, history is kept.
 ## RETURN:
-## ('/etc/nemesis/nemesis_data/json/ipv4', '/etc/nemesis/nemesis_data/json/ipv6')
+## ('/etc/nemesis/nemesis_data/json/ipv4', '/etc/nemesis/nemesis_data/json/ipv6',
+## '/etc/nemesis/nemesis_data/history')
 def create_data_dirs(parent_dir: str):
     ## Remove trailing '/'s for passed directory.
     while parent_dir[-1] == '/':
@@ -703,22 +6687,25 @@ def create_data_dirs(parent_dir: str):
             ## Exit with error code of 'No such file or directory'.
             sys.exit(errno.ENOENT)
 
-    ## Remove data directory if it exists (to prevent old data).
+    ## Remove file in place of data directory.
     data_dir = f"{parent_dir}/nemesis_data"
-    if os.path.exists(f"{data_dir}"):
-        ## Check if it is file.
-        if os.path.isfile(f"{data_dir}"):
-            ## Remove file.
-            os.remove(data_dir)
-            logging.debug(f"File \'{data_dir}\' removed.")
+    if os.path.isfile(data_dir):
+        os.remove(data_dir)
+        logging.debug(f"File \'{data_dir}\' removed.")
+
+    ## Create data directory, if it does not exist. Metric history in it is
+    ## kept across restarts.
+    if not os.path.isdir(data_dir):
+        os.mkdir(data_dir)
+        logging.debug(f"Directory \'{data_dir}\' created.")
+
+    ## Remove JSON data directory if it exists (to prevent old data).
+    if os.path.exists(f"{data_dir}/json"):
+        if os.path.isfile(f"{data_dir}/json"):
+            os.remove(f"{data_dir}/json")
         else:
-            ## Remove directory with all files inside it.
-            shutil.rmtree(data_dir)
-            logging.debug(f"Directory \'{data_dir}\' removed.")
-
-    ## Create new empty data directory.
-    os.mkdir(data_dir)
-    logging.debug(f"Directory \'{data_dir}\' created.")
+            shutil.rmtree(f"{data_dir}/json")
+        logging.debug(f"Directory \'{data_dir}/json\' removed.")
 
     ## Create directory for JSON data.
     os.mkdir(f"{data_dir}/json")
@@ -732,8 +6719,366 @@ def create_data_dirs(parent_dir: str):
     os.mkdir(f"{data_dir}/json/ipv6")
     logging.debug(f"Directory \'{data_dir}/json/ipv6\' created.")
 
-    ## Return tuple with IPv4 and IPv6 directory locations as strings.
-    return (f"{data_dir}/json/ipv4", f"{data_dir}/json/ipv6")
+    ## Create directory for metric history (ring files), if it does not exist.
+    if not os.path.isdir(f"{data_dir}/history"):
+        os.mkdir(f"{data_dir}/history")
+        logging.debug(f"Directory \'{data_dir}/history\' created.")
+
+    ## Return tuple with IPv4, IPv6 and history directory locations as strings.
+    return (f"{data_dir}/json/ipv4", f"{data_dir}/json/ipv6", f"{data_dir}/history")
+
+
+############################################################
+##                       Benchmarks                       ##
+############################################################
+## Create fake '/sys/class/net' tree with passed number of interfaces in
+## passed directory and return path to it.
+## RETURN:
+## '/tmp/tmpa1b2c3/class/net'
+def fake_sys_class_net(parent_dir: str, interfaces: int):
+    net_dir = f"{parent_dir}/class/net"
+
+    for i in range(interfaces):
+        os.makedirs(f"{net_dir}/veth{i}")
+        for attr, value in (('carrier', '1'), ('operstate', 'up'), ('speed', '10000'), ('duplex', 'full')):
+            with open(f"{net_dir}/veth{i}/{attr}", 'w') as f:
+                f.write(f"{value}\n")
+
+    return net_dir
+
+
+## Create fake '/proc/net/dev' with passed number of interfaces in passed
+## directory and return path to directory used as '/proc'.
+## RETURN:
+## '/tmp/tmpa1b2c3/proc'
+def fake_proc_net_dev(parent_dir: str, interfaces: int):
+    proc_dir = f"{parent_dir}/proc"
+    os.makedirs(f"{proc_dir}/net")
+
+    with open(f"{proc_dir}/net/dev", 'w') as f:
+        f.write("Inter-|   Receive |  Transmit\n face |bytes packets |bytes packets\n")
+        for i in range(interfaces):
+            f.write(f" veth{i}: {i * 1000} {i} 0 0 0 0 0 0 {i * 2000} {i * 2} 0 0 0 0 0 0\n")
+
+    return proc_dir
+
+
+## Benchmark link_rawdata() and traffic rates of all interfaces in fake sysfs
+## tree with and without persistent SysfsReader and print time per tick.
+def benchmark_sysfs(interfaces: int = 500, ticks: int = 50):
+    with tempfile.TemporaryDirectory() as tmp:
+        net_dir = fake_sys_class_net(tmp, interfaces)
+        proc_dir = fake_proc_net_dev(tmp, interfaces)
+        names = os.listdir(net_dir)
+
+        for keep_open in (False, True):
+            reader = SysfsReader(net_dir, keep_open)
+
+            stats = NetStats(proc_dir)
+
+            start = time.perf_counter()
+            for _ in range(ticks):
+                now = time.monotonic()
+                stats.update()
+                for name in names:
+                    NetInfo(name, {}, reader).link_rawdata()
+                    stats.sample(name, now)
+            elapsed = (time.perf_counter() - start) / ticks
+
+            print(f"sysfs: {interfaces} interfaces, keep_open={keep_open}: {elapsed * 1000:.2f} ms per tick")
+            reader.prune([])
+
+
+## Benchmark DiskSampler on synthetic '/proc/diskstats' and mount table of
+## storage node (devices with partitions, bind mounts) and print ms per tick.
+def benchmark_disks(devices: int = 500, binds: int = 1000, ticks: int = 100):
+    def diskstats(tick: int):
+        return ''.join(f"   8 {i} sd{i} {tick * 10} 0 {tick * 80} {tick * 3} {tick * 20} 0 {tick * 160} {tick * 9} 1 "
+                       f"{tick * 7} {tick * 12} 0 0 0 0\n" for i in range(devices))
+    mountinfo = ''.join(f"{i} 1 8:{i} / /srv/disk{i} rw,relatime - xfs /dev/sd{i} rw\n" for i in range(devices))
+    mountinfo += ''.join(f"{devices + i} 1 8:{i % devices} /data{i} /bind/{i} rw - xfs /dev/sd{i % devices} rw\n"
+                         for i in range(binds))
+    texts = [diskstats(t) for t in range(ticks + 1)]
+
+    sampler = DiskSampler()
+    sampler.sample(texts[0], 0.0)
+    start = time.perf_counter()
+    for t in range(1, ticks + 1):
+        sampler.sample(texts[t], float(t))
+    elapsed = time.perf_counter() - start
+    print(f"disks: {devices} devices: {elapsed / ticks * 1000:.2f} ms per tick (diskstats)")
+
+    start = time.perf_counter()
+    mounts = sampler.parse_mountinfo(mountinfo)
+    elapsed = time.perf_counter() - start
+    print(f"disks: {devices + binds} mounts parsed in {elapsed * 1000:.2f} ms ({len(mounts)} filesystems, "
+          f"only after mount table changed)")
+
+    sampler.filesystems()
+    start = time.perf_counter()
+    for t in range(ticks):
+        sampler.filesystems()
+    elapsed = time.perf_counter() - start
+    print(f"disks: unchanged mount table: {elapsed / ticks * 1000000:.1f} us per tick")
+    sampler.close()
+
+
+## Benchmark ProcessSampler tick against psutil.process_iter() reading the
+## same fields with passed number of extra (sleeping) processes and print ms
+## per tick.
+def benchmark_processes(processes: int = 2000, ticks: int = 10):
+    children = [subprocess.Popen(['sleep', '600']) for _ in range(processes)]
+    try:
+        sampler = ProcessSampler()
+        start = time.perf_counter()
+        sampler.sample()
+        print(f"processes: first tick (static fields of {len(sampler.static)} processes): "
+              f"{(time.perf_counter() - start) * 1000:.1f} ms")
+
+        start = time.perf_counter()
+        for _ in range(ticks):
+            data = sampler.sample()
+        print(f"processes: ProcessSampler: {(time.perf_counter() - start) / ticks * 1000:.1f} ms per tick "
+              f"({data['processes']} processes)")
+
+        attrs = ['name', 'username', 'cmdline', 'exe', 'create_time', 'cpu_times', 'memory_info', 'io_counters']
+        start = time.perf_counter()
+        for _ in range(ticks):
+            list(psutil.process_iter(attrs))
+        print(f"processes: psutil.process_iter(): {(time.perf_counter() - start) / ticks * 1000:.1f} ms per tick")
+    finally:
+        for child in children:
+            child.kill()
+            child.wait()
+
+
+## Benchmark CgroupSampler tick with passed number of extra cgroups (created
+## in cgroup v2 hierarchy, needs root) against walking tree and opening stat
+## files every tick and print ms per tick.
+def benchmark_cgroups(cgroups: int = 300, ticks: int = 20):
+    root = CgroupSampler.find_root()
+    if not root:
+        print("cgroups: no cgroup v2 hierarchy mounted!", file=sys.stderr)
+        return
+    base = f"{root}/nemesis_benchmark"
+    os.mkdir(base)
+    try:
+        for i in range(cgroups):
+            os.mkdir(f"{base}/ct{i}")
+
+        sampler = CgroupSampler(root)
+        sampler.sample()
+        start = time.perf_counter()
+        for _ in range(ticks):
+            data = sampler.sample()
+        print(f"cgroups: CgroupSampler: {(time.perf_counter() - start) / ticks * 1000:.2f} ms per tick "
+              f"({data['count']} cgroups, {sum(len(f) for f in sampler.cgroups.values())} open files)")
+        sampler.close()
+
+        start = time.perf_counter()
+        for _ in range(ticks):
+            for directory, _, _ in os.walk(root):
+                for file in CgroupSampler.FILES:
+                    try:
+                        with open(f"{directory}/{file}", 'rb') as f:
+                            f.read()
+                    except OSError:
+                        pass
+        print(f"cgroups: walk and open every tick: {(time.perf_counter() - start) / ticks * 1000:.2f} ms per tick")
+    finally:
+        for i in range(cgroups):
+            try:
+                os.rmdir(f"{base}/ct{i}")
+            except OSError:
+                pass
+        os.rmdir(base)
+
+
+## Benchmark CpuSampler on synthetic '/proc/stat' of many-core machine and
+## print ms per tick (utilization of every core and its statistics).
+def benchmark_cpu(cores: int = 256, ticks: int = 100):
+    rng = random.Random(1)
+    counters = [[rng.randrange(10**6) for _ in CpuSampler.FIELDS] for _ in range(cores)]
+    texts = []
+    for _ in range(ticks + 1):
+        for c in counters:
+            for i in range(len(c)):
+                c[i] += rng.randrange(100)
+        total = [sum(c[i] for c in counters) for i in range(len(CpuSampler.FIELDS))]
+        lines = [f"cpu  {' '.join(map(str, total))} 0 0"]
+        lines += [f"cpu{core} {' '.join(map(str, c))} 0 0" for core, c in enumerate(counters)]
+        texts.append('\n'.join(lines) + '\nintr 0\n')
+
+    sampler = CpuSampler()
+    sampler.sample(texts[0])
+    start = time.perf_counter()
+    for text in texts[1:]:
+        data = sampler.sample(text)
+        CpuSampler.stats(data['per_core'])
+    print(f"cpu: {cores} cores: {(time.perf_counter() - start) / ticks * 1000:.2f} ms per tick")
+
+
+## Benchmark vendor lookups of random MAC addresses (half of them with
+## registered prefix) in OuiIndex and in netaddr and print lookups per second.
+def benchmark_oui(lookups: int = 1000000, netaddr_lookups: int = 2000):
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        index = OuiIndex.load(f"{tmp}/oui.idx")
+        print(f"oui: index built and loaded in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        rng = random.Random(1)
+        prefixes = list(index.oui_keys)
+        macs = [(rng.choice(prefixes) << 24 | rng.getrandbits(24)) if i % 2 else rng.getrandbits(48)
+                for i in range(lookups)]
+        texts = [':'.join(f"{m:012x}"[i:i + 2] for i in range(0, 12, 2)) for m in macs[:netaddr_lookups]]
+
+        start = time.perf_counter()
+        found = sum(index.lookup(m) is not None for m in macs)
+        elapsed = time.perf_counter() - start
+        print(f"oui: OuiIndex: {lookups / elapsed:,.0f} lookups/s ({found} found)")
+
+        start = time.perf_counter()
+        for text in texts:
+            index.lookup(text)
+        elapsed = time.perf_counter() - start
+        print(f"oui: OuiIndex (text MAC): {len(texts) / elapsed:,.0f} lookups/s")
+
+        start = time.perf_counter()
+        for text in texts:
+            try:
+                netaddr.EUI(text).oui.registration()
+            except netaddr.NotRegisteredError:
+                pass
+        elapsed = time.perf_counter() - start
+        print(f"oui: netaddr: {len(texts) / elapsed:,.0f} lookups/s")
+
+        index.close()
+
+
+## Benchmark classification of random addresses by random networks (mostly
+## IPv4) in SubnetClassifier and by linear search of netaddr networks and
+## print lookups per second.
+def benchmark_classifier(networks: int = 5000, lookups: int = 1000000, netaddr_lookups: int = 200):
+    rng = random.Random(1)
+    classifier = SubnetClassifier()
+    nets = []
+    for i in range(networks):
+        if i % 10:
+            net = netaddr.IPNetwork(f"{netaddr.IPAddress(rng.getrandbits(32), 4)}/{rng.randint(8, 30)}").cidr
+        else:
+            net = netaddr.IPNetwork(f"{netaddr.IPAddress(0xfd << 120 | rng.getrandbits(120), 6)}/{rng.randint(32, 64)}").cidr
+        nets.append(net)
+    start = time.perf_counter()
+    for i, net in enumerate(nets):
+        classifier.add(str(net), {'zone': str(i)})
+    print(f"classifier: {networks} networks added in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    ## Half of addresses are inside of some network.
+    addresses = []
+    for i in range(lookups):
+        net = nets[rng.randrange(networks)]
+        if i % 2 or net.version == 6:
+            value = net.first + rng.randrange(net.size) if net.version == 4 else net.first + rng.getrandbits(64)
+            addresses.append(str(netaddr.IPAddress(value, net.version)))
+        else:
+            addresses.append(str(netaddr.IPAddress(rng.getrandbits(32), 4)))
+    values = [int(netaddr.IPAddress(a)) for a in addresses if ':' not in a]
+
+    start = time.perf_counter()
+    tags = classifier.classify(addresses)
+    elapsed = time.perf_counter() - start
+    print(f"classifier: classify(): {lookups / elapsed:,.0f} addresses/s ({sum(t is not None for t in tags)} tagged)")
+
+    match = classifier.match
+    start = time.perf_counter()
+    for value in values:
+        match(value)
+    elapsed = time.perf_counter() - start
+    print(f"classifier: match() of integer IPv4: {len(values) / elapsed:,.0f} addresses/s")
+
+    ## Packed integers, first of random addresses (every prefix is new), then
+    ## of hosts in 1000 subnets as in inventory.
+    mapped = [int.from_bytes(HostInventory.packed(a), 'big') for a in addresses]
+    start = time.perf_counter()
+    assert classifier.classify_ints(mapped) == tags
+    elapsed = time.perf_counter() - start
+    print(f"classifier: classify_ints() of random addresses: {lookups / elapsed:,.0f} addresses/s")
+    subnets = [0xffff << 32 | rng.getrandbits(24) << 8 for _ in range(1000)]
+    hosts = [rng.choice(subnets) | rng.randrange(256) for _ in range(lookups)]
+    start = time.perf_counter()
+    classifier.classify_ints(hosts)
+    elapsed = time.perf_counter() - start
+    print(f"classifier: classify_ints() of hosts in 1000 subnets: {lookups / elapsed:,.0f} addresses/s")
+
+    ## Linear search gives the same results.
+    ordered = sorted(nets, key=lambda n: n.prefixlen, reverse=True)
+    start = time.perf_counter()
+    for address, tag in zip(addresses[:netaddr_lookups], tags):
+        ip = netaddr.IPAddress(address)
+        found = next((n for n in ordered if n.version == ip.version and ip in n), None)
+        assert (found is None and tag is None) or (tag is not None and netaddr.IPNetwork(tag['network']) == found)
+    elapsed = time.perf_counter() - start
+    print(f"classifier: netaddr linear search: {netaddr_lookups / elapsed:,.0f} addresses/s")
+
+
+## Benchmark TcpStates on synthetic '/proc/net/tcp' with many sockets (100
+## listeners, most connections on their ports) and compare it with parsing
+## every line by split() (print ms per sample).
+def benchmark_tcp(sockets: int = 500000, ticks: int = 5):
+    rng = random.Random(1)
+    states = [s.decode() for s in TcpStates.STATES if s != b'0A']
+    lines = ['  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode']
+    for i in range(sockets):
+        state = '0A' if i < 100 else rng.choice(states)
+        port = 1000 + i % 100 if i < 100 or rng.random() < 0.7 else rng.randrange(32768, 61000)
+        lines.append(f"{i:4d}: {rng.getrandbits(32):08X}:{port:04X} {rng.getrandbits(32):08X}:{rng.getrandbits(16):04X} "
+                     f"{state} 00000000:{rng.randrange(8):08X} 00:00000000 00000000     0        0 {i} 1 0000000000000000 100 0 0 10 0")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.mkdir(f"{tmp}/net")
+        with open(f"{tmp}/net/tcp", 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        with open(f"{tmp}/net/tcp6", 'w') as f:
+            f.write(lines[0] + '\n')
+
+        sampler = TcpStates(tmp)
+        start = time.perf_counter()
+        for _ in range(ticks):
+            data = sampler.sample()
+        print(f"tcp: TcpStates: {(time.perf_counter() - start) / ticks * 1000:.1f} ms per sample "
+              f"({data['sockets']} sockets, {len(data['listeners'])} listeners)")
+
+        start = time.perf_counter()
+        for _ in range(ticks):
+            counts = collections.Counter()
+            with open(f"{tmp}/net/tcp", 'rb') as f:
+                next(f)
+                for line in f:
+                    fields = line.split()
+                    counts[(int(fields[1].split(b':')[1], 16), TcpStates.STATES[fields[3]])] += 1
+        print(f"tcp: split() per line: {(time.perf_counter() - start) / ticks * 1000:.1f} ms per sample")
+
+
+## Run benchmark with passed name.
+def benchmark(name: str):
+    benchmarks = {
+        'sysfs':      benchmark_sysfs,
+        'cpu':        benchmark_cpu,
+        'disks':      benchmark_disks,
+        'processes':  benchmark_processes,
+        'cgroups':    benchmark_cgroups,
+        'oui':        benchmark_oui,
+        'classifier': benchmark_classifier,
+        'tcp':        benchmark_tcp
+    }
+
+    if name not in benchmarks:
+        print(f"Unknown benchmark \'{name}\'! Available: {', '.join(benchmarks)}.", file=sys.stderr)
+        sys.exit(errno.EINVAL)
+
+    ## Same descriptor limit as daemon (benchmarked samplers keep files open).
+    raise_nofile_limit()
+    benchmarks[name]()
 
 
 def main():
@@ -744,12 +7089,25 @@ def main():
     ## Check if user has root privileges.
     rootcheck()
 
+    ## Allow as many descriptors as possible (once for whole process).
+    logging.debug(f"Limit of open descriptors: {raise_nofile_limit()}.")
+
     ## Load configuration from config file to dictionary variable.
     config = load_config()
     logging.debug(f"Configuration file settings: {config}.")
 
+    ## Invalid interface pattern would fail on every netinfo tick.
+    try:
+        NetSweep.compile(config['interface'])
+    except re.error as e:
+        logging.critical(f"Invalid interface pattern \'{config['interface']}\' ({e})! Exiting.")
+
+        ## Exit with error code of 'Invalid argument'.
+        sys.exit(errno.EINVAL)
+
     ## Get tuple of data dirs e.g.
-    ## ('/etc/nemesis/nemesis_data/json/ipv4', '/etc/nemesis/nemesis_data/json/ipv6')
+    ## ('/etc/nemesis/nemesis_data/json/ipv4', '/etc/nemesis/nemesis_data/json/ipv6',
+    ## '/etc/nemesis/nemesis_data/history')
     data_dirs = create_data_dirs(config['nemesis_dir'])
 
     ## Nemesis IPv4 sysinfo file.
@@ -760,17 +7118,186 @@ def main():
     n6sf = f"{data_dirs[1]}/nemesis_sys.json"
     ## Nemesis IPv6 netinfo file.
     n6nf = f"{data_dirs[1]}/nemesis_net.json"
+    ## Nemesis top processes file.
+    n4pf = f"{data_dirs[0]}/nemesis_proc.json"
+    ## Nemesis cgroups file.
+    n4cf = f"{data_dirs[0]}/nemesis_cgroups.json"
+    ## Nemesis TCP states file.
+    n4tf = f"{data_dirs[0]}/nemesis_tcp.json"
 
     ## Create instance of JsonData class.
-    json_data = JsonData()
-
-    ## Create threads to keep writing JSON data.
-    thd_1 = threading.Thread(target=json_data.write_sysinfo, args=(n4sf, int(config['sys_refresh_time']),))
-    thd_2 = threading.Thread(target=json_data.write_netinfo, args=(n4nf, int(config['net_refresh_time']), config['interface'],))
+    json_data = JsonData(fsync=config['fsync'])
+
+    ## Report usage of network filesystems (NFS, CIFS, FUSE, ...).
+    json_data.si.disk_sampler.network = config['network_fs'] == 'yes'
+
+    ## Keep history for configured number of days (one record per refresh).
+    days = float(config['history_days'])
+    if days > 0:
+        json_data.start_history(data_dirs[2],
+                                int(days * 86400 / int(config['sys_refresh_time'])),
+                                int(days * 86400 / int(config['net_refresh_time'])))
+
+    ## Discover live IPv4 hosts in subnets of monitored interfaces (and IPv6
+    ## hosts on their links).
+    discovery = config['discovery'] == 'yes'
+    discovery6 = discovery and config['discovery_ipv6'] == 'yes'
+
+    ## Track hosts passively in neighbour tables.
+    neigh = config['neigh'] == 'yes'
+    if neigh:
+        json_data.start_neighbours(int(config['neigh_expire_time']))
+
+    ## Keep found hosts in database (and export them to JSON files of hosts).
+    ## Database is kept outside of data directory, so host history survives
+    ## restart.
+    export = False
+    if (discovery or neigh) and config['inventory'] == 'yes':
+        try:
+            json_data.start_inventory(config['inventory_db'], float(config['inventory_expire_time']))
+            export = config['inventory_export'] == 'yes'
+        except (OSError, sqlite3.Error) as e:
+            logging.error(f"Inventory \'{config['inventory_db']}\' could not be opened ({e})! One JSON file per host is written.")
+
+    ## Add vendors to found hosts (index is kept outside of data directory, so
+    ## it is built only once).
+    if (neigh or json_data.inventory is not None) and config['oui_index']:
+        try:
+            json_data.start_vendors(config['oui_index'])
+        except (OSError, ValueError):
+            logging.error(f"OUI index '{config['oui_index']}' could not be built! Vendors are not detected.")
 
-    ## Start threads (this will keep happening until process is stopped/killed).
-    thd_1.start()
-    thd_2.start()
+    ## Tag addresses of interfaces and hosts by configured networks.
+    if config['subnets_file']:
+        try:
+            json_data.start_classifier(config['subnets_file'])
+        except (OSError, ValueError) as e:
+            logging.error(f"Subnet file '{config['subnets_file']}' could not be loaded ({e})! Addresses are not tagged.")
+
+    ## Find processes using most CPU, memory and I/O.
+    procs = config['procs'] == 'yes'
+    if procs:
+        json_data.start_processes(int(config['proc_top']))
+
+    ## Report usage of every cgroup (containers, services).
+    cgroups = config['cgroups'] == 'yes'
+    if cgroups and not json_data.start_cgroups(config['cgroup_root']):
+        logging.warning("No cgroup v2 hierarchy found! Cgroups are not reported.")
+        cgroups = False
+
+    ## Summarize TCP sockets by state (IPv4 and IPv6).
+    tcp = config['tcp_states'] == 'yes'
+    if tcp:
+        json_data.start_tcp_states()
+
+    ## Scan ports of hosts in inventory.
+    portscan = config['portscan'] == 'yes'
+    if portscan and json_data.inventory is None:
+        logging.warning("Port scanning needs host inventory (and discovery or neighbours)! Port scanning disabled.")
+        portscan = False
+    if portscan:
+        json_data.start_portscan(PortScanner.parse_ports(config['portscan_ports']), int(config['portscan_concurrency']),
+                                 int(config['portscan_per_host']), float(config['portscan_timeout']),
+                                 int(config['portscan_rate']), int(config['portscan_full_every']),
+                                 int(config['portscan_max_age']))
+    if discovery:
+        json_data.start_discovery(int(config['discovery_concurrency']), int(config['discovery_rate']),
+                                  tuple(int(p) for p in config['discovery_ports'].split(',') if p.strip()),
+                                  float(config['discovery_timeout']), int(config['discovery_min_prefix']))
+
+    ## Create scheduler with jobs writing JSON data ('threads': Scheduler with
+    ## worker threads, 'asyncio': AsyncRuntime with coroutines).
+    if config['runtime'] == 'asyncio':
+        scheduler = AsyncRuntime(workers=4)
+        scheduler.add('sysinfo', lambda: json_data.update_sysinfo_async(scheduler, n4sf),
+                      int(config['sys_refresh_time']))
+        scheduler.add('netinfo', lambda: json_data.update_netinfo_async(scheduler, n4nf, config['interface'], config['net_output']),
+                      int(config['net_refresh_time']))
+        if discovery:
+            scheduler.add('discovery', lambda: json_data.update_hosts_async(scheduler, data_dirs[0], config['interface']),
+                          int(config['discovery_refresh_time']))
+        if discovery6:
+            scheduler.add('discovery6', lambda: json_data.update_hosts6_async(scheduler, data_dirs[1], config['interface']),
+                          int(config['discovery_refresh_time']))
+        if neigh:
+            scheduler.add('neighbours', lambda: json_data.update_neighbours_async(scheduler, data_dirs[:2]),
+                          int(config['neigh_refresh_time']))
+        if export:
+            scheduler.add('inventory_export', lambda: json_data.update_inventory_export_async(scheduler, data_dirs[:2]),
+                          int(config['inventory_export_time']))
+        if portscan:
+            scheduler.add('portscan', lambda: json_data.update_services_async(scheduler), int(config['portscan_refresh_time']))
+        if procs:
+            scheduler.add('processes', lambda: json_data.update_processes_async(scheduler, n4pf),
+                          int(config['proc_refresh_time']))
+        if cgroups:
+            scheduler.add('cgroups', lambda: json_data.update_cgroups_async(scheduler, n4cf),
+                          int(config['cgroup_refresh_time']))
+        if tcp:
+            scheduler.add('tcpstates', lambda: json_data.update_tcp_async(scheduler, n4tf), int(config['net_refresh_time']))
+    else:
+        ## Sweeps and port scan take long, so they get their own workers.
+        scheduler = Scheduler(workers=2)
+        scheduler.add('sysinfo', lambda: json_data.update_sysinfo(n4sf), int(config['sys_refresh_time']))
+        scheduler.add('netinfo', lambda: json_data.update_netinfo(n4nf, config['interface'], config['net_output']),
+                      int(config['net_refresh_time']))
+        if discovery:
+            scheduler.add('discovery', lambda: json_data.update_hosts(data_dirs[0], config['interface']),
+                          int(config['discovery_refresh_time']), long=True)
+        if discovery6:
+            scheduler.add('discovery6', lambda: json_data.update_hosts6(data_dirs[1], config['interface']),
+                          int(config['discovery_refresh_time']), long=True)
+        if neigh:
+            scheduler.add('neighbours', lambda: json_data.update_neighbours(data_dirs[:2]), int(config['neigh_refresh_time']))
+        if export:
+            scheduler.add('inventory_export', lambda: json_data.update_inventory_export(data_dirs[:2]),
+                          int(config['inventory_export_time']))
+        if portscan:
+            scheduler.add('portscan', lambda: json_data.update_services(), int(config['portscan_refresh_time']),
+                          long=True)
+        if procs:
+            scheduler.add('processes', lambda: json_data.update_processes(n4pf), int(config['proc_refresh_time']))
+        if cgroups:
+            scheduler.add('cgroups', lambda: json_data.update_cgroups(n4cf), int(config['cgroup_refresh_time']))
+        if tcp:
+            scheduler.add('tcpstates', lambda: json_data.update_tcp(n4tf), int(config['net_refresh_time']))
+    logging.debug(f"Runtime: {config['runtime']}.")
+
+    ## Write netinfo right after link or address change.
+    if config['net_events'] == 'yes':
+        json_data.start_net_events(lambda: scheduler.trigger('netinfo'))
+
+    ## Serve latest data from memory.
+    api = None
+    if config['api_socket'] or config['api_http']:
+        api = ApiServer(json_data.store, config['api_socket'], config['api_http'], inventory=json_data.inventory,
+                        socket_mode=int(config['api_socket_mode'], 8), socket_group=config['api_socket_group'])
+        api.metrics.extra.append(lambda m: json_data.nemesis_metrics(m, scheduler))
+        api.start()
+
+    ## Stop cleanly on SIGTERM and SIGINT (Ctrl+C).
+    signal.signal(signal.SIGTERM, lambda signum, frame: scheduler.stop())
+    signal.signal(signal.SIGINT,  lambda signum, frame: scheduler.stop())
+
+    ## Run jobs (this will keep happening until process is stopped).
+    scheduler.run()
+
+    ## Clean up.
+    if api is not None:
+        api.stop()
+        api.thread.join(timeout=5)
+    if json_data.netlink is not None:
+        json_data.netlink.stop()
+    for ring in json_data.rings.values():
+        ring.close()
+    if json_data.inventory is not None:
+        json_data.inventory.close()
+    if json_data.vendors is not None:
+        json_data.vendors.close()
+    if json_data.cgroups is not None:
+        json_data.cgroups.close()
+    logging.debug(f"Scheduler: {scheduler.stats()}.")
+    logging.info("Nemesis stopped.")
 
 
 ################################################################################
@@ -778,4 +7305,8 @@ def main():
 ################################################################################
 ## Start program.
 if __name__ == "__main__":
-    main()
+    ## 'nemesis.py --benchmark NAME' runs benchmark instead of NEMESIS.
+    if (len(sys.argv) == 3) and (sys.argv[1] == '--benchmark'):
+        benchmark(sys.argv[2])
+    else:
+        main()
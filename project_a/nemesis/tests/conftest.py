@@ -0,0 +1,6 @@
+## Tests import 'nemesis.py' from install directory (it is installed as single
+## script, not as package).
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'install'))
@@ -0,0 +1,108 @@
+## API server answers from SnapshotStore over Unix socket.
+import socket
+import time
+
+import pytest
+
+import nemesis
+
+
+@pytest.fixture
+def serve(tmp_path):
+    servers = []
+    def start():
+        store = nemesis.SnapshotStore()
+        store.publish('sys', '{"cpu": 1}')
+        api = nemesis.ApiServer(store, str(tmp_path / f"api{len(servers)}.sock"))
+        api.start()
+        for _ in range(100):
+            if api.loop is not None and tmp_path.joinpath(f"api{len(servers)}.sock").exists():
+                break
+            time.sleep(0.01)
+        servers.append(api)
+        return api
+    yield start
+    for api in servers:
+        api.stop()
+        api.thread.join(timeout=5)
+
+
+def request(api, text):
+    with socket.socket(socket.AF_UNIX) as sock:
+        sock.settimeout(5)
+        sock.connect(api.socket_path)
+        sock.sendall(text.encode())
+        data = b''
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                return data
+            data += chunk
+
+
+def header(response, name):
+    for line in response.split(b'\r\n\r\n')[0].split(b'\r\n')[1:]:
+        key, _, value = line.partition(b':')
+        if key.strip().lower() == name.lower():
+            return value.strip().decode()
+    return None
+
+
+def test_etag_of_previous_run_does_not_match(serve):
+    api = serve()
+    tag = header(request(api, "GET /snapshot HTTP/1.1\r\nConnection: close\r\n\r\n"), b'etag')
+    response = request(api, f"GET /snapshot HTTP/1.1\r\nIf-None-Match: {tag}\r\nConnection: close\r\n\r\n")
+    assert response.startswith(b'HTTP/1.1 304 ')
+
+    ## Restarted server has the same sequence numbers.
+    api = serve()
+    response = request(api, f"GET /snapshot HTTP/1.1\r\nIf-None-Match: {tag}\r\nConnection: close\r\n\r\n")
+    assert response.startswith(b'HTTP/1.1 200 ')
+    assert header(response, b'etag') != tag
+
+
+def test_head_of_event_stream_ends(serve):
+    api = serve()
+    response = request(api, "HEAD /events HTTP/1.1\r\n\r\n")
+    assert response.startswith(b'HTTP/1.1 200 ')
+    assert header(response, b'content-type') == 'text/event-stream'
+    assert response.endswith(b'\r\n\r\n')
+    assert api.subscribers == 0
+
+
+def test_metrics_render_only_changed_sections():
+    store = nemesis.SnapshotStore()
+    metrics = nemesis.MetricsRenderer(store)
+    rendered = []
+    def hosts(data):
+        rendered.append(data['n'])
+        metrics.add('nemesis_hosts', 'gauge', 'Hosts.', data['n'], {'family': data['family']})
+    metrics.sections = {'hosts': hosts, 'hosts6': hosts}
+
+    store.publish('hosts', '1', {'n': 1, 'family': 'ipv4'})
+    store.publish('hosts6', '2', {'n': 2, 'family': 'ipv6'})
+    metrics.render()
+    store.publish('hosts6', '3', {'n': 3, 'family': 'ipv6'})
+    text = metrics.render().decode()
+
+    assert rendered == [1, 2, 3]
+    ## Family shared by sections is rendered once.
+    assert text.count('# TYPE nemesis_hosts gauge') == 1
+    assert 'nemesis_hosts{family="ipv4"} 1' in text and 'nemesis_hosts{family="ipv6"} 3' in text
+
+
+def test_lazy_section_is_joined_once_when_read():
+    store = nemesis.SnapshotStore()
+    joined = []
+    def data():
+        joined.append(1)
+        return '{"hosts": []}'
+
+    store.publish_lazy('neigh', data, lambda: {'hosts': [], 'changes': 1})
+    store.publish_lazy('neigh', data, lambda: {'hosts': [], 'changes': 2})
+    assert joined == []
+
+    assert store.get(['neigh']) == {'neigh': (2, b'{"hosts": []}')}
+    assert store.get_counted()['neigh'] == (2, b'{"hosts": []}', 2)
+    assert store.get_raw() == (2, {'neigh': (2, {'hosts': [], 'changes': 2})})
+    assert joined == [1]
@@ -0,0 +1,38 @@
+## Walking cgroup tree again keeps rates of known cgroups.
+import os
+import shutil
+
+import nemesis
+
+
+def cgroup(root, name, usage):
+    os.makedirs(f"{root}{name}", exist_ok=True)
+    with open(f"{root}{name}/cpu.stat", 'w') as f:
+        f.write(f"usage_usec {usage}\nuser_usec {usage}\nsystem_usec 0\n")
+
+
+def rates(data):
+    return {c['cgroup']: c['cpu_pct'] for c in data['cgroups']}
+
+
+def test_rewalk_keeps_previous(tmp_path):
+    root = str(tmp_path)
+    cgroup(root, '', 0)
+    cgroup(root, '/a', 0)
+    cgroup(root, '/b', 0)
+
+    sampler = nemesis.CgroupSampler(root)
+    ## Same as missing inotify (every tick walks whole tree).
+    if sampler.inotify is not None:
+        os.close(sampler.inotify)
+        sampler.inotify = None
+    sampler.sample(0.0)
+    fds = dict(sampler.cgroups['/a'])
+
+    cgroup(root, '', 1000000)
+    cgroup(root, '/a', 500000)
+    shutil.rmtree(f"{root}/b")
+    cgroup(root, '/c', 0)
+    assert rates(sampler.sample(1.0)) == {'/': 100.0, '/a': 50.0, '/c': 0.0}
+    assert sampler.cgroups['/a'] == fds
+    sampler.close()
@@ -0,0 +1,46 @@
+## Subnet classifier gives the same tags for text and packed addresses.
+import nemesis
+
+
+ADDRESSES = ['10.1.20.5', '10.1.21.5', '10.200.0.1', '192.168.1.1', 'fd00:1::1', 'fd00:1:0:2::1', 'fe80::1', '::ffff:0:1']
+
+
+def classifier():
+    classifier = nemesis.SubnetClassifier()
+    classifier.add('10.0.0.0/8', {'site': 'prague'})
+    classifier.add('10.1.20.0/23', {'vlan': '20'})
+    classifier.add('10.1.20.4/30', {'zone': 'dmz'})
+    classifier.add('fd00:1::/48', {'site': 'brno'})
+    classifier.add('fd00:1::/127', {'zone': 'lab'})
+    return classifier
+
+
+def test_classify_ints():
+    subnets = classifier()
+    values = [int.from_bytes(nemesis.HostInventory.packed(a), 'big') for a in ADDRESSES]
+
+    assert [t and t['network'] for t in subnets.classify(ADDRESSES)] == \
+        ['10.1.20.4/30', '10.1.20.0/23', '10.0.0.0/8', None, 'fd00:1::/127', 'fd00:1::/48', None, None]
+    assert subnets.classify_ints(values) == subnets.classify(ADDRESSES)
+    ## Cached prefixes give the same result on repeated addresses.
+    assert subnets.classify_ints(values * 3) == subnets.classify(ADDRESSES * 3)
+
+
+def test_inventory_tags(tmp_path):
+    inventory = nemesis.HostInventory(str(tmp_path / 'inventory.db'))
+    inventory.classifier = classifier()
+    inventory.upsert([{'ip': '10.1.20.5', 'method': 'icmp', 'rtt_ms': 1.0,
+                       'first_seen': '2022-01-16 14:08:01', 'last_seen': '2022-01-16 14:08:01'}])
+
+    assert [r['tags']['network'] for r in inventory.query()] == ['10.1.20.4/30']
+    inventory.close()
+
+
+def test_mapped_ipv4_uses_ipv4_networks():
+    subnets = classifier()
+    subnets.add('::/0', {'zone': 'any6'})
+    addresses = ['::ffff:10.1.20.5', '::ffff:192.168.1.1']
+    values = [int.from_bytes(nemesis.HostInventory.packed(a), 'big') for a in addresses]
+
+    assert [t and t['network'] for t in subnets.classify(addresses)] == ['10.1.20.4/30', None]
+    assert subnets.classify_ints(values) == subnets.classify(addresses)
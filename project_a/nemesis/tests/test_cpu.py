@@ -0,0 +1,34 @@
+## CPU sampler over '/proc/stat' content with cores going offline and online.
+import nemesis
+
+
+def stat(cores):
+    lines = ["cpu  {} 0 {} {} 0 0 0 0".format(*[sum(c[i] for c in cores.values()) for i in range(3)])]
+    lines += [f"cpu{core} {user} 0 {system} {idle} 0 0 0 0" for core, (user, system, idle) in sorted(cores.items())]
+    return '\n'.join(lines) + "\nintr 0\n"
+
+
+def test_core_back_online(tmp_path):
+    sampler = nemesis.CpuSampler(str(tmp_path), str(tmp_path))
+    sampler.sample(stat({0: (100, 0, 100), 1: (9980, 0, 20), 2: (100, 0, 100)}))
+
+    ## Core 1 goes offline, then comes back with counters since boot.
+    assert list(sampler.sample(stat({0: (150, 0, 150), 2: (150, 0, 150)}))['per_core']) == [50.0, 0.0, 50.0]
+    result = sampler.sample(stat({0: (200, 0, 200), 1: (9990, 0, 30), 2: (200, 0, 200)}))
+    assert list(result['per_core']) == [50.0, 0.0, 50.0]
+
+    result = sampler.sample(stat({0: (250, 0, 250), 1: (10000, 0, 40), 2: (250, 0, 250)}))
+    assert list(result['per_core']) == [50.0, 50.0, 50.0]
+
+
+def test_lines_with_different_columns(tmp_path):
+    sampler = nemesis.CpuSampler(str(tmp_path), str(tmp_path))
+    text = "cpu  30 0 6 60 0 0 0 0 0 0\ncpu0 10 0 2 20 0 0 0 0\ncpu1 20 0 4 40 0 0 0 0 0 0\nintr 0\n"
+
+    total, columns = sampler.parse(text)
+    assert list(total) == [30, 0, 6, 60, 0, 0, 0, 0]
+    assert [list(c) for c in columns[:4]] == [[10, 20], [0, 0], [2, 4], [20, 40]]
+
+    ## Same lines are parsed at once.
+    text = stat({0: (10, 2, 20), 2: (20, 4, 40)})
+    assert sampler.parse(text) == sampler.parse_lines(text)
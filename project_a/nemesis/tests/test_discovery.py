@@ -0,0 +1,90 @@
+## Host discovery on loopback (every address of 127.0.0.0/8 answers).
+import asyncio
+import socket
+
+import netaddr
+import pytest
+
+import nemesis
+
+NETWORK = netaddr.IPNetwork('127.0.0.0/29')
+HOSTS = [f"127.0.0.{i}" for i in range(1, 7)]
+
+
+## Return port on loopback which refuses connections.
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_icmp_sweep():
+    discovery = nemesis.HostDiscovery(ports=(), timeout=0.3)
+    if discovery.icmp_socket()[0] is None:
+        pytest.skip("ICMP socket is not available.")
+
+    hosts = asyncio.run(discovery.sweep([NETWORK]))
+
+    assert list(hosts) == HOSTS
+    assert {h['method'] for h in hosts.values()} == {'icmp'}
+    assert discovery.last['probes'] == len(HOSTS)
+
+
+def test_tcp_sweep(monkeypatch):
+    ## Without ICMP only TCP probes are sent, refused connection means live
+    ## host too.
+    monkeypatch.setattr(nemesis.HostDiscovery, 'icmp_socket', lambda self, family=socket.AF_INET: (None, False))
+    with socket.socket() as listener:
+        listener.bind(('127.0.0.1', 0))
+        listener.listen()
+        discovery = nemesis.HostDiscovery(ports=(listener.getsockname()[1], closed_port()), timeout=0.5)
+
+        hosts = asyncio.run(discovery.sweep([NETWORK]))
+
+    assert list(hosts) == HOSTS
+    assert {h['method'] for h in hosts.values()} == {'tcp'}
+    assert all(h['first_seen'] == h['last_seen'] for h in hosts.values())
+
+
+def test_first_seen_is_kept(monkeypatch):
+    monkeypatch.setattr(nemesis.HostDiscovery, 'icmp_socket', lambda self, family=socket.AF_INET: (None, False))
+    discovery = nemesis.HostDiscovery(ports=(closed_port(),), timeout=0.5)
+
+    first = asyncio.run(discovery.sweep([NETWORK]))
+    for host in first.values():
+        host['first_seen'] = '2022-01-16 14:07:43'
+    second = asyncio.run(discovery.sweep([NETWORK]))
+
+    assert {h['first_seen'] for h in second.values()} == {'2022-01-16 14:07:43'}
+
+
+@pytest.mark.parametrize('rate', [20, 50])
+def test_pacing(monkeypatch, rate):
+    monkeypatch.setattr(nemesis.HostDiscovery, 'icmp_socket', lambda self, family=socket.AF_INET: (None, False))
+    discovery = nemesis.HostDiscovery(rate=rate, ports=(closed_port(),), timeout=0.5)
+
+    hosts = asyncio.run(discovery.sweep([NETWORK]))
+
+    ## Probe N is sent N / rate seconds after start at earliest.
+    assert len(hosts) == len(HOSTS)
+    assert discovery.last['probes'] == len(HOSTS)
+    assert discovery.last['duration'] >= (len(HOSTS) - 1) / rate
+
+
+def test_unlimited_rate(monkeypatch):
+    monkeypatch.setattr(nemesis.HostDiscovery, 'icmp_socket', lambda self, family=socket.AF_INET: (None, False))
+    discovery = nemesis.HostDiscovery(rate=0, ports=(closed_port(),), timeout=0.5)
+
+    ## Only pacing would sleep for other delays than reply timeout, poll
+    ## interval of TCP probes or yield to loop.
+    delays = []
+    sleep = asyncio.sleep
+    async def record(delay, *args, **kwargs):
+        delays.append(delay)
+        return await sleep(delay, *args, **kwargs)
+    monkeypatch.setattr(asyncio, 'sleep', record)
+
+    asyncio.run(discovery.sweep([NETWORK]))
+
+    assert discovery.last['probes'] == len(HOSTS)
+    assert set(delays) <= {0, 0.001, discovery.timeout}
@@ -0,0 +1,51 @@
+## Network filesystems must not block disk usage.
+import os
+import threading
+
+import nemesis
+
+
+MOUNTS = {
+    '254:0': {'mount': '/', 'mounts': ['/'], 'source': '/dev/vda', 'fstype': 'ext4'},
+    '0:50': {'mount': '/mnt/nfs', 'mounts': ['/mnt/nfs'], 'source': 'srv:/export', 'fstype': 'nfs4'},
+    '0:51': {'mount': '/mnt/ssh', 'mounts': ['/mnt/ssh'], 'source': 'user@srv:', 'fstype': 'fuse.sshfs'}
+}
+
+
+def sampler(monkeypatch, hang, **kwargs):
+    real = os.statvfs
+    def statvfs(path):
+        if path.startswith('/mnt/'):
+            hang.wait()
+        return real('/')
+    monkeypatch.setattr(nemesis.os, 'statvfs', statvfs)
+
+    disks = nemesis.DiskSampler(**kwargs)
+    disks.filesystems = lambda: MOUNTS
+    return disks
+
+
+def test_network_filesystems_skipped_by_default(monkeypatch):
+    hang = threading.Event()
+    disks = sampler(monkeypatch, hang)
+    assert [fs['mount'] for fs in disks.usage()] == ['/']
+    hang.set()
+
+
+def test_hanging_network_filesystem_given_up(monkeypatch):
+    hang = threading.Event()
+    disks = sampler(monkeypatch, hang, network=True, timeout=0.1)
+    assert [fs['mount'] for fs in disks.usage()] == ['/']
+    assert set(disks.hanging) == {'/mnt/nfs', '/mnt/ssh'}
+
+    ## Still hanging calls are not repeated.
+    threads = dict(disks.hanging)
+    assert [fs['mount'] for fs in disks.usage()] == ['/']
+    assert disks.hanging == threads
+
+    ## Server is back.
+    hang.set()
+    for thread in threads.values():
+        thread.join()
+    assert [fs['mount'] for fs in disks.usage()] == ['/', '/mnt/nfs', '/mnt/ssh']
+    assert disks.hanging == {}
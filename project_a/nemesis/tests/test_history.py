@@ -0,0 +1,99 @@
+## Metric history (ring files) is kept across restarts.
+import os
+
+import nemesis
+
+
+def test_ring_keeps_records_after_restart(tmp_path):
+    dirs = nemesis.create_data_dirs(str(tmp_path))
+    data = nemesis.JsonData()
+    data.start_history(dirs[2], 100, 100)
+    for i in range(5):
+        data.record_history('sys', 'sys', ['cpu', 'mem'], [i, i * 10])
+    data.rings['sys'].close()
+
+    ## Restart: JSON files are removed, history is not.
+    open(f"{dirs[0]}/nemesis_sys.json", 'w').close()
+    dirs = nemesis.create_data_dirs(str(tmp_path))
+    assert os.listdir(dirs[0]) == []
+
+    data = nemesis.JsonData()
+    data.start_history(dirs[2], 100, 100)
+    data.record_history('sys', 'sys', ['cpu', 'mem'], [5, 50])
+    records = data.rings['sys'].latest(10)
+    data.rings['sys'].close()
+
+    ## Oldest record first.
+    assert [tuple(r[1:]) for r in records] == [(i, i * 10) for i in range(6)]
+
+
+def test_changed_fields_start_new_ring(tmp_path):
+    file = str(tmp_path / 'net.ring')
+    ring = nemesis.RingStore(file, ['rx'], 10)
+    ring.append([1])
+    ring.close()
+
+    ring = nemesis.RingStore(file, ['rx', 'tx'], 10)
+    assert ring.latest(10) == []
+    ring.close()
+
+
+def test_vanished_interfaces_are_pruned(tmp_path):
+    dirs = nemesis.create_data_dirs(str(tmp_path))
+    open(f"{dirs[2]}/net_veth0.ring", 'w').close()
+    data = nemesis.JsonData()
+    data.start_history(dirs[2], 100, 100)
+    data.record_history('sys', 'sys', ['cpu'], [1])
+    for name in ('eth0', 'veth1'):
+        data.record_history(f"net_{name}", 'net', ['rx'], [1])
+
+    data.prune_history(['eth0'])
+    assert sorted(data.rings) == ['net_eth0', 'sys']
+    assert sorted(os.listdir(dirs[2])) == ['net_eth0.ring', 'sys.ring']
+    for ring in data.rings.values():
+        ring.close()
+
+
+def test_truncated_ring_is_created_again(tmp_path):
+    file = str(tmp_path / 'sys.ring')
+    ring = nemesis.RingStore(file, ['cpu', 'mem'], 1000)
+    ring.append([1, 2])
+    size = len(ring.mm)
+    ring.close()
+
+    ## E.g. partially copied file.
+    os.truncate(file, size // 2)
+    ring = nemesis.RingStore(file, ['cpu', 'mem'], 1000)
+    assert ring.latest(10) == []
+    for i in range(1000):
+        ring.append([i, i])
+    assert len(ring.mm) == size
+    ring.close()
+
+
+def test_range_after_clock_step_back(tmp_path):
+    ring = nemesis.RingStore(str(tmp_path / 'sys.ring'), ['cpu'], 10)
+    for t in (100, 110, 120, 50, 60, 130):
+        ring.append([t], t)
+    assert [r[0] for r in ring.read_range(55, 125)] == [100, 110, 120, 60]
+
+    ## Records before the step are overwritten, bisection is used again.
+    for t in range(140, 240, 10):
+        ring.append([t], t)
+    assert [r[0] for r in ring.read_range(155, 185)] == [160, 170, 180]
+    ring.close()
+
+
+def test_reader_drops_overwritten_records(tmp_path):
+    file = str(tmp_path / 'sys.ring')
+    ring = nemesis.RingStore(file, ['cpu'], 4)
+    for t in range(1, 5):
+        ring.append([t], t)
+    reader = nemesis.RingStore(file, writable=False)
+
+    ## Writer moves head while reader copies records of old head.
+    head, count = reader.HEAD.unpack_from(reader.mm, reader.HEAD_OFFSET)
+    ring.append([5], 5)
+    assert [r[0] for r in reader.copy(range(count), head, count)] == [3, 4]
+    reader.close()
+    ring.close()
@@ -0,0 +1,150 @@
+## Export of host inventory in layout of per-host files written without
+## inventory.
+import json
+import os
+
+import nemesis
+
+SWEEP = {'ip': '10.0.100.1', 'method': 'icmp', 'rtt_ms': 0.4,
+         'first_seen': '2022-01-16 14:07:43', 'last_seen': '2022-01-16 23:03:05'}
+SWEEP6 = {'ip': 'fe80::1', 'interface': 'eth0', 'method': 'icmp6', 'rtt_ms': 0.2,
+          'first_seen': '2022-01-16 14:07:43', 'last_seen': '2022-01-16 23:03:05'}
+NEIGH = {'ip': '10.0.100.1', 'family': 'ipv4', 'interface': 'eth0', 'mac': '00:2b:67:ad:bb:f6', 'vendor': None,
+         'state': 'reachable', 'state_changes': 2, 'state_changed': '2022-01-16 20:00:00',
+         'first_seen': '2022-01-16 14:07:43', 'last_seen': '2022-01-16 23:03:05'}
+
+
+def read(directory):
+    files = {}
+    for name in os.listdir(directory):
+        with open(os.path.join(directory, name)) as f:
+            files[name] = json.load(f)
+    return files
+
+
+def test_export_keeps_file_names_and_fields(tmp_path):
+    inventory = nemesis.HostInventory(str(tmp_path / 'inventory.db'))
+    inventory.upsert([SWEEP, SWEEP6])
+    inventory.upsert([NEIGH, {**NEIGH, 'ip': '10.0.100.2', 'mac': '00:2b:67:ad:bb:f7'}])
+    inventory.upsert_services({'10.0.100.1': {22: 'open', 80: 'closed', 443: 'open'}})
+
+    files = {os.path.basename(name): json.loads(data) for name, data in inventory.export(('v4', 'v6')).items()}
+    inventory.close()
+
+    assert files == {
+        '10.0.100.1.json':       {**SWEEP, 'open_ports': [22, 443]},
+        'neigh_10.0.100.1.json': NEIGH,
+        'neigh_10.0.100.2.json': {**NEIGH, 'ip': '10.0.100.2', 'mac': '00:2b:67:ad:bb:f7'},
+        'fe80::1%eth0.json':     {**SWEEP6, 'open_ports': []}
+    }
+
+
+def test_files_of_deleted_hosts_are_removed(tmp_path):
+    directories = (str(tmp_path / 'ipv4'), str(tmp_path / 'ipv6'))
+    for directory in directories:
+        os.mkdir(directory)
+    data = nemesis.JsonData()
+    data.start_inventory(str(tmp_path / 'inventory.db'))
+    data.inventory.upsert([SWEEP, NEIGH, SWEEP6])
+
+    data.update_inventory_export(directories)
+    assert sorted(os.listdir(directories[0])) == ['10.0.100.1.json', 'neigh_10.0.100.1.json']
+    assert os.listdir(directories[1]) == ['fe80::1%eth0.json']
+
+    with data.inventory.db:
+        data.inventory.db.execute("DELETE FROM hosts WHERE ip = 'fe80::1'")
+    data.update_inventory_export(directories)
+    data.inventory.close()
+
+    assert sorted(os.listdir(directories[0])) == ['10.0.100.1.json', 'neigh_10.0.100.1.json']
+    assert os.listdir(directories[1]) == []
+
+
+def test_old_database_gets_new_columns(tmp_path):
+    file = str(tmp_path / 'inventory.db')
+    inventory = nemesis.HostInventory(file)
+    with inventory.db:
+        inventory.db.execute('ALTER TABLE hosts DROP COLUMN sweep_method')
+    inventory.close()
+
+    inventory = nemesis.HostInventory(file)
+    inventory.upsert([SWEEP])
+    assert list(inventory.export(('v4', 'v6'))) == ['v4/10.0.100.1.json']
+    inventory.close()
+
+
+def test_expired_neighbour_leaves_export(tmp_path, monkeypatch):
+    directories = (str(tmp_path / 'ipv4'), str(tmp_path / 'ipv6'))
+    for directory in directories:
+        os.mkdir(directory)
+    data = nemesis.JsonData()
+    data.start_neighbours()
+    data.start_inventory(str(tmp_path / 'inventory.db'))
+    data.inventory.upsert([SWEEP])
+    data.inventory.upsert_services({'10.0.100.2': {22: 'open'}})
+
+    ticks = iter([{'10.0.100.1': dict(NEIGH), '10.0.100.2': {**NEIGH, 'ip': '10.0.100.2'}},
+                  {'10.0.100.1': None, '10.0.100.2': None}])
+    monkeypatch.setattr(data.neigh, 'tick', lambda: next(ticks))
+
+    data.update_neighbours(directories)
+    data.update_inventory_export(directories)
+    assert sorted(os.listdir(directories[0])) == ['10.0.100.1.json', 'neigh_10.0.100.1.json', 'neigh_10.0.100.2.json']
+
+    ## Host found also by sweep keeps its sweep file.
+    data.update_neighbours(directories)
+    data.update_inventory_export(directories)
+    assert os.listdir(directories[0]) == ['10.0.100.1.json']
+    assert data.inventory.count() == {'ipv4': 1}
+    assert data.inventory.db.execute('SELECT key FROM services').fetchall() == []
+    data.inventory.close()
+
+
+def test_hosts_not_found_by_sweeps_expire(tmp_path):
+    inventory = nemesis.HostInventory(str(tmp_path / 'inventory.db'), expire=3600)
+    inventory.upsert([SWEEP, {**SWEEP, 'ip': '10.0.100.2'}, {**NEIGH, 'ip': '10.0.100.2'}])
+    now = nemesis.datetime.datetime.now().strftime(nemesis.HostInventory.TIME_FORMAT)
+    inventory.upsert([{**SWEEP, 'ip': '10.0.100.3', 'first_seen': now, 'last_seen': now}])
+
+    inventory.prune()
+    assert sorted(os.path.basename(name) for name in inventory.export(('v4', 'v6'))) == \
+        ['10.0.100.3.json', 'neigh_10.0.100.2.json']
+    inventory.close()
+
+
+def test_query_returns_ports_of_selected_hosts(tmp_path):
+    inventory = nemesis.HostInventory(str(tmp_path / 'inventory.db'))
+    inventory.upsert([SWEEP, {**SWEEP, 'ip': '10.0.200.1'}])
+    inventory.upsert_services({'10.0.100.1': {22: 'open', 80: 'closed'}, '10.0.200.1': {443: 'open'}})
+
+    hosts = inventory.query('10.0.100.0/24')
+    assert [(h['ip'], h['open_ports']) for h in hosts] == [('10.0.100.1', [22])]
+    assert [(h['ip'], h['open_ports']) for h in inventory.query()] == [('10.0.100.1', [22]), ('10.0.200.1', [443])]
+    inventory.close()
+
+
+def test_sweep_stores_expire_hosts_without_export(tmp_path, monkeypatch):
+    data = nemesis.JsonData()
+    data.start_inventory(str(tmp_path / 'inventory.db'), 3600)
+    data.inventory.upsert([SWEEP])
+    data.inventory.upsert_services({'10.0.100.1': {22: 'open'}})
+    monkeypatch.setattr(data, 'local_networks', lambda: [])
+
+    ## Sweep which found no host.
+    data.store_hosts([])
+    assert data.inventory.count() == {}
+    assert data.inventory.db.execute('SELECT key FROM services').fetchall() == []
+    data.inventory.close()
+
+
+def test_local_networks_are_read_after_change(monkeypatch):
+    data = nemesis.JsonData()
+    sweeps = []
+    monkeypatch.setattr(data.sweep('all'), 'collect', lambda: sweeps.append(1) or [])
+
+    data.local_networks()
+    data.local_networks()
+    assert len(sweeps) == 1
+    data.net_events([{'type': 'addr', 'action': 'new', 'interface': 'eth0'}])
+    data.local_networks()
+    assert len(sweeps) == 2
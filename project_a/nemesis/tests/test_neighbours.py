@@ -0,0 +1,34 @@
+## Neighbour tracking over '/proc/net/arp' (without netlink).
+import os
+
+import nemesis
+
+
+HEADER = "IP address       HW type     Flags       HW address            Mask     Device"
+
+
+def arp(tmp_path, *lines):
+    with open(tmp_path / 'net' / 'arp', 'w') as f:
+        f.write('\n'.join((HEADER,) + lines) + '\n')
+
+
+def test_arp_lines_are_diffed(tmp_path):
+    os.mkdir(tmp_path / 'net')
+    tracker = nemesis.NeighbourTracker(str(tmp_path))
+    tracker.use_netlink = False
+
+    one = "10.0.100.1       0x1         0x2         00:2b:67:ad:bb:f6     *        eth0"
+    two = "10.0.100.2       0x1         0x2         00:2b:67:ad:bb:f7     *        eth0"
+    arp(tmp_path, one, two)
+    assert sorted(tracker.tick()) == ['10.0.100.1', '10.0.100.2']
+
+    ## Unchanged table is not parsed.
+    assert tracker.read_arp() == {}
+    assert tracker.tick() == {}
+
+    ## Host changed its MAC and other one left table.
+    arp(tmp_path, one.replace('f6', 'f8'))
+    changed = tracker.tick()
+    assert changed['10.0.100.1']['mac'] == '00:2b:67:ad:bb:f8'
+    assert changed['10.0.100.2']['state'] == 'gone'
+    assert list(tracker.entries) == ['10.0.100.1']
@@ -0,0 +1,107 @@
+## Replay of rtnetlink messages (in layout sent by kernel) into
+## NetlinkListener.parse().
+import socket
+import struct
+
+import pytest
+
+import nemesis
+
+
+## Return rtnetlink attribute (aligned to 4 bytes).
+def attribute(kind: int, value: bytes):
+    data = struct.pack('=HH', 4 + len(value), kind) + value
+    return data + b'\x00' * (-len(data) % 4)
+
+
+## Return netlink message with passed type and body.
+def message(kind: int, body: bytes):
+    return struct.pack('=IHHII', 16 + len(body), kind, 0, 0, 0) + body
+
+
+## Return RTM_NEWLINK (or RTM_DELLINK) message of interface.
+def link(index: int, name: str, operstate: int = 6, kind: int = nemesis.NetlinkListener.RTM_NEWLINK):
+    body = struct.pack('=BxHiII', socket.AF_UNSPEC, 1, index, 0x1043, 0)
+    body += attribute(nemesis.NetlinkListener.IFLA_IFNAME, name.encode() + b'\x00')
+    body += attribute(nemesis.NetlinkListener.IFLA_OPERSTATE, bytes([operstate]))
+    body += attribute(nemesis.NetlinkListener.IFLA_CARRIER, b'\x01')
+    return message(kind, body)
+
+
+## Return RTM_NEWADDR message of IPv4 address.
+def addr(index: int, address: str, prefixlen: int):
+    body = struct.pack('=BBBBI', socket.AF_INET, prefixlen, 0, 0, index)
+    body += attribute(nemesis.NetlinkListener.IFA_ADDRESS, socket.inet_aton(address))
+    body += attribute(nemesis.NetlinkListener.IFA_LOCAL, socket.inet_aton(address))
+    return message(nemesis.NetlinkListener.RTM_NEWADDR, body)
+
+
+def test_link_and_address_events():
+    listener = nemesis.NetlinkListener(None)
+    events = listener.parse(link(2, 'eth0') + addr(2, '10.0.100.34', 24))
+
+    assert events[0] == {'type': 'link', 'action': 'new', 'index': 2, 'interface': 'eth0',
+                         'operstate': 'up', 'carrier': 1}
+    assert events[1]['interface'] == 'eth0'
+    assert (events[1]['address'], events[1]['prefixlen']) == ('10.0.100.34', 24)
+
+
+def test_links_known_before_start():
+    ## Links of dump (RTM_GETLINK answer) seed known links.
+    listener = nemesis.NetlinkListener(None)
+    listener.parse(link(2, 'eth0') + link(3, 'eth1'))
+
+    events = listener.parse(addr(3, '192.168.1.2', 24))
+    assert events[0]['interface'] == 'eth1'
+
+    events = listener.parse(link(2, 'lan0'))
+    assert events[0]['interface'] == 'lan0'
+    assert events[0]['old_interface'] == 'eth0'
+
+    events = listener.parse(link(3, 'eth1', kind=nemesis.NetlinkListener.RTM_DELLINK))
+    assert events[0]['action'] == 'del'
+    assert 3 not in listener.links
+
+
+def test_unknown_link_has_no_name():
+    listener = nemesis.NetlinkListener(None)
+    events = listener.parse(addr(7, '10.1.1.1', 8))
+    assert events[0]['interface'] is None
+
+
+def test_sync_reports_renamed_and_removed_links():
+    listener = nemesis.NetlinkListener(None)
+    listener.parse(link(2, 'eth0') + link(3, 'eth1'))
+
+    ## Dump answered with renamed eth0, eth1 removed meanwhile.
+    listener.dump = lambda kind, family=socket.AF_UNSPEC: listener.parse(link(2, 'lan0'))
+    changes = listener.sync()
+
+    assert [(e['action'], e['interface'], e.get('old_interface')) for e in changes] == \
+        [('new', 'lan0', 'eth0'), ('del', 'eth1', None)]
+    assert listener.links == {2: {'interface': 'lan0', 'operstate': 'up', 'carrier': 1}}
+
+
+def test_net_events_invalidate_renamed_interface(tmp_path):
+    for name in ('eth0', 'lan0'):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / 'operstate').write_text('up\n')
+    reader = nemesis.SysfsReader(str(tmp_path))
+    reader.read('eth0', 'operstate')
+    reader.read('lan0', 'operstate')
+
+    data = nemesis.JsonData()
+    data.sysfs = reader
+    data.net_events([{'type': 'link', 'action': 'new', 'index': 2, 'interface': 'lan0',
+                      'old_interface': 'eth0', 'operstate': 'up', 'carrier': 1}])
+
+    assert reader.fds == {}
+
+
+def test_dump_links():
+    listener = nemesis.NetlinkListener(None)
+    try:
+        listener.dump(nemesis.NetlinkListener.RTM_GETLINK)
+    except OSError:
+        pytest.skip("Netlink is not available.")
+    assert 'lo' in [link['interface'] for link in listener.links.values()]
@@ -0,0 +1,41 @@
+## Interface rates over '/proc/net/dev' with wrapped and reset counters.
+import os
+
+import nemesis
+
+
+def dev(path, rx_bytes):
+    lines = ["Inter-|   Receive                            |  Transmit",
+             " face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed",
+             f"  eth0: {rx_bytes} 10 0 0 0 0 0 0 500 5 0 0 0 0 0 0"]
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def rx_rate(stats, path, rx_bytes, now):
+    dev(path, rx_bytes)
+    stats.update()
+    return stats.sample('eth0', now)['rx_bytes']
+
+
+def test_32bit_counter_wraps(tmp_path):
+    os.mkdir(tmp_path / 'net')
+    path = tmp_path / 'net' / 'dev'
+    stats = nemesis.NetStats(str(tmp_path), bits=32)
+
+    rx_rate(stats, path, 2**32 - 1000, 1.0)
+    assert rx_rate(stats, path, 500, 2.0) == 1500.0
+
+
+def test_64bit_counter_decrease_is_reset(tmp_path):
+    os.mkdir(tmp_path / 'net')
+    path = tmp_path / 'net' / 'dev'
+    stats = nemesis.NetStats(str(tmp_path), bits=64)
+
+    rx_rate(stats, path, 2**32 - 1000, 1.0)
+    assert rx_rate(stats, path, 500, 2.0) == 500.0
+
+    ## On 32-bit kernel value above 32 bits is 64-bit counter, so it was reset.
+    stats = nemesis.NetStats(str(tmp_path), bits=32)
+    rx_rate(stats, path, 2**40, 1.0)
+    assert rx_rate(stats, path, 500, 2.0) == 500.0
@@ -0,0 +1,58 @@
+## Selection of interfaces by pattern on fake '/sys/class/net' tree.
+import json
+import os
+import re
+import shutil
+
+import pytest
+
+import nemesis
+
+
+@pytest.fixture
+def net_dir(tmp_path):
+    return nemesis.fake_sys_class_net(str(tmp_path), 4)
+
+
+def test_patterns(net_dir):
+    assert nemesis.NetSweep('all', net_dir).interfaces() == ['veth0', 'veth1', 'veth2', 'veth3']
+    assert nemesis.NetSweep('veth[12]', net_dir).interfaces() == ['veth1', 'veth2']
+    assert nemesis.NetSweep('re:veth[03]$', net_dir).interfaces() == ['veth0', 'veth3']
+
+    single = nemesis.NetSweep('veth2', net_dir)
+    assert single.is_single()
+    assert single.interfaces() == ['veth2']
+
+
+def test_invalid_pattern():
+    with pytest.raises(re.error):
+        nemesis.NetSweep.compile('re:veth[')
+
+
+def test_per_interface_files_follow_interfaces(tmp_path):
+    net_dir = nemesis.fake_sys_class_net(str(tmp_path), 3)
+    data = nemesis.JsonData(nemesis.fake_proc_net_dev(str(tmp_path), 3), str(tmp_path))
+    file = str(tmp_path / 'nemesis_net.json')
+
+    data.update_netinfo(file, 'veth*', 'per_interface')
+    assert sorted(n for n in os.listdir(tmp_path) if n.endswith('.json')) == \
+        ['nemesis_net_veth0.json', 'nemesis_net_veth1.json', 'nemesis_net_veth2.json']
+    with open(tmp_path / 'nemesis_net_veth1.json') as f:
+        assert json.load(f)['interface'] == 'veth1'
+
+    ## File of vanished interface is removed.
+    shutil.rmtree(f"{net_dir}/veth1")
+    data.update_netinfo(file, 'veth*', 'per_interface')
+    assert sorted(n for n in os.listdir(tmp_path) if n.endswith('.json')) == \
+        ['nemesis_net_veth0.json', 'nemesis_net_veth2.json']
+
+
+def test_discovery_reuses_netinfo_sweep(tmp_path):
+    nemesis.fake_sys_class_net(str(tmp_path), 2)
+    data = nemesis.JsonData(nemesis.fake_proc_net_dev(str(tmp_path), 2), str(tmp_path))
+
+    data.netinfo_sweep('veth*')
+    sweep = data.sweeps['veth*']
+    assert data.discovery_networks('veth*') == []
+    assert data.discovery_interfaces6('veth*') == {}
+    assert data.sweeps == {'veth*': sweep}
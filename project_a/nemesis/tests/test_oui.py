@@ -0,0 +1,55 @@
+## Broken OUI index is rebuilt instead of crashing startup.
+import os
+
+import pytest
+
+import nemesis
+
+
+OUI = """OUI/MA-L                                                    Organization
+10-E9-92   (hex)		INGRAM MICRO SERVICES
+10E992     (base 16)		INGRAM MICRO SERVICES
+"""
+IAB = """40-D8-55   (hex)		Avant Technologies
+0D7000-0D7FFF     (base 16)		Avant Technologies
+"""
+
+
+@pytest.fixture
+def index(tmp_path):
+    (tmp_path / 'oui.txt').write_text(OUI)
+    (tmp_path / 'iab.txt').write_text(IAB)
+    file = str(tmp_path / 'oui.idx')
+    nemesis.OuiIndex.build(file, str(tmp_path / 'oui.txt'), str(tmp_path / 'iab.txt'))
+    return file
+
+
+def test_lookup(index):
+    oui = nemesis.OuiIndex(index)
+    assert oui.lookup('10:e9:92:00:00:01') == 'INGRAM MICRO SERVICES'
+    assert oui.lookup('40-D8-55-0D-70-01') == 'Avant Technologies'
+    assert oui.lookup('00:00:00:00:00:01') is None
+    oui.close()
+
+
+@pytest.mark.parametrize('size', [0, 8, 40, -20])
+def test_truncated_index(index, size):
+    with open(index, 'rb') as f:
+        data = f.read()
+    with open(index, 'wb') as f:
+        f.write(data[:size])
+
+    with pytest.raises(ValueError):
+        nemesis.OuiIndex(index)
+
+
+def test_truncated_index_is_rebuilt(index, monkeypatch):
+    with open(index, 'r+b') as f:
+        f.truncate(8)
+    sources = (os.path.join(os.path.dirname(index), 'oui.txt'), os.path.join(os.path.dirname(index), 'iab.txt'))
+    monkeypatch.setattr(nemesis.OuiIndex, 'sources', staticmethod(lambda: sources))
+    os.utime(index, (os.path.getmtime(sources[0]) + 10,) * 2)
+
+    oui = nemesis.OuiIndex.load(index)
+    assert oui.lookup('10:e9:92:00:00:01') == 'INGRAM MICRO SERVICES'
+    oui.close()
@@ -0,0 +1,131 @@
+## Port scan against listeners bound on localhost.
+import asyncio
+import errno
+import socket
+
+import pytest
+
+import nemesis
+
+
+@pytest.fixture
+def ports():
+    listeners = []
+    for _ in range(2):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        sock.listen()
+        listeners.append(sock)
+
+    ## Port which was free a moment ago.
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    closed = sock.getsockname()[1]
+    sock.close()
+
+    yield [s.getsockname()[1] for s in listeners], closed
+    for sock in listeners:
+        sock.close()
+
+
+def test_open_and_closed_ports(ports):
+    open_ports, closed = ports
+    scanner = nemesis.PortScanner(open_ports + [closed], timeout=1.0)
+
+    results = asyncio.run(scanner.scan({'127.0.0.1': ('127.0.0.1', None)}))
+
+    assert results == {'127.0.0.1': {**{p: 'open' for p in open_ports}, closed: 'closed'}}
+    assert scanner.last['probes'] == 3
+    assert scanner.last['open'] == 2
+
+
+def test_only_new_and_changed_hosts_between_full_cycles(ports):
+    open_ports, _ = ports
+    scanner = nemesis.PortScanner(open_ports, timeout=1.0, full_every=3)
+    hosts = {'127.0.0.1': ('127.0.0.1', 'aa'), '127.0.0.2': ('127.0.0.2', 'bb')}
+
+    ## Full cycle, then only new host or host with changed MAC, then full.
+    assert set(asyncio.run(scanner.scan(hosts))) == {'127.0.0.1', '127.0.0.2'}
+    hosts = {**hosts, '127.0.0.2': ('127.0.0.2', 'cc'), '127.0.0.3': ('127.0.0.3', 'dd')}
+    assert set(asyncio.run(scanner.scan(hosts))) == {'127.0.0.2', '127.0.0.3'}
+    assert asyncio.run(scanner.scan(hosts)) == {}
+    assert set(asyncio.run(scanner.scan(hosts))) == {'127.0.0.1', '127.0.0.2', '127.0.0.3'}
+
+
+def test_probe_without_descriptors_is_error(monkeypatch):
+    scanner = nemesis.PortScanner((80,))
+    def no_descriptor(*args, **kwargs):
+        raise OSError(errno.EMFILE, 'Too many open files')
+
+    async def probe():
+        loop = asyncio.get_running_loop()
+        monkeypatch.setattr(socket, 'socket', no_descriptor)
+        try:
+            return await scanner.probe(loop, '127.0.0.1', 80)
+        finally:
+            monkeypatch.undo()
+
+    assert asyncio.run(probe()) == 'error'
+
+
+def test_local_errors_are_not_states_and_host_is_scanned_again(monkeypatch, ports):
+    open_ports, _ = ports
+    scanner = nemesis.PortScanner(open_ports, timeout=1.0, full_every=100)
+    hosts = {'127.0.0.1': ('127.0.0.1', 'aa')}
+    adapted = []
+    monkeypatch.setattr(scanner, 'adapt', adapted.append)
+
+    async def failing(loop, address, port):
+        return 'error' if port == open_ports[0] else 'open'
+
+    with monkeypatch.context() as m:
+        m.setattr(scanner, 'probe', failing)
+        assert asyncio.run(scanner.scan(hosts)) == {'127.0.0.1': {open_ports[1]: 'open'}}
+    assert adapted == [False]
+    assert scanner.known == {}
+
+    ## Host with failed probe is not skipped as unchanged.
+    assert asyncio.run(scanner.scan(hosts)) == {'127.0.0.1': {p: 'open' for p in open_ports}}
+    assert scanner.known == {'127.0.0.1': 'aa'}
+    assert asyncio.run(scanner.scan(hosts)) == {}
+
+
+def test_interrupted_scan_keeps_hosts_unscanned(monkeypatch, ports):
+    open_ports, _ = ports
+    scanner = nemesis.PortScanner(open_ports, timeout=1.0, full_every=100)
+    hosts = {'127.0.0.1': ('127.0.0.1', 'aa')}
+
+    async def interrupted(loop, address, slots):
+        raise asyncio.CancelledError
+
+    with monkeypatch.context() as m:
+        m.setattr(scanner, 'scan_host', interrupted)
+        with pytest.raises(asyncio.CancelledError):
+            asyncio.run(scanner.scan(hosts))
+
+    assert set(asyncio.run(scanner.scan(hosts))) == {'127.0.0.1'}
+
+
+def test_service_changes(tmp_path):
+    inventory = nemesis.HostInventory(str(tmp_path / 'inventory.db'))
+
+    ## Ports which were never open are not stored.
+    assert inventory.upsert_services({'10.0.100.1': {22: 'open', 80: 'closed'}}) == \
+        [{'key': '10.0.100.1', 'port': 22, 'old': None, 'new': 'open'}]
+    assert inventory.upsert_services({'10.0.100.1': {22: 'open', 80: 'closed'}}) == []
+    assert inventory.upsert_services({'10.0.100.1': {22: 'filtered', 80: 'open'}}) == [
+        {'key': '10.0.100.1', 'port': 22, 'old': 'open', 'new': 'filtered'},
+        {'key': '10.0.100.1', 'port': 80, 'old': None, 'new': 'open'}]
+    assert inventory.upsert_services({'10.0.100.1': {22: 'closed'}}) == \
+        [{'key': '10.0.100.1', 'port': 22, 'old': 'filtered', 'new': 'closed'}]
+
+    assert inventory.db.execute('SELECT port, state FROM services ORDER BY port').fetchall() == \
+        [(22, 'closed'), (80, 'open')]
+    inventory.close()
+
+
+def test_parse_ports():
+    assert nemesis.PortScanner.parse_ports('22, 80,8000-8002') == (22, 80, 8000, 8001, 8002)
+    for text in ('80-70', '0', '70000', '22,x'):
+        with pytest.raises(ValueError):
+            nemesis.PortScanner.parse_ports(text)
@@ -0,0 +1,48 @@
+## Process sampler over fake '/proc' directory.
+import nemesis
+
+
+def write_process(proc, pid, ticks=0, read_bytes=0, write_bytes=0, io=True):
+    directory = proc / str(pid)
+    directory.mkdir(exist_ok=True)
+    fields = ['S'] + ['0'] * 30
+    fields[11] = str(ticks)
+    fields[17] = '1'
+    fields[19] = '1000'
+    fields[21] = '10'
+    (directory / 'stat').write_text(f"{pid} (worker) " + ' '.join(fields))
+    (directory / 'cmdline').write_bytes(b'worker\0--io\0')
+    if io:
+        (directory / 'io').write_text(f"rchar: 0\nwchar: 0\nread_bytes: {read_bytes}\nwrite_bytes: {write_bytes}\n")
+    elif (directory / 'io').exists():
+        (directory / 'io').unlink()
+
+
+def test_io_of_process_without_cpu_time(tmp_path):
+    proc = tmp_path
+    sampler = nemesis.ProcessSampler(str(proc))
+    write_process(proc, 100, ticks=5)
+    sampler.sample(now=10.0)
+
+    ## Process did I/O but used less than one clock tick.
+    write_process(proc, 100, ticks=5, read_bytes=4096, write_bytes=8192)
+    result = sampler.sample(now=12.0)
+
+    assert result['top_cpu'] == []
+    assert [(r['pid'], r['read_bytes'], r['write_bytes']) for r in result['top_io']] == [(100, 2048.0, 4096.0)]
+
+
+def test_io_rate_since_last_read(tmp_path):
+    proc = tmp_path
+    sampler = nemesis.ProcessSampler(str(proc))
+    write_process(proc, 100, ticks=5)
+    sampler.sample(now=10.0)
+
+    ## 'io' could not be read on one tick, bytes are spread over whole time
+    ## since last read instead of making spike.
+    write_process(proc, 100, ticks=5, io=False)
+    assert sampler.sample(now=11.0)['top_io'] == []
+    write_process(proc, 100, ticks=5, write_bytes=3000)
+    result = sampler.sample(now=13.0)
+
+    assert [(r['pid'], r['write_bytes']) for r in result['top_io']] == [(100, 1000.0)]
@@ -0,0 +1,89 @@
+## AsyncRuntime runs collector coroutines on absolute deadlines.
+import asyncio
+import threading
+import time
+
+import pytest
+
+import nemesis
+
+
+@pytest.fixture
+def run():
+    runtimes = []
+    def start(runtime):
+        thread = threading.Thread(target=runtime.run, daemon=True)
+        thread.start()
+        runtimes.append((runtime, thread))
+        wait(lambda: runtime.loop is not None and runtime.stopped is not None)
+        return runtime
+    yield start
+    for runtime, thread in runtimes:
+        runtime.stop()
+        thread.join(timeout=5)
+
+
+def wait(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end
+        time.sleep(0.005)
+
+
+def test_deadlines_are_absolute(run):
+    runtime = nemesis.AsyncRuntime()
+    starts = []
+    async def collector():
+        starts.append(time.monotonic())
+        ## Time spent by collector does not shift next run.
+        await asyncio.sleep(0.03)
+    runtime.add('collector', collector, 0.1, phase=0.02)
+    begin = time.monotonic()
+    run(runtime)
+
+    wait(lambda: len(starts) >= 5)
+    ## First run right after start, second one after phase (raised to at
+    ## least half of interval), then every interval.
+    first = starts[0]
+    assert first - begin < 0.05
+    for i, start in enumerate(starts[1:5]):
+        assert 0 <= start - (first + 0.12 + i * 0.1) < 0.05
+    assert runtime.stats()['missed'] == 0
+
+
+def test_missed_deadlines_are_counted(run):
+    runtime = nemesis.AsyncRuntime()
+    async def slow():
+        await asyncio.sleep(0.3)
+    runtime.add('slow', slow, 0.05, phase=0.05)
+    run(runtime)
+
+    wait(lambda: runtime.collectors['slow']['runs'] >= 2)
+    assert runtime.collectors['slow']['missed'] >= 3
+    assert runtime.stats()['missed'] == runtime.collectors['slow']['missed']
+
+
+def test_trigger_runs_collector_out_of_schedule(run):
+    runtime = nemesis.AsyncRuntime()
+    runs = []
+    async def collector():
+        runs.append(time.monotonic())
+    runtime.add('collector', collector, 60)
+    run(runtime)
+
+    wait(lambda: len(runs) == 1)
+    runtime.trigger('collector')
+    wait(lambda: len(runs) == 2)
+    assert runs[1] - runs[0] < 1
+
+
+def test_blocking_calls_run_in_pool(run):
+    runtime = nemesis.AsyncRuntime()
+    threads = []
+    async def collector():
+        threads.append(await runtime.blocking(lambda: threading.current_thread().name))
+    runtime.add('collector', collector, 60)
+    run(runtime)
+
+    wait(lambda: threads)
+    assert threads[0].startswith('blocking')
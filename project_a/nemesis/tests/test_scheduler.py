@@ -0,0 +1,95 @@
+## Scheduler runs jobs on absolute deadlines in worker threads.
+import threading
+import time
+
+import pytest
+
+import nemesis
+
+
+@pytest.fixture
+def run():
+    schedulers = []
+    def start(scheduler):
+        thread = threading.Thread(target=scheduler.run, daemon=True)
+        thread.start()
+        schedulers.append((scheduler, thread))
+        return scheduler
+    yield start
+    for scheduler, thread in schedulers:
+        scheduler.stop()
+        thread.join(timeout=5)
+
+
+def wait(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end
+        time.sleep(0.005)
+
+
+def test_deadlines_are_absolute(run):
+    scheduler = nemesis.Scheduler()
+    starts = []
+    def job():
+        starts.append(time.monotonic())
+        ## Time spent by job does not shift next run.
+        time.sleep(0.03)
+    scheduler.add('job', job, 0.1, phase=0.02)
+    run(scheduler)
+
+    wait(lambda: len(starts) >= 5)
+    ## First run right after start, second one after phase (raised to at
+    ## least half of interval), then every interval.
+    expected = [scheduler.start_time] + [scheduler.start_time + 0.12 + i * 0.1 for i in range(4)]
+    for start, deadline in zip(starts, expected):
+        assert 0 <= start - deadline < 0.05
+    assert scheduler.stats()['missed'] == 0
+
+
+def test_missed_deadlines_are_counted(run):
+    scheduler = nemesis.Scheduler()
+    done = threading.Event()
+    scheduler.add('slow', lambda: done.wait(5), 0.05, phase=0.05)
+    run(scheduler)
+
+    time.sleep(0.3)
+    done.set()
+    wait(lambda: scheduler.jobs['slow']['runs'] >= 1)
+    assert scheduler.jobs['slow']['missed'] >= 3
+    assert scheduler.stats()['missed'] == scheduler.jobs['slow']['missed']
+
+
+def test_trigger_while_running_runs_once_more(run):
+    scheduler = nemesis.Scheduler()
+    started, release = threading.Event(), threading.Event()
+    def job():
+        started.set()
+        release.wait(5)
+    scheduler.add('job', job, 60)
+    run(scheduler)
+
+    wait(started.is_set)
+    scheduler.trigger('job')
+    scheduler.trigger('job')
+    assert scheduler.jobs['job']['pending']
+    release.set()
+
+    ## Both triggers during run give one more run.
+    wait(lambda: scheduler.jobs['job']['runs'] == 2 and not scheduler.jobs['job']['running'])
+    time.sleep(0.05)
+    assert scheduler.jobs['job']['runs'] == 2
+
+
+def test_long_jobs_do_not_hold_shared_worker(run):
+    scheduler = nemesis.Scheduler(workers=1)
+    release = threading.Event()
+    runs = []
+    scheduler.add('sweep', lambda: release.wait(5), 60, long=True)
+    scheduler.add('scan', lambda: release.wait(5), 60, long=True)
+    scheduler.add('short', lambda: runs.append(1), 0.05, phase=0.05)
+    run(scheduler)
+
+    wait(lambda: len(runs) >= 3)
+    release.set()
+    assert scheduler.jobs['short']['missed'] == 0
@@ -0,0 +1,38 @@
+## Cost of sysinfo tick counts snapshot reads and reads of samplers.
+import os
+
+import nemesis
+
+
+def fake_proc_and_sys(tmp_path):
+    proc, sys = tmp_path / 'proc', tmp_path / 'sys'
+    os.makedirs(proc / 'self')
+    files = {
+        'meminfo':       "MemTotal:       16256480 kB\nMemFree:         9631504 kB\nSwapTotal:             0 kB\n",
+        'stat':          "cpu  10 0 5 100 0 0 0 0\ncpu0 5 0 2 50 0 0 0 0\ncpu1 5 0 3 50 0 0 0 0\nintr 0\n",
+        'diskstats':     "   8       0 sda 10 0 80 5 20 0 160 10 0 15 15\n",
+        'loadavg':       "0.10 0.20 0.30 1/100 1000\n",
+        'uptime':        "1000.00 1900.00\n",
+        'self/mountinfo': "20 1 8:0 / / rw,relatime - ext4 /dev/sda rw\n"
+    }
+    for name, text in files.items():
+        (proc / name).write_text(text)
+    for core in range(2):
+        os.makedirs(sys / f"devices/system/cpu/cpu{core}/cpufreq")
+        (sys / f"devices/system/cpu/cpu{core}/cpufreq/scaling_cur_freq").write_text("2100000\n")
+    return str(proc), str(sys)
+
+
+def test_tick_cost_counts_sampler_reads(tmp_path):
+    si = nemesis.SysInfo(*fake_proc_and_sys(tmp_path))
+
+    for _ in range(2):
+        si.refresh()
+        assert list(si.cpu_freq_rawdata()) == [2100.0, 2100.0]
+        assert [d['mount'] for d in si.disk_usage()] == ['/']
+
+    ## Snapshot files (no PSI), 2 cpufreq reads, mount table poll and statvfs
+    ## of one filesystem (mount table was read on first tick).
+    assert si.snapshot.cost == {'file_reads': 5, 'clock_reads': 1, 'sampler_reads': 4}
+    assert si.snapshot.total_cost['file_reads'] == 15
+    si.disk_sampler.close()
@@ -0,0 +1,36 @@
+## TCP states are counted whatever the chunk boundaries.
+import os
+
+import pytest
+
+import nemesis
+
+
+HEADER = '  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode'
+
+
+def line(i, port, state, backlog=0):
+    return (f"{i:4d}: 0100007F:{port:04X} 0200007F:{40000 + i:04X} {state} 00000000:{backlog:08X} "
+            f"00:00000000 00000000     0        0 {1000 + i} 1 0000000000000000 100 0 0 10 0")
+
+
+@pytest.fixture
+def proc(tmp_path):
+    lines = [HEADER, line(0, 443, '0A', 3)]
+    lines += [line(i, 443, '01') for i in range(1, 8)]
+    lines += [line(i, 50000 + i, '06') for i in range(8, 11)]
+    os.mkdir(tmp_path / 'net')
+    ## Last line is not terminated by newline.
+    (tmp_path / 'net' / 'tcp').write_text('\n'.join(lines))
+    (tmp_path / 'net' / 'tcp6').write_text(HEADER + '\n')
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize('chunk', [64, 151, 1 << 20])
+def test_sample(proc, monkeypatch, chunk):
+    monkeypatch.setattr(nemesis.TcpStates, 'CHUNK', chunk)
+    data = nemesis.TcpStates(proc).sample()
+    assert data['sockets'] == 11
+    assert data['states'] == {'LISTEN': 1, 'ESTABLISHED': 7, 'TIME_WAIT': 3}
+    assert data['ports'] == {'443': {'LISTEN': 1, 'ESTABLISHED': 7}}
+    assert data['listeners'] == [{'address': '127.0.0.1', 'port': 443, 'backlog': 3}]
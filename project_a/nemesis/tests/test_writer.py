@@ -0,0 +1,49 @@
+## Output files are written atomically and only when their content changed.
+import os
+
+import pytest
+
+import nemesis
+
+
+def test_unchanged_content_is_skipped(tmp_path):
+    writer = nemesis.FileWriter()
+    file = str(tmp_path / 'nemesis_sys.json')
+
+    assert writer.write(file, '{"cpu": 1}')
+    assert not writer.write(file, '{"cpu": 1}')
+    assert writer.write(file, '{"cpu": 2}')
+    assert writer.stats() == {'written': 2, 'skipped': 1}
+    with open(file) as f:
+        assert f.read() == '{"cpu": 2}'
+
+    ## Removed file is written again.
+    writer.remove(file)
+    assert not os.path.exists(file)
+    assert writer.write(file, '{"cpu": 2}')
+
+
+def test_fsync_every_nth_write(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr(nemesis.os, 'fsync', synced.append)
+    writer = nemesis.FileWriter('3')
+
+    for i in range(7):
+        writer.write(str(tmp_path / 'file.json'), str(i))
+
+    ## File and its directory after 3rd and 6th write.
+    assert len(synced) == 4
+    assert [writer.need_fsync(n) for n in range(1, 7)] == [False, False, True, False, False, True]
+
+
+def test_failed_write_leaves_no_temporary_file(tmp_path, monkeypatch):
+    writer = nemesis.FileWriter()
+    file = str(tmp_path / 'nemesis_sys.json')
+    def replace(src, dst):
+        raise OSError(28, 'No space left on device')
+    monkeypatch.setattr(nemesis.os, 'replace', replace)
+
+    with pytest.raises(OSError):
+        writer.write(file, '{"cpu": 1}')
+    assert os.listdir(tmp_path) == []
+    assert writer.stats() == {'written': 0, 'skipped': 0}